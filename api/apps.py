@@ -1,6 +1,21 @@
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core.signals import request_started
+
+        from . import db, jobs, metrics, signals  # noqa: F401  (시그널 / DB 쿼리 타이머 / SQLite PRAGMA 등록)
+
+        # 일기 생성 작업 워커와 작업 복구는 (fork 이후) 프로세스의 첫 요청에서 시작
+        request_started.connect(jobs.start_workers, dispatch_uid='diary_job_workers')
+
+        if settings.UPSTREAM_PREWARM:
+            from . import upstream
+            threading.Thread(target=upstream.prewarm, daemon=True).start()
@@ -0,0 +1,74 @@
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import idempotency, jobs, metrics, prompts, resilience, services, throttling
+from .views import KakaoAccessTokenAuthentication
+
+logger = logging.getLogger(__name__)
+
+
+def _json_response(data, status):
+    return JsonResponse(data, status=status, json_dumps_params={"ensure_ascii": False, "separators": (",", ":")})
+
+
+@csrf_exempt
+async def chat_end(request):
+    """
+    DiaryViewSet.create 의 비동기 버전 (ASGI 로 서비스할 때 chat/end/ 에 연결됨)
+    Gemini / Clova 호출을 await 하는 동안 워커 스레드를 점유하지 않는다.
+    """
+    if request.method != 'POST':
+        return _json_response({"detail": f'Method "{request.method}" not allowed.'}, 405)
+
+    # 토큰 검증은 대부분 캐시에서 끝나므로 동기 인증 코드를 그대로 사용
+    try:
+        authenticated = await sync_to_async(KakaoAccessTokenAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return _json_response({"detail": str(e.detail)}, 401)
+    if authenticated is None:
+        return _json_response({"detail": "Authentication credentials were not provided."}, 401)
+    user = authenticated[0]
+
+    # DiaryViewSet 의 TokenBucketThrottle 과 같은 예산
+    retry_after = await throttling.atake('chat_end', f"user:{user.pk}")
+    if retry_after is not None:
+        response = _json_response({"detail": "Request was throttled."}, 429)
+        response['Retry-After'] = throttling.retry_after_header(retry_after)
+        return response
+
+    try:
+        body = json.loads(request.body or b'{}')
+    except json.JSONDecodeError as e:
+        return _json_response({"detail": f"JSON parse error - {e}"}, 400)
+
+    # 배열 / 문자열 같은 JSON 도 DRF 경로와 같이 400
+    conversation_data = body.get("conversation") if isinstance(body, dict) else None
+    if not prompts.has_turns(conversation_data):
+        return _json_response({"error": "Conversation data is required."}, 400)
+
+    background = jobs.wants_background(request)
+    if background:
+        async def run():
+            with metrics.stage('enqueue'):
+                job = await sync_to_async(jobs.enqueue)(user, conversation_data)
+            return jobs.accepted_payload(job), 202
+    else:
+        async def run():
+            with resilience.deadline(settings.CHAT_END_DEADLINE):
+                return await services.agenerate_diary(user, conversation_data)
+
+    # 재시도로 들어온 같은 요청은 진행 중인 생성 결과를 기다렸다가 저장된 응답을 돌려준다
+    key = idempotency.request_key(request, user, conversation_data, background)
+    with metrics.stage('handler'):
+        payload, status_code, replayed = await idempotency.arun_once(key, run)
+
+    response = _json_response(payload, status_code)
+    if replayed:
+        response['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,185 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+# stats() 를 모아볼 수 있도록 생성된 캐시를 이름으로 등록
+registry = {}
+
+
+def hash_key(*parts):
+    """캐시 키로 쓸 sha256 해시 (원문 토큰/텍스트를 키에 남기지 않기 위함)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    LRU 방식으로 크기가 제한되는 프로세스 내 TTL 캐시
+    backend_alias 를 지정하면 Django 캐시(예: Redis)를 2차 저장소로 사용해 여러 워커가 결과를 공유한다.
+    """
+    def __init__(self, name, maxsize=1024, ttl=300, backend_alias=None, key_prefix=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend_alias = backend_alias
+        self.key_prefix = key_prefix or f'{name}:'
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        registry[name] = self
+
+    @property
+    def backend(self):
+        return caches[self.backend_alias] if self.backend_alias else None
+
+    def get(self, key):
+        now = time.time()
+        value = self._get_local(key, now)
+        if value is not None:
+            return value
+        if self.backend is not None:
+            return self._shared_hit(key, self.backend.get(self.key_prefix + key), now)
+        return self._miss()
+
+    async def aget(self, key):
+        """get 의 비동기 버전 (2차 저장소는 Django 캐시의 비동기 API 로 조회)"""
+        now = time.time()
+        value = self._get_local(key, now)
+        if value is not None:
+            return value
+        if self.backend is not None:
+            return self._shared_hit(key, await self.backend.aget(self.key_prefix + key), now)
+        return self._miss()
+
+    def set(self, key, value, ttl=None):
+        expires_at, ttl = self._expiry(ttl)
+        if expires_at is None:
+            return
+        self._store_local(key, value, expires_at)
+        if self.backend is not None:
+            self.backend.set(self.key_prefix + key, (expires_at, value), int(ttl) + 1)
+
+    async def aset(self, key, value, ttl=None):
+        """set 의 비동기 버전"""
+        expires_at, ttl = self._expiry(ttl)
+        if expires_at is None:
+            return
+        self._store_local(key, value, expires_at)
+        if self.backend is not None:
+            await self.backend.aset(self.key_prefix + key, (expires_at, value), int(ttl) + 1)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(self.key_prefix + key)
+
+    def get_or_load(self, key, loader):
+        """
+        캐시에 없으면 loader() 를 호출해 채운다. loader 는 (value, ttl) 을 반환하며 value 가 None 이면 저장하지 않는다.
+        같은 키로 동시에 들어온 요청은 하나의 loader 호출 결과를 함께 기다린다 (single-flight).
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            value, ttl = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            call.value = value
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.event.set()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+    def _get_local(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+        return None
+
+    def _shared_hit(self, key, entry, now):
+        if entry is not None and entry[0] > now:
+            self._store_local(key, entry[1], entry[0])
+            with self._lock:
+                self.shared_hits += 1
+            return entry[1]
+        return self._miss()
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _expiry(self, ttl):
+        """(만료 시각, 실제 TTL), 저장하지 않을 TTL 이면 (None, None)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return None, None
+        return time.time() + ttl, ttl
+
+    def _store_local(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
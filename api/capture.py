@@ -0,0 +1,117 @@
+"""
+부하 테스트용 트래픽 캡처 (TRAFFIC_CAPTURE_FILE 이 설정된 경우에만 동작)
+
+요청 내용 대신 "모양"만 'api.capture' 로거로 남긴다 (benchmarks/replay.py 가 읽어 재현).
+- URL 은 라우트 패턴(api/diary/<int:pk>/), pk 값은 남기지 않는다
+- 쿼리 파라미터는 이름만, 값은 QUERY_VALUES 에 있는 것만
+- JSON 본문은 문자열 -> 길이, 숫자 -> "number" 로 바꾼 구조 (대화 턴 수와 메시지 길이가 남는다)
+- 사용자는 SECRET_KEY 로 만든 HMAC 해시 (같은 사용자의 요청끼리 묶을 수만 있다)
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger('api.capture')
+
+# 값까지 남겨도 되는 쿼리 파라미터 (나머지는 이름만)
+QUERY_VALUES = {'fields', 'page_size', 'preview_chars', 'async', 'start', 'end'}
+# 본문 모양을 기록할 최대 크기
+MAX_BODY_BYTES = 1024 * 1024
+MAX_LIST_ITEMS = 200
+
+
+def body_shape(value):
+    """JSON 값의 모양: 문자열은 길이, 숫자는 "number", bool / None 은 그대로"""
+    if isinstance(value, dict):
+        return {str(key): body_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [body_shape(item) for item in value[:MAX_LIST_ITEMS]]
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, bool) or value is None:
+        return value
+    return "number"
+
+
+def user_hash(user):
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    digest = hmac.new(settings.SECRET_KEY.encode(), f"capture:{user.pk}".encode(), hashlib.sha256)
+    return digest.hexdigest()[:12]
+
+
+class TrafficCaptureMiddleware:
+    """요청마다 라우트, 크기, 본문 모양, 처리 시간을 기록한다"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_CAPTURE_FILE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE_RATE:
+            return self.get_response(request)
+        entry = self.start(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.finish(request, response, entry, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.TRAFFIC_CAPTURE_SAMPLE_RATE:
+            return await self.get_response(request)
+        entry = self.start(request)
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.finish(request, response, entry, time.perf_counter() - started)
+        return response
+
+    def start(self, request):
+        entry = {
+            "t": round(time.time(), 3),
+            "method": request.method,
+            "query": {
+                key: (request.GET.get(key) if key in QUERY_VALUES else None)
+                for key in request.GET
+            },
+            "request_bytes": int(request.META.get('CONTENT_LENGTH') or 0),
+            "body": None,
+        }
+        # 뷰가 스트림을 읽기 전에 본문을 읽어 둔다 (request.body 로 캐시되어 DRF 도 그대로 사용)
+        if (entry["request_bytes"] and entry["request_bytes"] <= MAX_BODY_BYTES
+                and request.content_type == 'application/json'):
+            try:
+                entry["body"] = body_shape(json.loads(request.body))
+            except ValueError:
+                pass
+        return entry
+
+    def finish(self, request, response, entry, elapsed):
+        try:
+            match = getattr(request, 'resolver_match', None) or resolve(request.path_info)
+            entry["route"] = match.route
+            # 연 / 월 같은 정수 인자만 남긴다 (pk, 작업 UUID 는 재현할 때 새로 채운다)
+            entry["kwargs"] = {key: value for key, value in match.kwargs.items() if key != 'pk' and isinstance(value, int)}
+        except Resolver404:
+            entry["route"] = None
+            entry["kwargs"] = {}
+        entry["user"] = user_hash(getattr(request, 'user', None))
+        entry["status"] = response.status_code
+        entry["streaming"] = response.streaming
+        entry["response_bytes"] = None if response.streaming else len(response.content)
+        entry["duration_ms"] = round(elapsed * 1000, 2)
+        logger.info("request", extra={"capture": entry})
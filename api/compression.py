@@ -0,0 +1,196 @@
+"""
+응답 압축 (Accept-Encoding 협상: zstd / br / gzip)
+
+- 클라이언트의 q 값이 가장 큰 인코딩을 쓰고, 같으면 COMPRESSION_ENCODINGS 순서를 따른다.
+  br 은 brotli (또는 brotlicffi), zstd 는 zstandard 가 설치되어 있을 때만 협상한다.
+- JSON / 텍스트 응답 중 COMPRESSION_MIN_BYTES 보다 작은 응답, 압축해도 줄지 않는 응답,
+  이미 Content-Encoding 이 있는 응답, SSE(text/event-stream)는 그대로 보낸다.
+  SSE 는 이벤트마다 바로 전달되어야 하는데 압축기는 출력을 모아 두기 때문.
+- 스트리밍 응답은 청크마다 압축하고 flush 해서 바로 내보낸다 (Content-Length 제거).
+  flush 하지 않으면 압축기가 출력을 모아 두어 청크가 끝까지 전달되지 않는다.
+- 압축하면 ETag 를 약한 ETag(W/) 로 바꾼다 (If-None-Match 는 그대로 동작, If-Match 는 api/conditional.py 참고)
+"""
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:  # 선택 의존성
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:  # 선택 의존성
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml')
+GZIP_WBITS = 16 + zlib.MAX_WBITS  # gzip 헤더 (mtime 0 이라 같은 내용이면 같은 출력)
+
+
+# 압축기 생성 함수는 (compress, flush, finish) 를 반환한다. flush 는 지금까지 넣은 데이터를 모두 내보낸다
+def _gzip(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli(quality):
+    compressor = brotli.Compressor(quality=quality)
+    return compressor.process, compressor.flush, compressor.finish
+
+
+def _zstd(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush
+
+
+def compressors():
+    """인코딩 -> (압축기 생성 함수, 레벨), 설치된 것만"""
+    available = {'gzip': (_gzip, settings.COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        available['br'] = (_brotli, settings.COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        available['zstd'] = (_zstd, settings.COMPRESSION_ZSTD_LEVEL)
+    return available
+
+
+def parse_accept_encoding(header):
+    """"gzip, br;q=0.8" -> {"gzip": 1.0, "br": 0.8}"""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = item.strip().split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header, preference):
+    """preference (서버 선호 순서) 중 클라이언트가 받는 인코딩 (없으면 None)"""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in preference:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compressible(response):
+    content_type = response.get('Content-Type', '').lower()
+    return (
+        not response.has_header('Content-Encoding')
+        and 200 <= response.status_code and response.status_code not in (204, 304)
+        and not content_type.startswith('text/event-stream')
+        and (content_type.startswith(COMPRESSIBLE_TYPES) or '+json' in content_type or '+xml' in content_type)
+    )
+
+
+def compress_iterator(iterator, compress, flush, finish, encoding):
+    original = sent = 0
+    for chunk in iterator:
+        original += len(chunk)
+        data = compress(chunk) + flush()
+        if data:
+            sent += len(data)
+            yield data
+    data = finish()
+    sent += len(data)
+    yield data
+    metrics.compression_bytes.inc(encoding, 'original', amount=original)
+    metrics.compression_bytes.inc(encoding, 'compressed', amount=sent)
+
+
+async def acompress_iterator(iterator, compress, flush, finish, encoding):
+    original = sent = 0
+    async for chunk in iterator:
+        original += len(chunk)
+        data = compress(chunk) + flush()
+        if data:
+            sent += len(data)
+            yield data
+    data = finish()
+    sent += len(data)
+    yield data
+    metrics.compression_bytes.inc(encoding, 'original', amount=original)
+    metrics.compression_bytes.inc(encoding, 'compressed', amount=sent)
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.compressors = compressors()
+        self.preference = [encoding for encoding in settings.COMPRESSION_ENCODINGS if encoding in self.compressors]
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.process(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+        if not compressible(response):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.preference)
+        if encoding is None:
+            return response
+        factory, level = self.compressors[encoding]
+        compress, flush, finish = factory(level)
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_iterator(
+                    response.streaming_content, compress, flush, finish, encoding)
+            else:
+                response.streaming_content = compress_iterator(
+                    response.streaming_content, compress, flush, finish, encoding)
+            del response.headers['Content-Length']
+        else:
+            with metrics.stage('compress'):
+                content = response.content
+                compressed = compress(content) + finish()
+            if len(compressed) >= len(content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+            metrics.compression_bytes.inc(encoding, 'original', amount=len(content))
+            metrics.compression_bytes.inc(encoding, 'compressed', amount=len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,104 @@
+"""
+diary/list/, diary/<pk>/ 조건부 요청 (ETag / Last-Modified)
+직렬화 전에 가벼운 쿼리 한 번으로 검증값을 계산해 If-None-Match / If-Modified-Since 는 304,
+If-Match 가 맞지 않는 수정 요청은 412 로 바로 응답한다.
+"""
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+from .cache import hash_key
+from .models import Diary
+
+
+def latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def diary_validators(user, pk):
+    """(etag, last_modified) 또는 일기가 없으면 None"""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    row = (
+        Diary.objects.filter(user=user, pk=pk)
+        .values_list('updated_at', 'sentiment_analysis__id', 'sentiment_analysis__updated_at')
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, sentiment_id, sentiment_updated_at = row
+    etag = quote_etag(hash_key('diary', pk, updated_at.isoformat(), sentiment_id,
+                               sentiment_updated_at.isoformat() if sentiment_updated_at else None))
+    return etag, latest(updated_at, sentiment_updated_at)
+
+
+def diary_list_validators(user, request):
+    """
+    사용자 일기 전체의 버전 (개수 + 마지막 수정 시각)
+    삭제는 개수로, 작성/수정/감정 분석 변경은 마지막 수정 시각으로 드러난다.
+    응답이 쿼리스트링(fields, cursor 등)에 따라 달라지므로 ETag 에 함께 넣는다.
+    """
+    version = Diary.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        updated_at=Max('updated_at'),
+        sentiment_updated_at=Max('sentiment_analysis__updated_at'),
+    )
+    last_modified = latest(version['updated_at'], version['sentiment_updated_at'])
+    etag = quote_etag(hash_key(
+        'diary_list', user.id, version['count'],
+        last_modified.isoformat() if last_modified else None,
+        request.get_full_path(),
+    ))
+    return etag, last_modified
+
+
+def etag_matches(header, etag):
+    """
+    If-Match / If-None-Match 헤더 값에 etag 가 있는지
+    압축한 응답은 ETag 가 약한 ETag(W/"...") 로 나가지만 (api/compression.py) ETag 는 인코딩과 무관한
+    일기 버전이므로, If-Match 에서도 W/ 를 떼고 opaque-tag 끼리 비교한다.
+    """
+    tags = parse_etags(header)
+    return '*' in tags or opaque_tag(etag) in {opaque_tag(tag) for tag in tags}
+
+
+def opaque_tag(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def check(request, etag, last_modified):
+    """
+    조건이 맞으면 304 / 412 응답, 아니면 None
+    평가 순서는 django.utils.cache.get_conditional_response 와 같다 (RFC 9110 13.2.2).
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    safe = request.method in ('GET', 'HEAD')
+    if_match = request.META.get('HTTP_IF_MATCH')
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+
+    if if_match:
+        if not etag_matches(if_match, etag):
+            return HttpResponse(status=412)
+    else:
+        if_unmodified_since = parse_http_date_safe(request.META.get('HTTP_IF_UNMODIFIED_SINCE'))
+        if if_unmodified_since is not None and timestamp is not None and timestamp > if_unmodified_since:
+            return HttpResponse(status=412)
+
+    if if_none_match:
+        if etag_matches(if_none_match, etag):
+            return set_headers(HttpResponseNotModified(), etag, last_modified) if safe else HttpResponse(status=412)
+    elif safe:
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+        if if_modified_since is not None and timestamp is not None and timestamp <= if_modified_since:
+            return set_headers(HttpResponseNotModified(), etag, last_modified)
+    return None
+
+
+def set_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
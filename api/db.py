@@ -0,0 +1,16 @@
+"""
+SQLite 연결 설정
+settings.SQLITE_PRAGMAS 를 새 연결마다 적용한다 (OPTIONS['init_command'] 는 Django 5.1 미만 SQLite 에서 지원되지 않음).
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for pragma in getattr(settings, 'SQLITE_PRAGMAS', ()):
+        connection.connection.execute(f"PRAGMA {pragma}")
+
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='sqlite_pragmas')
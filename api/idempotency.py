@@ -0,0 +1,160 @@
+"""
+chat/end 중복 요청 제거
+Idempotency-Key 헤더가 같은 요청은 한 번만 처리하고 저장된 응답(IDEMPOTENCY_TTL 동안)을 그대로 돌려준다.
+- 같은 키를 다른 본문으로 다시 쓰면 422 (키와 함께 본문 해시를 저장해서 비교)
+- 헤더가 없으면 사용자 + 대화 내용 해시를 키로 쓰되, 더블 클릭 같은 짧은 중복만 막도록
+  IDEMPOTENCY_PAYLOAD_TTL 동안만 저장한다 (같은 대화로 다시 일기를 만드는 것은 막지 않는다)
+- 같은 요청이 처리 중이면 그 결과를 IDEMPOTENCY_LOCK_TIMEOUT 까지 기다렸다가 돌려주고, 그래도 끝나지 않으면 409
+스트리밍 응답(chat/end/stream)은 begin() 으로 시작하고 스트림이 끝날 때 finish() / release() 를 호출한다.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .cache import hash_key
+
+KEY_PREFIX = 'idempotency:'
+PENDING = 'pending'
+DONE = 'done'
+POLL_INTERVAL = 0.25  # 초
+
+IN_PROGRESS_PAYLOAD = {"error": "A request with the same Idempotency-Key is still in progress."}
+MISMATCH_PAYLOAD = {"error": "Idempotency-Key was already used with a different request body."}
+
+
+@dataclass(frozen=True)
+class RequestKey:
+    cache_key: str
+    fingerprint: str  # 요청 본문 해시
+    ttl: int  # 저장된 응답 보관 시간 (초)
+
+
+def request_key(request, user, conversation_data, background=False):
+    fingerprint = hash_key(json.dumps(conversation_data, sort_keys=True, ensure_ascii=False))
+    key = request.headers.get('Idempotency-Key')
+    if key:
+        return RequestKey(hash_key('key', user.id, background, key), fingerprint, settings.IDEMPOTENCY_TTL)
+    return RequestKey(hash_key('payload', user.id, background, fingerprint), fingerprint,
+                      settings.IDEMPOTENCY_PAYLOAD_TTL)
+
+
+def _cache():
+    return caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+
+
+def _resolve(key, entry):
+    """
+    캐시 항목 -> 저장된 응답이면 (payload, status_code, True), 다른 본문에 쓰인 키면 422,
+    처리 중이면 409, 없으면 None
+    """
+    if entry is None:
+        return None
+    if entry.get("fingerprint") != key.fingerprint:
+        return MISMATCH_PAYLOAD, 422, False
+    if entry["state"] == DONE:
+        return entry["payload"], entry["status"], True
+    return IN_PROGRESS_PAYLOAD, 409, False
+
+
+def _pending(key):
+    return {"state": PENDING, "fingerprint": key.fingerprint}
+
+
+def _done(key, payload, status_code):
+    return {"state": DONE, "fingerprint": key.fingerprint, "payload": payload, "status": status_code}
+
+
+def _acquire(key):
+    """처리 권한을 얻는다 (cache.add 는 원자적이므로 한 요청만 성공)"""
+    return _cache().add(KEY_PREFIX + key.cache_key, _pending(key), settings.IDEMPOTENCY_LOCK_TIMEOUT)
+
+
+def finish(key, payload, status_code):
+    # 서버 오류는 저장하지 않아 재시도할 수 있게 한다
+    if status_code >= 500:
+        release(key)
+    else:
+        _cache().set(KEY_PREFIX + key.cache_key, _done(key, payload, status_code), key.ttl)
+
+
+def release(key):
+    _cache().delete(KEY_PREFIX + key.cache_key)
+
+
+async def afinish(key, payload, status_code):
+    if status_code >= 500:
+        await arelease(key)
+    else:
+        await _cache().aset(KEY_PREFIX + key.cache_key, _done(key, payload, status_code), key.ttl)
+
+
+async def arelease(key):
+    await _cache().adelete(KEY_PREFIX + key.cache_key)
+
+
+def begin(key):
+    """
+    처리 권한을 얻으면 None (이후 finish / release 는 호출한 쪽에서),
+    저장된 응답이 있거나 같은 요청이 처리 중이면 (payload, status_code, replayed)
+    """
+    if _acquire(key):
+        return None
+    # 그 사이에 앞선 요청이 끝나 항목이 사라졌으면 409 (클라이언트가 다시 시도)
+    return _resolve(key, _cache().get(KEY_PREFIX + key.cache_key)) or (IN_PROGRESS_PAYLOAD, 409, False)
+
+
+def _settled(key, entry, deadline):
+    """
+    처리 권한을 얻지 못했을 때 캐시 항목으로 정한 응답, 계속 기다려야 하면 None
+    (항목이 사라졌으면 앞선 요청이 실패한 것이므로 None 을 돌려 다시 처리 권한을 얻어 본다)
+    """
+    stored = _resolve(key, entry)
+    if stored is not None and (stored[1] != 409 or time.monotonic() > deadline):
+        return stored
+    return None
+
+
+def run_once(key, func):
+    """
+    같은 키에 대해 func() -> (payload, status_code) 를 한 번만 실행한다.
+    (payload, status_code, replayed) 를 반환하며, replayed 는 저장된 응답을 돌려준 경우 True
+    같은 요청이 처리 중이면 그 결과를 IDEMPOTENCY_LOCK_TIMEOUT 까지 기다린다 (넘으면 409).
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+    while True:
+        if _acquire(key):
+            try:
+                payload, status_code = func()
+            except Exception:
+                release(key)
+                raise
+            finish(key, payload, status_code)
+            return payload, status_code, False
+
+        stored = _settled(key, _cache().get(KEY_PREFIX + key.cache_key), deadline)
+        if stored is not None:
+            return stored
+        time.sleep(POLL_INTERVAL)
+
+
+async def arun_once(key, func):
+    """run_once 의 비동기 버전 (func 는 코루틴 함수, 캐시는 비동기 API 사용)"""
+    deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+    while True:
+        if await _cache().aadd(KEY_PREFIX + key.cache_key, _pending(key), settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            try:
+                payload, status_code = await func()
+            except BaseException:
+                await arelease(key)
+                raise
+            await afinish(key, payload, status_code)
+            return payload, status_code, False
+
+        stored = _settled(key, await _cache().aget(KEY_PREFIX + key.cache_key), deadline)
+        if stored is not None:
+            return stored
+        await asyncio.sleep(POLL_INTERVAL)
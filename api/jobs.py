@@ -0,0 +1,216 @@
+"""
+DB 에 저장되는 일기 생성 작업 큐
+별도 브로커 없이 DiaryJob 테이블을 큐로 사용하고, 프로세스 내 스레드 풀이나
+`manage.py run_diary_jobs` 워커가 작업을 가져가 처리한다.
+
+- 작업을 가져갈 때마다 attempts 를 올리고, DIARY_JOB_MAX_ATTEMPTS 를 채운 작업은 더 가져가지 않고 실패 처리
+  (처리 중 워커가 죽어 복구된 작업도 횟수에 포함)
+- 예외가 나거나 Gemini 가 일시적으로 응답하지 못한 작업(503: 장애 / 타임아웃 / 브레이커 열림)은
+  run_after 까지 기다렸다가 다시 처리한다 (DIARY_JOB_RETRY_BASE_SECONDS 부터 두 배씩, DIARY_JOB_RETRY_MAX_SECONDS 까지)
+- 일기를 저장한 뒤 실패한 작업은 다시 처리할 때 일기를 새로 만들지 않고 감정 분석과 응답만 다시 만든다
+- 프로세스 내 워커는 프로세스의 첫 요청에서 시작하면서 남아 있던 작업을 복구한다 (apps.py, fork 이후)
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import services
+from .models import DiaryJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# 나중에 다시 시도할 응답 코드 (services.gemini_unavailable)
+RETRYABLE_STATUS_CODES = (503,)
+
+
+def wants_background(request):
+    """?async=true 또는 Prefer: respond-async 헤더로 백그라운드 처리를 요청했는지"""
+    if request.GET.get('async', '').lower() in ('1', 'true'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def accepted_payload(job):
+    return {
+        "code": 202,
+        "message": "Diary generation queued",
+        "jobId": str(job.id),
+        "status": job.status,
+    }
+
+
+def status_payload(job):
+    payload = {
+        "jobId": str(job.id),
+        "status": job.status,
+    }
+    if job.status in (DiaryJob.STATUS_DONE, DiaryJob.STATUS_FAILED):
+        payload["statusCode"] = job.status_code
+        payload["result"] = job.result
+    return payload
+
+
+def enqueue(user, conversation_data):
+    job = DiaryJob.objects.create(user=user, conversation_data=conversation_data)
+    if settings.DIARY_JOB_INPROCESS_WORKERS:
+        ensure_workers()
+        _executor.submit(run_job, job.id)
+    return job
+
+
+def _reset_after_fork():
+    # 부모 프로세스에서 만든 스레드 풀은 fork 된 자식에서 동작하지 않는다 (gunicorn --preload)
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def start_workers(sender=None, **kwargs):
+    """request_started 수신: 프로세스의 첫 요청에서 워커를 시작하고 남아 있던 작업을 복구"""
+    ensure_workers()
+
+
+def ensure_workers():
+    """프로세스 내 워커 풀을 시작한다. 처음 시작할 때 이전 프로세스가 남긴 작업을 복구해 다시 넣는다"""
+    global _executor
+    if _executor is not None or not settings.DIARY_JOB_INPROCESS_WORKERS:
+        return
+    with _executor_lock:
+        if _executor is not None:
+            return
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DIARY_JOB_WORKERS,
+            thread_name_prefix='diary-job',
+        )
+    for job_id in recover_jobs():
+        _executor.submit(run_job, job_id)
+    # 재시도를 기다리던 작업은 run_after 에 맞춰 넣는다
+    now = timezone.now()
+    for job_id, run_after in DiaryJob.objects.filter(
+        status=DiaryJob.STATUS_PENDING, run_after__gt=now,
+    ).values_list('id', 'run_after'):
+        schedule(job_id, (run_after - now).total_seconds())
+
+
+def schedule(job_id, delay):
+    """프로세스 내 워커가 delay 초 뒤에 작업을 처리하게 한다 (워커가 없으면 run_diary_jobs 가 가져간다)"""
+    if _executor is None:
+        return
+    if delay <= 0:
+        _executor.submit(run_job, job_id)
+        return
+    timer = threading.Timer(delay, schedule, (job_id, 0))
+    timer.daemon = True
+    timer.start()
+
+
+def retry_delay(attempts):
+    """attempts 번째 시도가 실패한 뒤 다시 처리할 때까지 기다릴 시간 (초, 지수 백오프)"""
+    return min(settings.DIARY_JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.DIARY_JOB_RETRY_MAX_SECONDS)
+
+
+def _due():
+    return Q(run_after__isnull=True) | Q(run_after__lte=timezone.now())
+
+
+def recover_jobs():
+    """
+    lease 시간 동안 끝나지 않은 running 작업(워커가 죽은 경우)을 pending 으로 되돌리고
+    지금 처리해야 할 pending 작업 id 목록을 반환 (run_after 가 지나지 않은 작업은 빠진다)
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.DIARY_JOB_LEASE_SECONDS)
+    recovered = DiaryJob.objects.filter(
+        status=DiaryJob.STATUS_RUNNING, locked_at__lt=stale_before
+    ).update(status=DiaryJob.STATUS_PENDING, locked_at=None)
+    if recovered:
+        logger.warning("Recovered %d stale diary jobs", recovered)
+
+    # 시도 횟수를 다 쓴 작업 (마지막 시도 중 워커가 죽은 경우)
+    exhausted = DiaryJob.objects.filter(
+        status=DiaryJob.STATUS_PENDING, attempts__gte=settings.DIARY_JOB_MAX_ATTEMPTS
+    ).update(
+        status=DiaryJob.STATUS_FAILED,
+        result={"error": "Failed to generate diary: too many attempts"},
+        status_code=500,
+        updated_at=timezone.now(),
+    )
+    if exhausted:
+        logger.error("Gave up on %d diary jobs after %d attempts", exhausted, settings.DIARY_JOB_MAX_ATTEMPTS)
+
+    return list(
+        DiaryJob.objects.filter(_due(), status=DiaryJob.STATUS_PENDING)
+        .order_by('created_at')
+        .values_list('id', flat=True)
+    )
+
+
+def claim(job_id):
+    """
+    조건부 UPDATE 로 작업을 가져간다. 여러 워커 / 프로세스가 같은 작업을 받아도 하나만 성공한다.
+    (SQLite 에는 SELECT ... SKIP LOCKED 가 없으므로 행 잠금 대신 사용)
+    시도 횟수를 다 쓴 작업은 가져가지 않는다 (recover_jobs 에서 실패 처리)
+    재시도 대기 중(run_after 전)인 작업도 가져가지 않는다
+    """
+    claimed = DiaryJob.objects.filter(
+        _due(), pk=job_id, status=DiaryJob.STATUS_PENDING, attempts__lt=settings.DIARY_JOB_MAX_ATTEMPTS,
+    ).update(
+        status=DiaryJob.STATUS_RUNNING,
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    return claimed == 1
+
+
+def run_job(job_id):
+    try:
+        if not claim(job_id):
+            return
+        job = DiaryJob.objects.select_related('user', 'diary').get(pk=job_id)
+
+        try:
+            if job.diary is not None:
+                # 이전 시도에서 일기는 저장됨
+                payload, status_code = services.complete_diary(job.diary)
+            else:
+                payload, status_code = services.generate_diary(job.user, job.conversation_data, job=job)
+        except Exception as e:
+            logger.exception("Diary job %s failed", job_id)
+            if job.attempts < settings.DIARY_JOB_MAX_ATTEMPTS:
+                retry_later(job)
+                return
+            payload, status_code = {"error": f"Failed to generate diary: {e}"}, 500
+        else:
+            if status_code in RETRYABLE_STATUS_CODES and job.attempts < settings.DIARY_JOB_MAX_ATTEMPTS:
+                logger.warning("Diary job %s got %d, retrying later", job_id, status_code)
+                retry_later(job)
+                return
+
+        job.status = DiaryJob.STATUS_DONE if status_code < 400 else DiaryJob.STATUS_FAILED
+        job.result = payload
+        job.status_code = status_code
+        job.save(update_fields=['status', 'result', 'status_code', 'updated_at'])
+    finally:
+        close_old_connections()
+
+
+def retry_later(job):
+    """작업을 pending 으로 되돌리고 retry_delay 뒤에 다시 처리한다"""
+    delay = retry_delay(job.attempts)
+    job.status = DiaryJob.STATUS_PENDING
+    job.locked_at = None
+    job.run_after = timezone.now() + timedelta(seconds=delay)
+    job.save(update_fields=['status', 'locked_at', 'run_after', 'updated_at'])
+    schedule(job.id, delay)
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api import sentiment as local_sentiment
+from api import mood_calendar, rollup, services
+from api.models import Diary, SentimentAnalysis
+
+
+class RateLimiter:
+    """초당 rate 회로 호출 간격을 맞춘다 (여러 스레드 공유)"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_until = max(now, self.next_at)
+            self.next_at = wait_until + self.interval
+        delay = wait_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def affected_diaries(include_local=False):
+    """
+    감정 분석 결과가 없거나, 이전 랜덤 기본값(엔진 기록 없음 + score 1.0)으로 저장된 일기
+    include_local 이면 로컬 분석기 결과도 다시 분석한다.
+    """
+    condition = Q(sentiment_analysis__isnull=True) | Q(sentiment_analysis__source='', sentiment_analysis__score=1)
+    if include_local:
+        condition |= Q(sentiment_analysis__source=SentimentAnalysis.SOURCE_LOCAL)
+    return Diary.objects.filter(condition).order_by('id')
+
+
+class Command(BaseCommand):
+    help = "감정 분석 결과가 없거나 랜덤 기본값으로 저장된 일기를 일괄로 다시 분석합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--engine', choices=['clova', 'local'], default='clova',
+                            help="clova: Clova 호출 (실패 시 로컬 분석기), local: 로컬 분석기만 사용")
+        parser.add_argument('--chunk-size', type=int, default=500, help="한 번에 읽고 저장할 일기 수")
+        parser.add_argument('--concurrency', type=int, default=4, help="동시에 보낼 Clova 요청 수")
+        parser.add_argument('--rate', type=float, default=10.0, help="초당 최대 Clova 요청 수 (0 이면 제한 없음)")
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, '.backfill_sentiment.checkpoint'),
+                            help="마지막으로 처리한 일기 id 를 기록할 파일")
+        parser.add_argument('--restart', action='store_true', help="체크포인트를 무시하고 처음부터 처리")
+        parser.add_argument('--include-local', action='store_true', help="로컬 분석기 결과도 다시 분석")
+        parser.add_argument('--limit', type=int, default=None, help="최대 처리 일기 수")
+        parser.add_argument('--dry-run', action='store_true', help="대상 수만 출력")
+
+    def handle(self, *args, **options):
+        queryset = affected_diaries(options['include_local'])
+
+        last_id = 0 if options['restart'] else self.read_checkpoint(options['checkpoint'])
+        if last_id:
+            self.stdout.write(f"Resuming after diary id {last_id}")
+            queryset = queryset.filter(id__gt=last_id)
+
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count()} diaries to backfill")
+            return
+
+        limiter = RateLimiter(options['rate'])
+        started = time.monotonic()
+        total = clova_failures = 0
+        remaining = options['limit']
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            while remaining is None or remaining > 0:
+                # 저장하면 대상 조건이 바뀌므로 열린 커서를 읽으면서 쓰지 않고, id 순서로 한 덩어리씩 읽어 둔다
+                size = options['chunk_size'] if remaining is None else min(options['chunk_size'], remaining)
+                chunk = list(
+                    queryset.filter(id__gt=last_id)
+                    .values_list('id', 'content', 'user_id', 'created_at')[:size]
+                )
+                if not chunk:
+                    break
+                chunk_started = time.monotonic()
+
+                ids = [row[0] for row in chunk]
+                contents = [row[1] for row in chunk]
+                if options['engine'] == 'local':
+                    results = [(analysis, SentimentAnalysis.SOURCE_LOCAL) for analysis in local_sentiment.analyze_many(contents)]
+                else:
+                    results = list(executor.map(lambda content: self.analyze_clova(content, limiter), contents))
+                    clova_failures += sum(1 for _, source in results if source != SentimentAnalysis.SOURCE_CLOVA)
+
+                self.write_results(chunk, results)
+                last_id = ids[-1]
+                self.write_checkpoint(options['checkpoint'], last_id)
+                if remaining is not None:
+                    remaining -= len(chunk)
+
+                total += len(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{total} diaries (last id {ids[-1]}) "
+                    f"chunk {len(chunk) / max(time.monotonic() - chunk_started, 1e-9):.1f}/s, "
+                    f"overall {total / max(elapsed, 1e-9):.1f}/s"
+                )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {total} diaries in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f}/s), "
+            f"Clova fallbacks: {clova_failures}"
+        ))
+
+    def analyze_clova(self, content, limiter):
+        limiter.wait()
+        analysis = services.request_sentiment(content)
+        if analysis is not None:
+            return analysis, SentimentAnalysis.SOURCE_CLOVA
+        return local_sentiment.analyze(content), SentimentAnalysis.SOURCE_LOCAL
+
+    def write_results(self, chunk, results):
+        ids = [row[0] for row in chunk]
+        existing = SentimentAnalysis.objects.in_bulk(ids, field_name='diary_id')
+        now = timezone.now()  # bulk_update 는 auto_now 를 채우지 않는다
+        to_create, to_update, changes = [], [], []
+        for (diary_id, _, user_id, created_at), (analysis, source) in zip(chunk, results):
+            fields = services.sentiment_defaults(analysis, source)
+            sentiment_analysis = existing.get(diary_id)
+            if sentiment_analysis is None:
+                to_create.append(SentimentAnalysis(diary_id=diary_id, **fields))
+                old = None
+            else:
+                old = rollup.entry(user_id, created_at, sentiment_analysis.sentiment, sentiment_analysis.score)
+                for name, value in fields.items():
+                    setattr(sentiment_analysis, name, value)
+                sentiment_analysis.updated_at = now
+                to_update.append(sentiment_analysis)
+            changes.append((old, rollup.entry(user_id, created_at, fields['sentiment'], fields['score'])))
+
+        with transaction.atomic():
+            SentimentAnalysis.objects.bulk_create(to_create)
+            SentimentAnalysis.objects.bulk_update(to_update, ['sentiment', 'score', 'source', 'updated_at'])
+            # bulk 저장은 시그널을 보내지 않으므로 바뀐 (사용자, 날짜) 집계만 직접 증감하고 캘린더 캐시를 지운다
+            rollup.apply_changes(changes)
+        mood_calendar.invalidate_for_diaries(ids)
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def write_checkpoint(self, path, last_id):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(last_id))
+        os.replace(tmp_path, path)
@@ -0,0 +1,89 @@
+import re
+from datetime import date, datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Max
+
+from api import mood_calendar
+from api.models import DailySentimentRollup, Diary, DiaryJob, SentimentAnalysis
+from api.pagination import DiaryCursorPagination
+
+# 실행 계획에서 인덱스 사용 / 전체 스캔 / 정렬용 임시 테이블을 찾는 패턴 (SQLite, PostgreSQL)
+INDEX_PATTERN = re.compile(r'USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY|Index Scan|Index Only Scan|Bitmap Index Scan')
+FULL_SCAN_PATTERN = re.compile(r'\bSCAN \w+(?! USING)|Seq Scan')
+SORT_PATTERN = re.compile(r'USE TEMP B-TREE FOR ORDER BY|\bSort\b')
+
+
+def query_shapes(user_id):
+    """
+    api/ 에서 실제로 실행하는 조회 형태들 (뷰 / 모듈의 쿼리와 같은 조건, 같은 정렬)
+    새 조회를 추가하거나 바꾸면 여기도 같이 바꾼다.
+    """
+    cursor_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    start, end = date(2024, 1, 1), date(2024, 1, 31)
+    lower, upper = mood_calendar.month_bounds(2024, 1)
+    # DiaryViewSet.list (기본 필드: emoji 때문에 sentiment_analysis JOIN)
+    list_queryset = (
+        Diary.objects.filter(user_id=user_id)
+        .select_related('sentiment_analysis')
+        .only('id', 'title', 'content', 'created_at', 'sentiment_analysis__sentiment')
+        .order_by('-created_at', '-id')
+    )
+    page = settings.DIARY_LIST_PAGE_SIZE + 1
+    return [
+        ("diary list (first page)", list_queryset[:page]),
+        ("diary list (after cursor)", DiaryCursorPagination.filter_after(list_queryset, cursor_at, 1)[:page]),
+        # conditional.diary_list_validators
+        ("diary list validators", Diary.objects.filter(user_id=user_id).values('user_id').annotate(
+            count=Count('id'), updated_at=Max('updated_at'), sentiment_updated_at=Max('sentiment_analysis__updated_at'),
+        )),
+        # conditional.diary_validators, DiaryViewSet.get_object
+        ("diary detail validators", Diary.objects.filter(user_id=user_id, pk=1).values_list(
+            'updated_at', 'sentiment_analysis__id', 'sentiment_analysis__updated_at')[:1]),
+        ("diary detail", Diary.objects.filter(user_id=user_id, pk=1).select_related('user', 'sentiment_analysis')),
+        # mood_calendar.build
+        ("mood calendar month", Diary.objects.filter(user_id=user_id, created_at__gte=lower, created_at__lt=upper)
+            .values_list('id', 'sentiment_analysis__sentiment').order_by('created_at', 'id')),
+        # rollup.summary
+        ("sentiment rollup range", DailySentimentRollup.objects.filter(user_id=user_id, date__range=(start, end))),
+        # sentiment/classified, chat/end 감정 분석 조회
+        ("sentiment by diary", SentimentAnalysis.objects.filter(diary_id=1)),
+        # jobs.recover_jobs, jobs.claim
+        ("pending diary jobs", DiaryJob.objects.filter(status=DiaryJob.STATUS_PENDING).order_by('created_at').values_list('id')),
+        ("diary job status", DiaryJob.objects.filter(pk=1, user_id=user_id)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "주요 조회 쿼리의 실행 계획(EXPLAIN)을 출력하고 인덱스를 사용하는지 확인합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, default=1, help="조회에 사용할 사용자 id")
+        parser.add_argument('--verbose-plan', action='store_true', help="전체 실행 계획 출력")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database: {connection.vendor}")
+        missing = 0
+
+        for name, queryset in query_shapes(options['user_id']):
+            plan = queryset.explain()
+            uses_index = bool(INDEX_PATTERN.search(plan))
+            full_scan = bool(FULL_SCAN_PATTERN.search(plan))
+            sorts = bool(SORT_PATTERN.search(plan))
+
+            if uses_index and not full_scan:
+                verdict = self.style.SUCCESS("index")
+            else:
+                verdict = self.style.WARNING("FULL SCAN")
+                missing += 1
+            note = " (+ sort)" if sorts else ""
+            self.stdout.write(f"{verdict:<20} {name}{note}")
+
+            if options['verbose_plan']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} query shape(s) without index"))
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from api import rollup
+
+
+class Command(BaseCommand):
+    help = "SentimentAnalysis 로부터 사용자별 일별 감정 집계(DailySentimentRollup)를 다시 계산합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, action='append', dest='user_ids', help="대상 사용자 id (여러 번 지정 가능)")
+        parser.add_argument('--since', type=date.fromisoformat, default=None, help="시작 날짜 (YYYY-MM-DD, 포함)")
+        parser.add_argument('--until', type=date.fromisoformat, default=None, help="끝 날짜 (YYYY-MM-DD, 포함)")
+
+    def handle(self, *args, **options):
+        count = rollup.rebuild(user_ids=options['user_ids'], start=options['since'], end=options['until'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily rollup rows"))
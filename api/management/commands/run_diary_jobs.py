@@ -0,0 +1,45 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "DB 에 쌓인 일기 생성 작업(DiaryJob)을 처리하는 워커를 실행합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.DIARY_JOB_WORKERS,
+                            help="동시에 처리할 작업 수")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="새 작업을 확인하는 간격 (초)")
+        parser.add_argument('--once', action='store_true',
+                            help="현재 쌓인 작업만 처리하고 종료")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        self.stdout.write(f"Diary job worker started (concurrency={concurrency})")
+
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='diary-job') as executor:
+            while True:
+                for job_id, future in list(in_flight.items()):
+                    if future.done():
+                        del in_flight[job_id]
+
+                # 비어 있는 슬롯만큼만 가져와 한 번에 너무 많은 작업을 잡지 않는다
+                free = concurrency - len(in_flight)
+                if free > 0:
+                    for job_id in jobs.recover_jobs():
+                        if job_id in in_flight:
+                            continue
+                        in_flight[job_id] = executor.submit(jobs.run_job, job_id)
+                        free -= 1
+                        if free == 0:
+                            break
+
+                if options['once'] and not in_flight:
+                    break
+                time.sleep(options['poll_interval'])
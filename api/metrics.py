@@ -0,0 +1,251 @@
+"""
+요청 단계별 소요 시간 측정과 Prometheus 텍스트 형식 지표
+
+- stage(name): 코드 구간의 소요 시간을 현재 요청(contextvar)에 기록하고 단계별 히스토그램에 누적
+- ServerTimingMiddleware: 요청마다 단계 기록을 시작하고 Server-Timing 헤더로 내보내며 요청 지표를 누적
+- DB 쿼리 시간은 커넥션 execute_wrapper 로 'db' 단계에 합산 (sync_to_async 스레드의 쿼리도 포함)
+- metrics_view: /metrics 에서 지표와 캐시 통계, 서킷 브레이커 상태를 출력 (METRICS_TOKEN 이 있을 때만)
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.urls import Resolver404, resolve
+
+from . import resilience
+from .cache import registry as cache_registry
+
+# 초 단위 히스토그램 구간
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# 현재 요청의 {단계: [누적 시간(초), 횟수]} (요청 밖이면 None)
+_timings = ContextVar('request_timings', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label 값 튜플 -> [구간별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for label_values, series in sorted(items):
+            labels = _format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{{{_format_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _format_labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_duration = Histogram('ogoo_request_duration_seconds', "HTTP request duration", ('method', 'route', 'status'))
+stage_duration = Histogram('ogoo_stage_duration_seconds', "Duration of instrumented request stages", ('stage',))
+requests_total = Counter('ogoo_requests_total', "HTTP requests", ('method', 'route', 'status'))
+db_queries_total = Counter('ogoo_db_queries_total', "Database queries", ('route',))
+prompt_tokens = Histogram('ogoo_prompt_tokens', "Estimated Gemini prompt tokens per diary generation", (),
+                          buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000))
+compression_bytes = Counter('ogoo_compression_bytes_total', "Response body bytes before (original) and after (compressed) compression",
+                            ('encoding', 'kind'))
+METRICS = (request_duration, stage_duration, requests_total, db_queries_total, prompt_tokens, compression_bytes)
+
+
+def record(name, seconds):
+    """현재 요청의 단계 시간에 더하고 단계별 히스토그램에 누적"""
+    if not settings.METRICS_ENABLED:
+        return
+    timings = _timings.get()
+    if timings is not None:
+        entry = timings.get(name)
+        if entry is None:
+            timings[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+    stage_duration.observe(seconds, name)
+
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def _time_query(execute, sql, params, many, context):
+    if _timings.get() is None:
+        return execute(sql, params, many, context)
+    with stage('db'):
+        return execute(sql, params, many, context)
+
+
+def install_db_timer(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(install_db_timer, dispatch_uid='metrics_db_timer')
+
+
+def server_timing(timings, total):
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'unmatched'
+    return match.route or match.view_name
+
+
+class ServerTimingMiddleware:
+    """요청별 단계 시간을 Server-Timing 헤더로 내보내고 요청 지표를 누적한다"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        token = _timings.set({})
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = _timings.get()
+            _timings.reset(token)
+        self.finish(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        token = _timings.set({})
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = _timings.get()
+            _timings.reset(token)
+        self.finish(request, response, timings, time.perf_counter() - started)
+        return response
+
+    def finish(self, request, response, timings, total):
+        route = route_name(request)
+        status_code = str(response.status_code)
+        request_duration.observe(total, request.method, route, status_code)
+        requests_total.inc(request.method, route, status_code)
+        if 'db' in timings:
+            db_queries_total.inc(route, amount=timings['db'][1])
+        response['Server-Timing'] = server_timing(timings, total)
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    # api.cache.TTLCache 통계
+    stats = {name: cache.stats() for name, cache in sorted(cache_registry.items())}
+    for key, kind in (('hits', 'counter'), ('shared_hits', 'counter'), ('misses', 'counter'),
+                      ('coalesced', 'counter'), ('evictions', 'counter'), ('size', 'gauge')):
+        name = f"ogoo_cache_{key}" + ("_total" if kind == 'counter' else "")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache_name, cache_stats in stats.items():
+            lines.append(f'{name}{{cache="{_escape(cache_name)}"}} {cache_stats[key]}')
+
+    # api.resilience 서킷 브레이커 (상태 0: closed, 1: half_open, 2: open) / 헤지 요청
+    breakers = sorted(resilience.breakers.items())
+    states = (resilience.CircuitBreaker.CLOSED, resilience.CircuitBreaker.HALF_OPEN, resilience.CircuitBreaker.OPEN)
+    lines.append("# TYPE ogoo_circuit_state gauge")
+    for name, breaker in breakers:
+        lines.append(f'ogoo_circuit_state{{upstream="{_escape(name)}"}} {states.index(breaker.state)}')
+    for key in ('calls', 'failures', 'slow_calls', 'rejected', 'opened'):
+        lines.append(f"# TYPE ogoo_circuit_{key}_total counter")
+        for name, breaker in breakers:
+            lines.append(f'ogoo_circuit_{key}_total{{upstream="{_escape(name)}"}} {breaker.stats[key]}')
+    for key in ('sent', 'won'):
+        lines.append(f"# TYPE ogoo_hedge_{key}_total counter")
+        for name, counts in sorted(resilience.hedge_stats.items()):
+            lines.append(f'ogoo_hedge_{key}_total{{upstream="{_escape(name)}"}} {counts[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """
+    Prometheus 텍스트 형식 지표 (Authorization: Bearer <METRICS_TOKEN> 필요)
+    METRICS_TOKEN 이 비어 있으면 엔드포인트를 열지 않는다 (404)
+    """
+    if not settings.METRICS_TOKEN:
+        return HttpResponseNotFound()
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {settings.METRICS_TOKEN}"):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_diaryjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diary',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='diary_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diary',
+            index=models.Index(fields=['user', 'sentiment'], name='diary_user_sentiment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diaryjob',
+            index=models.Index(fields=['status', 'created_at'], name='diaryjob_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sentimentanalysis',
+            index=models.Index(fields=['sentiment'], name='sentiment_sentiment_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_diary_sentiment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentimentanalysis',
+            name='source',
+            field=models.CharField(blank=True, choices=[('clova', 'Clova'), ('local', 'Local analyzer')], default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_sentimentanalysis_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diaryjob',
+            name='diary',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.diary'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_diaryjob_diary'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='diary',
+            name='diary_user_sentiment_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sentimentanalysis',
+            name='sentiment_sentiment_idx',
+        ),
+        migrations.AlterField(
+            model_name='diary',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='diaries', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_drop_unused_diary_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diaryjob',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -86,12 +86,19 @@ class Diary(models.Model):
     """
     일기 모델
     """
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='diaries')
+    # user 로 찾는 조회는 diary_user_created_idx (user, -created_at, -id) 의 앞 컬럼으로 처리되므로 FK 단독 인덱스는 두지 않는다
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='diaries', db_index=False)
     title = models.CharField(max_length=255)  # 일기 제목
     content = models.TextField()  # 일기 내용
     sentiment = models.CharField(max_length=50, blank=True, null=True) # 감정 저장
     created_at = models.DateTimeField(auto_now_add=True)  # 작성일
     updated_at = models.DateTimeField(auto_now=True)  # 수정일
+
+    class Meta:
+        indexes = [
+            # 사용자별 최신순 목록 / keyset 페이지네이션 (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='diary_user_created_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -114,10 +121,84 @@ class SentimentAnalysis(models.Model):
     """
     감정 분석 결과 모델 (일기와 1:1 관계)
     """
+    SOURCE_CLOVA = 'clova'
+    SOURCE_LOCAL = 'local'
+    SOURCE_CHOICES = [
+        (SOURCE_CLOVA, 'Clova'),
+        (SOURCE_LOCAL, 'Local analyzer'),
+    ]
+
     diary = models.OneToOneField(Diary, on_delete=models.CASCADE, related_name='sentiment_analysis')
     sentiment = models.CharField(max_length=50)  # 예: "긍정", "부정" 등
     score = models.DecimalField(max_digits=5, decimal_places=2)  # 예: 0.85
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, blank=True, default='')  # 분석 엔진 (이전 데이터는 빈 값)
     created_at = models.DateTimeField(auto_now_add=True)  # 감정 분석이 수행된 시점
+    updated_at = models.DateTimeField(auto_now=True)  # 다시 분석(보정)된 시점, ETag / Last-Modified 계산에 사용
 
     def __str__(self):
         return f"Sentiment for {self.diary.title}: {self.sentiment} ({self.score})"
+
+
+class DiaryJob(models.Model):
+    """
+    chat/end 일기 생성 백그라운드 작업 (DB 에 저장되는 작업 큐)
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='diary_jobs')
+    conversation_data = models.JSONField()  # chat/end 로 받은 대화 내용
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    result = models.JSONField(null=True, blank=True)  # 완료 시 chat/end 응답 본문
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # 완료 시 chat/end 응답 코드
+    attempts = models.PositiveSmallIntegerField(default=0)  # 워커가 가져간 횟수 (DIARY_JOB_MAX_ATTEMPTS 까지)
+    # 저장한 일기 (재시도할 때 일기를 다시 만들지 않도록 일기 저장과 같은 트랜잭션에서 기록)
+    diary = models.ForeignKey('Diary', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    locked_at = models.DateTimeField(null=True, blank=True)  # 워커가 작업을 가져간 시점 (복구 판단용)
+    run_after = models.DateTimeField(null=True, blank=True)  # 재시도 대기 중이면 이 시각 이후에 다시 처리
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # 워커가 오래된 pending 작업부터 가져갈 때 사용
+            models.Index(fields=['status', 'created_at'], name='diaryjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"DiaryJob {self.id} ({self.status})"
+
+
+class DailySentimentRollup(models.Model):
+    """
+    사용자별 / 날짜별(Asia/Seoul 기준 일기 작성일) 감정 분석 집계
+    SentimentAnalysis 가 저장/삭제될 때 api/rollup.py 에서 갱신한다.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sentiment_rollups')
+    date = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+    positive_count = models.PositiveIntegerField(default=0)
+    negative_count = models.PositiveIntegerField(default=0)
+    neutral_count = models.PositiveIntegerField(default=0)
+    anger_count = models.PositiveIntegerField(default=0)
+    other_count = models.PositiveIntegerField(default=0)  # 위 네 가지 외의 라벨
+    score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # 평균 점수 = score_sum / total
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # 사용자별 기간 조회에도 사용
+            models.UniqueConstraint(fields=['user', 'date'], name='rollup_user_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Rollup {self.user_id} {self.date} ({self.total})"
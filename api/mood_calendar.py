@@ -0,0 +1,76 @@
+"""
+월별 감정 캘린더 (calendar/<year>/<month>/)
+날짜별 일기 id 와 대표 이모지를 DB 에서 날짜 단위로 묶어 계산하고, 사용자/월 단위로 캐시한다.
+일기나 감정 분석이 저장/삭제되면 해당 월 캐시를 지운다 (api/signals.py).
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.functions import TruncDate
+
+from . import rollup, services
+from .models import Diary
+
+KEY_PREFIX = 'calendar:'
+
+
+def _cache():
+    return caches[settings.CALENDAR_CACHE_ALIAS]
+
+
+def cache_key(user_id, year, month):
+    return f'{KEY_PREFIX}{user_id}:{year}:{month}'
+
+
+def month_bounds(year, month):
+    start = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return rollup.day_bounds(start, next_month - timedelta(days=1))
+
+
+def build(user_id, year, month):
+    """{"일": {"diaryIds": [...], "emoji": ...}} (대표 이모지는 그날 마지막으로 감정 분석된 일기 기준)"""
+    lower, upper = month_bounds(year, month)
+    rows = (
+        Diary.objects.filter(user_id=user_id, created_at__gte=lower, created_at__lt=upper)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day', 'id', 'sentiment_analysis__sentiment', 'sentiment_analysis__updated_at')
+        .order_by('created_at', 'id')
+    )
+
+    days = {}
+    analyzed_at = {}  # 일 -> 대표 이모지를 정한 감정 분석의 updated_at
+    for day, diary_id, sentiment, updated_at in rows:
+        key = str(day.day)
+        entry = days.setdefault(key, {"diaryIds": [], "emoji": None})
+        entry["diaryIds"].append(diary_id)  # 일기 id 는 작성 순서대로
+        if sentiment and (key not in analyzed_at or updated_at >= analyzed_at[key]):
+            analyzed_at[key] = updated_at
+            entry["emoji"] = services.classified_sentiment(sentiment)
+    return days
+
+
+def get(user_id, year, month):
+    key = cache_key(user_id, year, month)
+    days = _cache().get(key)
+    if days is None:
+        days = build(user_id, year, month)
+        _cache().set(key, days, settings.CALENDAR_CACHE_TTL)
+    return days
+
+
+def invalidate(user_id, day):
+    # 커밋 전에 다른 요청이 이전 데이터로 캐시를 다시 채우지 않도록 커밋 후에 지운다
+    key = cache_key(user_id, day.year, day.month)
+    transaction.on_commit(lambda: _cache().delete(key))
+
+
+def invalidate_for_diaries(diary_ids):
+    """bulk 저장처럼 시그널이 없는 경로에서 사용"""
+    months = {
+        (user_id, rollup.local_date(created_at).replace(day=1))
+        for user_id, created_at in Diary.objects.filter(id__in=diary_ids).values_list('user_id', 'created_at')
+    }
+    _cache().delete_many([cache_key(user_id, day.year, day.month) for user_id, day in months])
@@ -0,0 +1,23 @@
+"""
+orjson 으로 요청 본문을 읽는 DRF 파서 (REST_FRAMEWORK 기본 JSON 파서)
+
+DRF JSONParser 와 같이 NaN / Infinity 는 거부하고, 잘못된 JSON 이면 ParseError(400).
+orjson 이 설치되어 있지 않거나 본문 인코딩이 UTF-8 이 아니면 DRF JSONParser 로 처리한다.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or not self.strict or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
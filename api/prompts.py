@@ -0,0 +1,193 @@
+"""
+Gemini 일기 생성 프롬프트 (대화 길이와 관계없이 프롬프트 크기를 일정 범위로 유지)
+
+- 대화 턴에서 역할과 내용만 남기고 (id, 시각 등 메타데이터 제거) "역할: 내용" 줄로 만든다
+  ({"role", "content"} 외에 Gemini 의 {"role", "parts": [{"text"}]}, {"question", "answer"} 형식도 읽고,
+  내용 키를 알 수 없는 턴은 버리지 않고 JSON 그대로 넣는다)
+- 대화가 PROMPT_MAX_TOKENS 를 넘으면 최근 PROMPT_RECENT_TURNS 턴만 그대로 두고,
+  그 이전 사용자 발화는 대화에 자주 나온 단어를 골고루 담도록 문장을 골라 요약(추출 요약)한다
+- 토큰 수는 Gemini 토크나이저 대신 보수적으로 어림한 값 (영문 4글자 / 그 외 1글자당 1 토큰)
+"""
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from .sentiment import split_sentences
+
+INSTRUCTIONS = (
+    "다음 대화를 바탕으로 User의 입장에서 일기 항목을 작성해 주세요. "
+    "일기에는 제목이 포함되어야 하며 User의 경험과 대화에 대한 생각을 서술해야 합니다. "
+    "결과를 다음 형식으로 작성해 주세요: { \"title\": \"일기 제목\", \"content\": \"일기 내용\" }\n\n"
+)
+SUMMARY_LABEL = "이전 대화 요약"
+
+# 클라이언트마다 다른 키 이름
+ROLE_KEYS = ('role', 'sender', 'speaker')
+CONTENT_KEYS = ('content', 'message', 'text', 'parts')
+QUESTION_ROLE = 'assistant'  # {"question", "answer"} 턴에서 질문한 쪽 (챗봇)
+
+TERM = re.compile(r'[가-힣]{2,}|[A-Za-z]{3,}')
+# "강아지와", "강아지가" 를 같은 단어로 세기 위해 떼어 내는 조사
+PARTICLE = re.compile(r'(에서|으로|이랑|하고|까지|부터|에게|한테|은|는|이|가|을|를|와|과|도|에|로|의|랑|만)$')
+
+
+@dataclass
+class Prompt:
+    text: str
+    tokens: int  # 어림한 프롬프트 토큰 수
+    turns: int  # 정리한 뒤 대화 턴 수
+    compacted_turns: int  # 요약으로 대체한 턴 수
+
+
+def estimate_tokens(text):
+    ascii_chars = sum(1 for char in text if char < '\x80')
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def text_of(value):
+    """내용 값 -> 문자열 (Gemini parts / OpenAI content 처럼 {"text"} 목록이면 텍스트만 잇는다)"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return ' '.join(text_of(part) for part in value)
+    if isinstance(value, dict):
+        return text_of(value['text']) if 'text' in value else ''
+    return '' if value is None else str(value)
+
+
+def split_turn(item):
+    """대화 항목 하나 -> [(역할, 내용), ...]"""
+    if not isinstance(item, dict):
+        return [('user', item if isinstance(item, str) else json.dumps(item, ensure_ascii=False))]
+    role = next((str(item[key]) for key in ROLE_KEYS if item.get(key)), 'user')
+    for key in CONTENT_KEYS:
+        if key in item:
+            return [(role, text_of(item[key]))]
+    if 'question' in item or 'answer' in item:
+        return [(QUESTION_ROLE, text_of(item.get('question'))), ('user', text_of(item.get('answer')))]
+    # 알 수 없는 형식도 내용이 빠지지 않도록 JSON 으로 넣는다
+    return [(role, json.dumps(item, ensure_ascii=False))]
+
+
+def clean_turns(conversation_data):
+    """[(역할, 내용), ...] - 빈 턴은 버리고 같은 역할이 이어지면 합친다"""
+    turns = []
+    for item in conversation_data:
+        for role, content in split_turn(item):
+            content = ' '.join(content.split())
+            if not content:
+                continue
+            if turns and turns[-1][0] == role:
+                turns[-1] = (role, f"{turns[-1][1]} {content}")
+            else:
+                turns.append((role, content))
+    return turns
+
+
+def has_turns(conversation_data):
+    """일기를 만들 대화 내용이 있는지 (비어 있거나, 목록인데 정리하면 남는 턴이 없으면 False)"""
+    if not conversation_data:
+        return False
+    return not isinstance(conversation_data, list) or bool(clean_turns(conversation_data))
+
+
+def render(turns):
+    return "\n".join(f"{role}: {content}" for role, content in turns)
+
+
+def truncate(text, max_tokens):
+    """앞부분을 남기고 max_tokens 안으로 자른다"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def terms(text):
+    found = set()
+    for word in TERM.findall(text.lower()):
+        stem = PARTICLE.sub('', word)
+        found.add(stem if len(stem) >= 2 else word)
+    return found
+
+
+def summarize(turns, context_turns, max_tokens):
+    """
+    turns 의 사용자 발화에서 대화 전체(context_turns 포함)에 자주 나온 단어를 담은 문장을 고른다.
+    이미 고른 문장에 나온 단어는 점수에서 빼서 같은 말이 반복된 문장이 요약을 채우지 않게 하고,
+    max_tokens 안에서 고른 문장을 원래 순서대로 잇는다.
+    """
+    frequencies = Counter(term for _, content in turns + context_turns for term in terms(content))
+    sentences = [sentence for role, content in turns if role == 'user' for sentence in split_sentences(content) if sentence]
+    sentence_terms = [terms(sentence) for sentence in sentences]
+
+    def gain(index):
+        new_terms = sentence_terms[index] - covered
+        return sum(math.log1p(frequencies[term]) for term in new_terms) / math.sqrt(len(sentence_terms[index]) + 1)
+
+    # 점수는 고를수록 줄기만 하므로, 꺼낸 문장의 점수만 다시 계산해서 여전히 가장 크면 고른다 (lazy greedy)
+    covered, chosen, used = set(), [], 0
+    heap = [(-gain(index), index) for index in range(len(sentences))]
+    heapq.heapify(heap)
+    while heap:
+        _, index = heapq.heappop(heap)
+        current = gain(index)
+        if current <= 0:
+            continue
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, index))
+            continue
+        tokens = estimate_tokens(sentences[index]) + 1
+        if used + tokens > max_tokens:
+            continue
+        chosen.append(index)
+        used += tokens
+        covered |= sentence_terms[index]
+    return " ".join(sentences[index] for index in sorted(chosen))
+
+
+def compact(turns, max_tokens, recent_turns, summary_tokens):
+    """(요약, 그대로 둘 최근 턴, 요약으로 대체한 턴 수)"""
+    if estimate_tokens(render(turns)) <= max_tokens:
+        return '', turns, 0
+
+    recent = turns[-recent_turns:] if recent_turns else []
+    # 최근 턴만으로도 넘치면 오래된 것부터 빼고, 마지막 한 턴도 넘치면 자른다
+    while len(recent) > 1 and estimate_tokens(render(recent)) > max_tokens - summary_tokens:
+        recent = recent[1:]
+    if recent and estimate_tokens(render(recent)) > max_tokens:
+        role, content = recent[-1]
+        recent = [(role, truncate(content, max_tokens - estimate_tokens(role) - 2))]
+
+    older = turns[:len(turns) - len(recent)]
+    budget = min(summary_tokens, max_tokens - estimate_tokens(render(recent)) - estimate_tokens(SUMMARY_LABEL) - 2)
+    summary = summarize(older, recent, budget) if budget > 0 else ''
+    return summary, recent, len(older)
+
+
+def build_diary_prompt(conversation_data):
+    if not isinstance(conversation_data, list):
+        # 알 수 없는 형식은 그대로 넣되 크기만 제한
+        text = truncate(json.dumps(conversation_data, ensure_ascii=False), settings.PROMPT_MAX_TOKENS)
+        return Prompt(INSTRUCTIONS + text, estimate_tokens(INSTRUCTIONS + text), 0, 0)
+
+    turns = clean_turns(conversation_data)
+    summary, recent, compacted = compact(
+        turns, settings.PROMPT_MAX_TOKENS, settings.PROMPT_RECENT_TURNS, settings.PROMPT_SUMMARY_TOKENS,
+    )
+    body = render(recent)
+    if summary:
+        body = f"{SUMMARY_LABEL}: {summary}\n{body}"
+    text = INSTRUCTIONS + body
+    return Prompt(text, estimate_tokens(text), len(turns), compacted)
@@ -0,0 +1,45 @@
+"""
+orjson 으로 응답을 직렬화하는 DRF 렌더러 (REST_FRAMEWORK 기본 렌더러)
+
+DRF JSONRenderer 와 같은 결과를 낸다:
+- 한글 등은 \\u 이스케이프 없이 UTF-8 그대로, 공백 없는 compact 형식 (UNICODE_JSON, COMPACT_JSON 기본값)
+- UTC datetime 은 "Z" 로 끝나고, orjson 이 모르는 타입(Decimal, lazy 문자열, timedelta 등)은
+  DRF JSONEncoder 와 같은 방식으로 바꾼다 (Decimal 은 float)
+- \\u2028 / \\u2029 는 이스케이프
+
+orjson 이 설치되어 있지 않거나 들여쓰기(?format=json; indent=4, Browsable API)를 요청하면 DRF JSONRenderer 로 처리한다.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+_encoder = JSONEncoder()
+
+
+def default(obj):
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """DRF JSONRenderer 와 같은 JSON bytes"""
+    content = orjson.dumps(data, default=default, option=OPTIONS)
+    # JavaScript 문자열 안에서 줄바꿈으로 해석되는 문자 (DRF 와 같이 이스케이프)
+    # 3바이트 검색은 한 바이트 검색(memchr)보다 훨씬 느리므로 첫 바이트(U+2000~U+2FFF)가 있을 때만 찾는다
+    if b'\xe2' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return dumps(data)
@@ -0,0 +1,273 @@
+"""
+외부 AI API(Gemini, Clova) 호출 보호
+
+- deadline(seconds): 현재 요청이 외부 호출에 쓸 수 있는 시간 (contextvar, 중첩되면 짧은 쪽)
+  timeout(default) 으로 각 호출의 타임아웃을 남은 시간 안으로 줄인다.
+- CircuitBreaker: 최근 호출의 실패율이나 느린 호출 비율이 기준을 넘으면 일정 시간 호출을 막아
+  기다리지 않고 바로 대체 경로(로컬 감정 분석, 503 응답)로 가게 한다. 상태는 프로세스마다 따로 유지.
+- hedged / ahedged: delay 안에 성공한 응답이 없으면 (빨리 실패한 경우 포함) 같은 요청을 한 번 더 보내
+  먼저 성공한 결과를 쓴다 (짧은 호출용)
+브레이커 상태와 헤지 횟수는 /metrics 에 나온다.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# 남은 시간이 이보다 짧으면 호출하지 않는다 (초)
+MIN_TIMEOUT = 0.05
+
+# 현재 요청의 만료 시각 (time.monotonic 기준, 없으면 None)
+_deadline = ContextVar('upstream_deadline', default=None)
+
+# 이름 -> CircuitBreaker (/metrics 출력용)
+breakers = {}
+# 이름 -> {"sent": 헤지 요청 수, "won": 헤지 요청이 먼저 성공한 수}
+hedge_stats = {}
+_hedge_lock = threading.Lock()
+_hedge_executor = None
+
+
+class UpstreamUnavailable(Exception):
+    """외부 API 를 호출하지 않고 바로 대체 경로로 가야 하는 경우"""
+
+
+class UpstreamStatusError(Exception):
+    """5xx / 429 응답 (브레이커에서 실패로 세기 위해 예외로 바꾼다)"""
+
+
+def failed_status(status_code):
+    return status_code >= 500 or status_code == 429
+
+
+def check_status(name, status_code):
+    if failed_status(status_code):
+        raise UpstreamStatusError(f"{name} returned {status_code}")
+
+
+def response_ok(response):
+    """hedged 의 ok 인자용: 5xx / 429 응답은 헤지 요청의 결과를 기다린다"""
+    return not failed_status(response.status_code)
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    def __init__(self):
+        super().__init__("request deadline exceeded")
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    def __init__(self, name):
+        super().__init__(f"circuit '{name}' is open")
+        self.name = name
+
+
+@contextmanager
+def deadline(seconds):
+    """이 블록 안의 외부 호출이 seconds 안에 끝나도록 한다 (0 / None 이면 제한 없음)"""
+    if not seconds:
+        yield
+        return
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """남은 시간(초), 기한이 없으면 None"""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def check_deadline():
+    """남은 시간이 없으면 DeadlineExceeded"""
+    left = remaining()
+    if left is not None and left < MIN_TIMEOUT:
+        raise DeadlineExceeded()
+    return left
+
+
+def timeout(default):
+    """
+    default 타임아웃(초 또는 (connect, read) 튜플)을 남은 시간 안으로 줄인다.
+    남은 시간이 없으면 DeadlineExceeded
+    """
+    left = check_deadline()
+    if left is None:
+        return default
+    if isinstance(default, tuple):
+        return tuple(min(value, left) for value in default)
+    return min(default, left)
+
+
+class CircuitBreaker:
+    """
+    최근 window 번의 호출 중 minimum_calls 이상이 쌓였을 때
+    실패율 >= failure_rate 이거나 slow_call_seconds 보다 오래 걸린 비율 >= slow_call_rate 이면 열린다.
+    열린 뒤 open_seconds 가 지나면 한 번만 시험 호출을 허용하고 (half_open), 성공하면 닫는다.
+    """
+    CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+
+    def __init__(self, name, slow_call_seconds, window=None, minimum_calls=None, failure_rate=None,
+                 slow_call_rate=None, open_seconds=None):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.minimum_calls = minimum_calls or settings.CIRCUIT_MIN_CALLS
+        self.failure_rate = failure_rate or settings.CIRCUIT_FAILURE_RATE
+        self.slow_call_rate = slow_call_rate or settings.CIRCUIT_SLOW_CALL_RATE
+        self.open_seconds = open_seconds or settings.CIRCUIT_OPEN_SECONDS
+        self.state = self.CLOSED
+        self.stats = {"calls": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0}
+        self._calls = deque(maxlen=window or settings.CIRCUIT_WINDOW)  # (실패 여부, 느린 호출 여부)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        breakers[name] = self
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record(self, ok, elapsed):
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["failures"] += not ok
+            self.stats["slow_calls"] += slow
+            if self.state == self.HALF_OPEN:
+                if ok and not slow:
+                    self.state = self.CLOSED
+                    self._calls.clear()
+                else:
+                    self._open()
+                return
+            self._calls.append((not ok, slow))
+            if self.state == self.CLOSED and len(self._calls) >= self.minimum_calls:
+                failures = sum(failed for failed, _ in self._calls) / len(self._calls)
+                slow_calls = sum(slow for _, slow in self._calls) / len(self._calls)
+                if failures >= self.failure_rate or slow_calls >= self.slow_call_rate:
+                    self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.stats["opened"] += 1
+
+    def _release(self):
+        """취소된 시험 호출은 결과로 치지 않고 다음 요청이 다시 시험하게 한다"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """
+        with breaker.guard(): 블록 안의 호출 결과를 기록한다 (예외가 나면 실패)
+        열려 있으면 호출하지 않고 CircuitOpenError
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self.record(True, time.monotonic() - started)
+
+
+def _count_hedge(name, won=False):
+    with _hedge_lock:
+        counts = hedge_stats.setdefault(name, {"sent": 0, "won": 0})
+        counts["won" if won else "sent"] += 1
+
+
+def _executor():
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=settings.HEDGE_WORKERS, thread_name_prefix='hedge')
+    return _hedge_executor
+
+
+def _succeeded(attempt, ok):
+    """끝난 시도(Future / Task)가 쓸 수 있는 결과인지 (예외가 났거나 ok 가 거절하면 실패)"""
+    return attempt.exception() is None and (ok is None or ok(attempt.result()))
+
+
+def hedged(name, call, delay, ok=None):
+    """
+    call() 이 delay 초 안에 성공하지 못하면 한 번 더 호출해서 먼저 성공한 결과를 반환한다.
+    예외가 나거나 ok(result) 가 False 인 결과는 실패로 보고 다른 호출을 기다리며,
+    둘 다 실패하면 마지막 실패(예외 또는 결과)를 그대로 돌려준다. delay 가 0 이면 그냥 call()
+    (먼저 끝나지 않은 쪽은 취소할 수 없으므로 백그라운드에서 끝까지 실행된다)
+    call 은 호출한 쪽의 contextvar(남은 시간 등)를 그대로 보고 실행된다.
+    """
+    if not delay:
+        return call()
+    first = _executor().submit(contextvars.copy_context().run, call)
+    done = first in wait([first], timeout=delay).done
+    if done and _succeeded(first, ok):
+        return first.result()
+
+    _count_hedge(name)
+    second = _executor().submit(contextvars.copy_context().run, call)
+    failed = first
+    for future in as_completed([second] if done else [first, second]):
+        if _succeeded(future, ok):
+            if future is second:
+                _count_hedge(name, won=True)
+            return future.result()
+        failed = future
+    return failed.result()
+
+
+async def ahedged(name, call, delay, ok=None):
+    """hedged 의 비동기 버전 (call 은 코루틴 함수, 늦은 쪽은 취소한다)"""
+    if not delay:
+        return await call()
+    first = asyncio.ensure_future(call())
+    done = bool((await asyncio.wait({first}, timeout=delay))[0])
+    if done and _succeeded(first, ok):
+        return first.result()
+
+    _count_hedge(name)
+    second = asyncio.ensure_future(call())
+    pending = {second} if done else {first, second}
+    failed = first
+    try:
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                if _succeeded(task, ok):
+                    if task is second:
+                        _count_hedge(name, won=True)
+                    return task.result()
+                failed = task
+        return failed.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,195 @@
+"""
+사용자별 / 날짜별 감정 분석 집계(DailySentimentRollup) 관리
+SentimentAnalysis 가 저장/삭제될 때마다 해당 날짜 행만 증감시킨다.
+bulk_create / bulk_update 처럼 시그널이 발생하지 않는 경로는 바뀐 행들의 (이전, 이후) 를 apply_changes() 로 넘기고,
+집계가 어긋났을 때는 rebuild() 로 다시 계산한다.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySentimentRollup, SentimentAnalysis
+
+# 감정 라벨 -> 집계 컬럼
+COUNT_FIELDS = {
+    'positive': 'positive_count',
+    'negative': 'negative_count',
+    'neutral': 'neutral_count',
+    'anger': 'anger_count',
+}
+OTHER_FIELD = 'other_count'
+SENTIMENTS = list(COUNT_FIELDS) + ['other']
+SCORE_STEP = Decimal('0.01')
+
+
+def count_field(sentiment):
+    return COUNT_FIELDS.get(sentiment, OTHER_FIELD)
+
+
+def local_date(value):
+    """일기 작성 시각을 현재 타임존(settings.TIME_ZONE) 기준 날짜로"""
+    return timezone.localtime(value).date()
+
+
+def day_bounds(start, end):
+    """[start, end] 날짜 범위를 현재 타임존 기준 [시작 시각, 끝 다음날 0시) 로"""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def snapshot(sentiment_analysis_id):
+    """저장되기 전 감정 분석 행의 (user_id, 날짜, 감정, 점수)"""
+    row = (
+        SentimentAnalysis.objects.filter(pk=sentiment_analysis_id)
+        .values_list('diary__user_id', 'diary__created_at', 'sentiment', 'score')
+        .first()
+    )
+    if row is None:
+        return None
+    return entry(*row)
+
+
+def stored_score(score):
+    """DB 에 저장되는 점수 (SentimentAnalysis.score 는 소수점 둘째 자리까지)"""
+    return Decimal(str(score)).quantize(SCORE_STEP)
+
+
+def entry(user_id, created_at, sentiment, score):
+    """apply_change 에 넘기는 (user_id, 날짜, 감정, 점수)"""
+    return user_id, local_date(created_at), sentiment, stored_score(score)
+
+
+def current(sentiment_analysis):
+    diary = sentiment_analysis.diary
+    return entry(diary.user_id, diary.created_at, sentiment_analysis.sentiment, sentiment_analysis.score)
+
+
+def apply_change(old, new):
+    """old 집계를 빼고 new 집계를 더한다 (각각 (user_id, 날짜, 감정, 점수) 또는 None)"""
+    apply_changes([(old, new)])
+
+
+def apply_changes(changes):
+    """
+    (old, new) 변경 목록을 (user_id, 날짜) 별로 합쳐 반영한다.
+    같은 날짜 행에 대한 증감은 한 번의 UPDATE 로 처리하고, 바뀌지 않은 날짜 행은 건드리지 않는다.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    added = set()
+    for old, new in changes:
+        for entry, sign in ((old, -1), (new, 1)):
+            if entry is None:
+                continue
+            user_id, day, sentiment, score = entry
+            delta = deltas[(user_id, day)]
+            delta['total'] += sign
+            delta[count_field(sentiment)] += sign
+            delta['score_sum'] += sign * stored_score(score)
+            if sign > 0:
+                added.add((user_id, day))
+
+    with transaction.atomic():
+        for (user_id, day), delta in deltas.items():
+            changes = {field: F(field) + value for field, value in delta.items() if value}
+            if not changes:
+                continue
+            rows = DailySentimentRollup.objects.filter(user_id=user_id, date=day)
+            # 삭제만 있는 날짜는 새 행을 만들지 않는다 (사용자 삭제로 집계 행이 먼저 지워졌을 수 있음)
+            if (user_id, day) in added:
+                DailySentimentRollup.objects.get_or_create(user_id=user_id, date=day)
+            rows.update(**changes)
+
+
+def rebuild(user_ids=None, start=None, end=None):
+    """
+    SentimentAnalysis 에서 집계를 다시 계산한다.
+    user_ids / start / end(날짜, 포함) 로 범위를 제한할 수 있으며, 범위 안의 기존 집계 행은 교체된다.
+    """
+    analyses = SentimentAnalysis.objects.all()
+    rollups = DailySentimentRollup.objects.all()
+    if user_ids is not None:
+        analyses = analyses.filter(diary__user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+    if start is not None:
+        analyses = analyses.filter(diary__created_at__gte=day_bounds(start, start)[0])
+        rollups = rollups.filter(date__gte=start)
+    if end is not None:
+        analyses = analyses.filter(diary__created_at__lt=day_bounds(end, end)[1])
+        rollups = rollups.filter(date__lte=end)
+
+    grouped = (
+        analyses.annotate(day=TruncDate('diary__created_at'))
+        .values('diary__user_id', 'day', 'sentiment')
+        .annotate(count=Count('id'), score_sum=Sum('score'))
+        .order_by()
+    )
+
+    rows = {}
+    for group in grouped:
+        key = (group['diary__user_id'], group['day'])
+        rollup = rows.get(key)
+        if rollup is None:
+            rollup = rows[key] = DailySentimentRollup(user_id=key[0], date=key[1], score_sum=Decimal(0))
+        field = count_field(group['sentiment'])
+        setattr(rollup, field, getattr(rollup, field) + group['count'])
+        rollup.total += group['count']
+        rollup.score_sum += group['score_sum'] or 0
+
+    with transaction.atomic():
+        rollups.delete()
+        DailySentimentRollup.objects.bulk_create(rows.values(), batch_size=1000)
+    return len(rows)
+
+
+def summary(user, start, end):
+    """
+    start ~ end(포함) 기간의 감정 분포와 일별 시계열
+    집계 테이블만 읽으므로 일기 수가 아니라 기간(일 수)에 비례한다.
+    """
+    rollups = {
+        rollup.date: rollup
+        for rollup in DailySentimentRollup.objects.filter(user=user, date__range=(start, end))
+    }
+
+    distribution = dict.fromkeys(SENTIMENTS, 0)
+    total, score_sum = 0, Decimal(0)
+    series = []
+    day = start
+    while day <= end:
+        rollup = rollups.get(day)
+        counts = {sentiment: getattr(rollup, count_field(sentiment)) if rollup else 0 for sentiment in SENTIMENTS}
+        day_total = rollup.total if rollup else 0
+        for sentiment, count in counts.items():
+            distribution[sentiment] += count
+        total += day_total
+        score_sum += rollup.score_sum if rollup else 0
+        series.append({
+            "date": day.isoformat(),
+            "total": day_total,
+            "averageScore": average(rollup.score_sum, day_total) if rollup else None,
+            **counts,
+        })
+        day += timedelta(days=1)
+
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total": total,
+        "averageScore": average(score_sum, total),
+        "distribution": distribution,
+        "series": series,
+    }
+
+
+def average(score_sum, total):
+    if not total:
+        return None
+    return round(float(score_sum) / total, 2)
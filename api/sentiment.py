@@ -0,0 +1,167 @@
+"""
+프로세스 내에서 동작하는 한국어 감정 분석기 (감정 사전 기반)
+Clova 와 같은 positive / negative / neutral / anger 라벨과 0~100 신뢰도를 반환하며,
+문장 단위 계산은 NumPy 로 한 번에 처리한다.
+
+- 감정 단어는 어절(띄어쓰기 단위)의 앞부분이 어간과 같을 때만 센다 (가장 긴 어간 하나).
+  "좋지", "좋았다", "좋은" 은 모두 '좋' 으로 세고, "문화가" 안의 '화가' 는 세지 않는다.
+- 부정 표현은 바로 그 단어에만 적용한다: 앞 어절이 "안" / "못" 이거나 ("안 좋았다"),
+  어간 뒤에 "-지 않/못" 또는 "없" 이 이어질 때 ("좋지 않았다", "걱정 없이").
+  "어이없다" 처럼 감정 단어 안에 있는 '없' 은 부정이 아니다.
+"""
+import re
+
+import numpy as np
+
+# 어간 -> (positive, negative, anger) 가중치
+LEXICON = {
+    # positive
+    '행복': (2.0, 0, 0), '기쁘': (2.0, 0, 0), '기뻐': (2.0, 0, 0), '기뻤': (2.0, 0, 0),
+    '즐거': (1.5, 0, 0), '즐겁': (1.5, 0, 0), '신나': (1.5, 0, 0), '신났': (1.5, 0, 0),
+    '좋': (1.5, 0, 0),
+    '설레': (1.5, 0, 0), '설렜': (1.5, 0, 0), '감사': (1.5, 0, 0), '고마': (1.5, 0, 0),
+    '뿌듯': (2.0, 0, 0), '만족': (1.5, 0, 0), '사랑': (1.5, 0, 0), '웃었': (1.0, 0, 0),
+    '웃음': (1.0, 0, 0), '재미있': (1.5, 0, 0), '재밌': (1.5, 0, 0), '편안': (1.0, 0, 0),
+    '다행': (1.0, 0, 0), '최고': (1.5, 0, 0), '성공': (1.0, 0, 0), '칭찬': (1.0, 0, 0),
+    '상쾌': (1.0, 0, 0), '따뜻': (1.0, 0, 0), '맛있': (1.0, 0, 0), '힐링': (1.5, 0, 0),
+    '기대': (0.5, 0, 0), '평화': (1.0, 0, 0), '든든': (1.0, 0, 0), '신기': (0.5, 0, 0),
+    # negative
+    '슬프': (0, 2.0, 0), '슬퍼': (0, 2.0, 0), '슬펐': (0, 2.0, 0), '우울': (0, 2.0, 0),
+    '외로': (0, 1.5, 0), '외롭': (0, 1.5, 0), '힘들': (0, 1.5, 0), '힘든': (0, 1.5, 0),
+    '힘드': (0, 1.5, 0), '지치': (0, 1.0, 0), '지쳤': (0, 1.0, 0), '피곤': (0, 1.0, 0),
+    '걱정': (0, 1.0, 0), '불안': (0, 1.5, 0), '무섭': (0, 1.5, 0), '무서': (0, 1.5, 0),
+    '두려': (0, 1.5, 0), '아프': (0, 1.0, 0), '아팠': (0, 1.0, 0), '속상': (0, 1.5, 0),
+    '실망': (0, 1.5, 0), '후회': (0, 1.5, 0), '눈물': (0, 1.5, 0), '울었': (0, 1.5, 0),
+    '싫': (0, 1.0, 0), '괴로': (0, 2.0, 0), '답답': (0, 1.0, 0.5), '서운': (0, 1.5, 0),
+    '아쉽': (0, 1.0, 0), '아쉬': (0, 1.0, 0), '허무': (0, 1.5, 0), '스트레스': (0, 1.0, 0.5),
+    '망쳤': (0, 1.5, 0), '실수': (0, 1.0, 0), '그립': (0, 1.0, 0), '그리워': (0, 1.0, 0),
+    # anger
+    '화가': (0, 0.5, 2.0), '화났': (0, 0.5, 2.0), '화나': (0, 0.5, 2.0), '짜증': (0, 0.5, 2.0),
+    '분노': (0, 0.5, 2.5), '열받': (0, 0.5, 2.0), '억울': (0, 0.5, 1.5), '어이없': (0, 0.5, 1.5),
+    '빡치': (0, 0.5, 2.5), '빡쳤': (0, 0.5, 2.5), '싸웠': (0, 0.5, 1.5), '싸움': (0, 0.5, 1.0),
+    '미워': (0, 0.5, 1.5), '미웠': (0, 0.5, 1.5), '원망': (0, 0.5, 1.5), '무시': (0, 0.5, 1.0),
+}
+# 부정된 감정 단어는 긍정/부정 점수를 뒤집는다
+PRE_NEGATIONS = ('안', '못')  # 앞 어절
+# 어간 뒤의 나머지 + 공백 + 다음 어절: "-지 않/못" ("좋지 않았다", "행복하지는 못했다") 또는 "없" ("걱정 없이", "걱정이 없다")
+NEGATION_PATTERN = re.compile(r'\S*지[는도]?\s*(?:않|못)|[이가은는도]?\s*없')
+INTENSIFIERS = ('너무', '정말', '진짜', '매우', '엄청', '완전', '굉장히', '아주')
+
+NEGATION_FLIP = 0.8
+NEUTRAL_BIAS = 1.0  # 감정 단어가 없으면 neutral 이 되도록 하는 기준 점수
+ANGER_RATIO = 0.5  # 부정 점수 중 분노 비중이 이 이상이면 anger
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def split_sentences(text):
+    sentences = [s.strip() for s in SENTENCE_PATTERN.split(text or '')]
+    return [s for s in sentences if s] or ['']
+
+
+class LocalSentimentAnalyzer:
+    def __init__(self, lexicon=LEXICON):
+        self.terms = list(lexicon)
+        self.index = {term: i for i, term in enumerate(self.terms)}
+        self.max_term_length = max(map(len, self.terms))
+        self.weights = np.array([lexicon[term] for term in self.terms], dtype=np.float64)  # (T, 3)
+        # 부정된 단어의 가중치: 긍정 <-> 부정을 NEGATION_FLIP 만큼 바꾸고 분노는 그만큼 줄인다
+        flip = np.array([
+            [1 - NEGATION_FLIP, NEGATION_FLIP, 0],
+            [NEGATION_FLIP, 1 - NEGATION_FLIP, 0],
+            [0, 0, 1 - NEGATION_FLIP],
+        ])
+        self.negated_weights = self.weights @ flip
+
+    def match(self, word):
+        """어절 앞부분과 같은 가장 긴 어간 (없으면 None)"""
+        for length in range(min(len(word), self.max_term_length), 0, -1):
+            if word[:length] in self.index:
+                return word[:length]
+        return None
+
+    def _term_counts(self, sentences):
+        """(문장 수, 단어 수) 등장 횟수 행렬 두 개 (부정되지 않은 것, 부정된 것)"""
+        counts = np.zeros((2, len(sentences), len(self.terms)))
+        for row, sentence in enumerate(sentences):
+            words = sentence.split()
+            for i, word in enumerate(words):
+                term = self.match(word)
+                if term is None:
+                    continue
+                following = word[len(term):] + (' ' + words[i + 1] if i + 1 < len(words) else '')
+                negated = (i > 0 and words[i - 1] in PRE_NEGATIONS) or NEGATION_PATTERN.match(following) is not None
+                counts[int(negated), row, self.index[term]] += 1
+        return counts
+
+    def sentence_scores(self, sentences):
+        """문장별 (positive, negative, anger) 점수"""
+        plain, negated = self._term_counts(sentences)
+        scores = plain @ self.weights + negated @ self.negated_weights
+
+        sentences = np.asarray(sentences, dtype=str)
+        intensifiers = np.stack([np.char.count(sentences, term) for term in INTENSIFIERS], axis=1)
+        intensity = 1 + 0.5 * np.minimum(intensifiers.sum(axis=1), 2)
+        return scores * intensity[:, None]
+
+    def analyze_many(self, texts):
+        """
+        여러 일기를 한 번에 분석한다.
+        각 결과는 Clova 결과를 정리한 형태와 같은 {"sentiment", "score", "negativeSentiment"}
+        """
+        if not texts:
+            return []
+
+        sentences, doc_index = [], []
+        for i, text in enumerate(texts):
+            split = split_sentences(text)
+            sentences.extend(split)
+            doc_index.extend([i] * len(split))
+
+        doc_scores = np.zeros((len(texts), 3))
+        np.add.at(doc_scores, np.asarray(doc_index), self.sentence_scores(sentences))
+
+        # positive / negative(부정 + 분노) / neutral 에 대한 softmax
+        logits = np.column_stack([
+            doc_scores[:, 0],
+            doc_scores[:, 1] + doc_scores[:, 2],
+            np.full(len(texts), NEUTRAL_BIAS),
+        ])
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        labels = probs.argmax(axis=1)
+        negative_total = doc_scores[:, 1] + doc_scores[:, 2]
+        anger = (doc_scores[:, 2] >= ANGER_RATIO * np.maximum(negative_total, 1e-9)) & (doc_scores[:, 2] > 0)
+
+        results = []
+        for label, prob, is_anger in zip(labels, probs, anger):
+            if label == 0:
+                sentiment, negative_sentiment = 'positive', None
+            elif label == 1 and is_anger:
+                sentiment = negative_sentiment = 'anger'
+            elif label == 1:
+                sentiment, negative_sentiment = 'negative', None
+            else:
+                sentiment, negative_sentiment = 'neutral', None
+            results.append({
+                "sentiment": sentiment,
+                "score": round(float(prob[label]) * 100, 2),
+                "negativeSentiment": negative_sentiment,
+            })
+        return results
+
+    def analyze(self, text):
+        return self.analyze_many([text])[0]
+
+
+analyzer = LocalSentimentAnalyzer()
+
+
+def analyze(text):
+    return analyzer.analyze(text)
+
+
+def analyze_many(texts):
+    return analyzer.analyze_many(texts)
@@ -1,18 +1,58 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Diary, SentimentAnalysis, User
 
+def parse_fields(value):
+    """
+    "id,title,sentiment_analysis.sentiment" -> {"id": {}, "title": {}, "sentiment_analysis": {"sentiment": {}}}
+    하위 필드 없이 지정한 중첩 필드는 전체를 포함한다. 값이 없으면 None
+    """
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree or None
+
+class SparseFieldsetsMixin:
+    """
+    ?fields=a,b,nested.c 로 응답에 포함할 필드를 고른다 (sparse fieldsets)
+    최상위 serializer 가 요청에서 읽어 중첩 serializer 에 나눠 적용한다.
+    입력 검증에 쓰이는 필드가 빠지지 않도록 조회(GET 등) 요청에만 적용한다.
+    """
+    fields_query_param = 'fields'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None and request.method in SAFE_METHODS:
+            tree = parse_fields(request.query_params.get(self.fields_query_param))
+            if tree is not None:
+                self.restrict_fields(tree)
+
+    def restrict_fields(self, tree):
+        for name in list(self.fields):
+            if name not in tree:
+                self.fields.pop(name)
+                continue
+            field = getattr(self.fields[name], 'child', self.fields[name])
+            if tree[name] and isinstance(field, SparseFieldsetsMixin):
+                field.restrict_fields(tree[name])
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['kakao_id']
 
-class SentimentAnalysisSerializer(serializers.ModelSerializer):
+class SentimentAnalysisSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = SentimentAnalysis
         fields = ['id', 'diary', 'sentiment', 'score', 'created_at']
         read_only_fields = ['created_at']
 
-class DiarySerializer(serializers.ModelSerializer):
+class DiarySerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)  # 사용자 정보 포함
     sentiment_analysis = SentimentAnalysisSerializer(read_only=True)
 
@@ -0,0 +1,597 @@
+"""
+chat/end 일기 생성 파이프라인에서 동기 / 비동기 뷰와 백그라운드 작업이 함께 사용하는 함수들
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from google.api_core.exceptions import GoogleAPIError
+
+from . import metrics, prompts, resilience, upstream
+from . import sentiment as local_sentiment
+from .cache import TTLCache, hash_key
+from .models import Diary, DiaryJob, SentimentAnalysis
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = 'gemini-1.5-flash'
+CLOVA_CONFIG = {
+    "negativeClassification": True
+}
+
+# (정규화한 본문 + Clova 설정) 해시 -> Clova 응답
+sentiment_cache = TTLCache(
+    'clova_sentiment',
+    maxsize=settings.SENTIMENT_CACHE_MAXSIZE,
+    ttl=settings.SENTIMENT_CACHE_TTL,
+    backend_alias=settings.SENTIMENT_CACHE_ALIAS,
+)
+
+# 장애가 나면 기다리지 않고 바로 대체 경로로 (Gemini: 503 응답, Clova: 로컬 감정 분석)
+gemini_breaker = resilience.CircuitBreaker('gemini', slow_call_seconds=settings.GEMINI_SLOW_CALL_SECONDS)
+clova_breaker = resilience.CircuitBreaker('clova', slow_call_seconds=settings.CLOVA_SLOW_CALL_SECONDS)
+GEMINI_ERRORS = (resilience.UpstreamUnavailable, GoogleAPIError, requests.RequestException)
+
+_refine_executor = None
+_refine_lock = threading.Lock()
+
+
+def configure_gemini():
+    """GEMINI_API_ENDPOINT 가 설정되어 있으면 그 주소로 REST 호출 (벤치마크용 로컬 서버 등)"""
+    options = {}
+    if settings.GEMINI_API_ENDPOINT:
+        options = {"transport": "rest", "client_options": {"api_endpoint": settings.GEMINI_API_ENDPOINT}}
+    genai.configure(api_key=os.getenv('GEMINI_API_KEY'), **options)
+
+
+def gemini_request_options():
+    """남은 요청 시간 안으로 줄인 Gemini 호출 타임아웃 (시간이 없으면 DeadlineExceeded)"""
+    return {"timeout": resilience.timeout(settings.GEMINI_TIMEOUT)}
+
+
+def gemini_unavailable(error):
+    logger.warning("Gemini unavailable: %s", error)
+    return {"error": "Diary generation is temporarily unavailable"}, 503
+
+
+def build_diary_prompt(conversation_data):
+    """크기를 제한한 일기 생성 프롬프트 (토큰 수는 지표와 로그로 남긴다)"""
+    prompt = prompts.build_diary_prompt(conversation_data)
+    metrics.prompt_tokens.observe(prompt.tokens)
+    logger.info("Diary prompt: %d tokens, %d turns (%d compacted)", prompt.tokens, prompt.turns, prompt.compacted_turns)
+    return prompt.text
+
+
+def extract_gemini_text(response):
+    """Gemini 응답에서 첫 번째 후보의 텍스트를 꺼낸다. 후보가 없으면 None"""
+    if response and hasattr(response, 'candidates') and response.candidates:
+        parts = response.candidates[0].content.parts
+        if parts:
+            return parts[0].text
+    return None
+
+
+def parse_diary_text(diary_data):
+    """
+    Gemini 가 생성한 텍스트에서 (title, content) 를 파싱
+    JSON 이 아니면 json.JSONDecodeError 를 그대로 올린다.
+    """
+    # Clean the response to remove markdown formatting
+    cleaned_data = diary_data.replace("```json\n", "").replace("```", "").strip()
+    logger.debug("Cleaned diary data (%d chars)", len(cleaned_data))
+
+    diary_info = json.loads(cleaned_data)
+    return diary_info.get('title', '제목없음'), diary_info.get('content', '')
+
+
+def clova_request_kwargs(content):
+    return {
+        "headers": {
+            "X-NCP-APIGW-API-KEY-ID": os.getenv('CLOVA_API_KEY_ID'),
+            "X-NCP-APIGW-API-KEY": os.getenv('CLOVA_API_KEY'),
+            "Content-Type": "application/json"
+        },
+        "json": {
+            "content": content,
+            "config": CLOVA_CONFIG
+        },
+    }
+
+
+def normalize_content(content):
+    """공백/유니코드 표기만 다른 같은 본문이 같은 캐시 키를 갖도록 정규화"""
+    return ' '.join(unicodedata.normalize('NFC', content).split())
+
+
+def sentiment_cache_key(content):
+    return hash_key(json.dumps(CLOVA_CONFIG, sort_keys=True), normalize_content(content))
+
+
+def parse_clova_result(sentiment_result):
+    """Clova 응답을 {"sentiment", "score", "negativeSentiment"} 로 정리"""
+    sentiment = sentiment_result.get('document', {}).get('sentiment', 'neutral')
+
+    # Check if negative sentiment exists
+    negative_sentiment = sentiment_result.get('sentences', [{}])[0].get('negativeSentiment', {}).get('sentiment', None)
+    if negative_sentiment:
+        sentiment = negative_sentiment
+
+    confidence_scores = sentiment_result.get('document', {}).get('confidence', {})
+    positive_confidence = confidence_scores.get('positive', 0)
+    negative_confidence = confidence_scores.get('negative', 0)
+    neutral_confidence = confidence_scores.get('neutral', 0)
+
+    return {
+        "sentiment": sentiment,
+        "score": max(positive_confidence, negative_confidence, neutral_confidence),
+        "negativeSentiment": negative_sentiment,
+    }
+
+
+def fetch_sentiment_result(content):
+    """
+    Clova 감정 분석 응답(JSON)을 가져온다. 실패하면 None
+    같은 본문은 캐시된 결과를 사용하고, 동시에 들어온 같은 본문 요청은 한 번만 호출한다.
+    """
+    def load():
+        try:
+            resilience.check_deadline()
+            with metrics.stage('clova'), clova_breaker.guard():
+                response = resilience.hedged(
+                    'clova',
+                    lambda: upstream.post(settings.CLOVA_SENTIMENT_URL, timeout=resilience.timeout(upstream.default_timeout()),
+                                          **clova_request_kwargs(content)),
+                    settings.CLOVA_HEDGE_DELAY_MS / 1000,
+                    ok=resilience.response_ok,
+                )
+                resilience.check_status('Clova', response.status_code)
+        except resilience.UpstreamUnavailable as e:
+            logger.info("Clova skipped: %s", e)
+            return None, None
+        except (requests.RequestException, resilience.UpstreamStatusError) as e:
+            logger.error("Clova request failed: %s", e)
+            return None, None
+
+        if response.status_code != 200:
+            return None, None
+        return response.json(), None
+
+    return sentiment_cache.get_or_load(sentiment_cache_key(content), load)
+
+
+def request_sentiment(content):
+    """Clova 감정 분석 결과를 정리해서 반환한다. 실패하면 None"""
+    sentiment_result = fetch_sentiment_result(content)
+    if sentiment_result is None:
+        return None
+    return parse_clova_result(sentiment_result)
+
+
+def clova_async_timeout():
+    import httpx
+
+    connect, read = resilience.timeout(upstream.default_timeout())
+    return httpx.Timeout(read, connect=connect)
+
+
+async def arequest_sentiment(content):
+    """request_sentiment 의 비동기 버전"""
+    import httpx
+
+    cache_key = sentiment_cache_key(content)
+    sentiment_result = await sentiment_cache.aget(cache_key)
+    if sentiment_result is None:
+        try:
+            resilience.check_deadline()
+            with metrics.stage('clova'), clova_breaker.guard():
+                response = await resilience.ahedged(
+                    'clova',
+                    lambda: upstream.get_async_client().post(
+                        settings.CLOVA_SENTIMENT_URL, timeout=clova_async_timeout(), **clova_request_kwargs(content)),
+                    settings.CLOVA_HEDGE_DELAY_MS / 1000,
+                    ok=resilience.response_ok,
+                )
+                resilience.check_status('Clova', response.status_code)
+        except resilience.UpstreamUnavailable as e:
+            logger.info("Clova skipped: %s", e)
+            return None
+        except (httpx.HTTPError, resilience.UpstreamStatusError) as e:
+            logger.error("Clova request failed: %s", e)
+            return None
+
+        if response.status_code != 200:
+            return None
+        sentiment_result = response.json()
+        await sentiment_cache.aset(cache_key, sentiment_result)
+    return parse_clova_result(sentiment_result)
+
+
+def analyze_sentiment(content):
+    """
+    SENTIMENT_ENGINE 설정에 따라 감정 분석을 하고 (analysis, source) 를 반환
+    - clova: Clova 를 먼저 호출하고 실패하면 로컬 분석기 사용
+    - local: 로컬 분석기만 사용
+    - local_refine: 로컬 분석 결과로 바로 응답하고, 저장 후 Clova 결과로 보정 (save_sentiment 참고)
+    """
+    if settings.SENTIMENT_ENGINE == 'clova':
+        analysis = request_sentiment(content)
+        if analysis is not None:
+            return analysis, SentimentAnalysis.SOURCE_CLOVA
+    return local_analysis(content), SentimentAnalysis.SOURCE_LOCAL
+
+
+async def aanalyze_sentiment(content):
+    """analyze_sentiment 의 비동기 버전"""
+    if settings.SENTIMENT_ENGINE == 'clova':
+        analysis = await arequest_sentiment(content)
+        if analysis is not None:
+            return analysis, SentimentAnalysis.SOURCE_CLOVA
+    return local_analysis(content), SentimentAnalysis.SOURCE_LOCAL
+
+
+def local_analysis(content):
+    with metrics.stage('sentiment_local'):
+        return local_sentiment.analyze(content)
+
+
+def is_fallback(source):
+    """Clova 를 기본으로 쓰는데 Clova 결과를 받지 못한 경우"""
+    return settings.SENTIMENT_ENGINE == 'clova' and source != SentimentAnalysis.SOURCE_CLOVA
+
+
+def sentiment_defaults(analysis, source):
+    return {
+        'sentiment': analysis["sentiment"],
+        'score': analysis["score"],
+        'source': source,
+    }
+
+
+def schedule_refinement(diary_id, content):
+    """local_refine 모드에서 저장된 로컬 분석 결과를 Clova 결과로 백그라운드에서 보정"""
+    global _refine_executor
+    if settings.SENTIMENT_ENGINE != 'local_refine':
+        return
+    if _refine_executor is None:
+        with _refine_lock:
+            if _refine_executor is None:
+                _refine_executor = ThreadPoolExecutor(
+                    max_workers=settings.SENTIMENT_REFINE_WORKERS,
+                    thread_name_prefix='sentiment-refine',
+                )
+    _refine_executor.submit(refine_sentiment, diary_id, content)
+
+
+def refine_sentiment(diary_id, content):
+    try:
+        analysis = request_sentiment(content)
+        if analysis is not None:
+            SentimentAnalysis.objects.update_or_create(
+                diary_id=diary_id,
+                defaults=sentiment_defaults(analysis, SentimentAnalysis.SOURCE_CLOVA),
+            )
+    except Exception:
+        logger.exception("Sentiment refinement failed for diary %s", diary_id)
+    finally:
+        close_old_connections()
+
+
+def save_sentiment(diary, analysis, source):
+    sentiment_analysis, _ = SentimentAnalysis.objects.update_or_create(
+        diary=diary,
+        defaults=sentiment_defaults(analysis, source),
+    )
+    if source == SentimentAnalysis.SOURCE_LOCAL:
+        schedule_refinement(diary.id, diary.content)
+    return sentiment_analysis
+
+
+def classified_sentiment(sentiment):
+    if sentiment == "positive":
+        return "happy"
+    elif sentiment == "anger":
+        return "anger"
+    elif sentiment == "negative" or sentiment == "etc":
+        return "negative"
+    else:
+        return "neutral"
+
+
+def chat_end_payload(diary, analysis, fallback=False):
+    """chat/end 응답 본문과 상태 코드"""
+    return {
+        "code": 200,
+        "message": "Using default sentiment" if fallback else "Chat ended and diary created",
+        "diaryTitle": diary.title,
+        "diaryContent": diary.content,
+        "emoji": classified_sentiment(analysis["sentiment"]),
+        "sentiment_analysis": {
+            "sentiment": analysis["sentiment"],
+            "score": analysis["score"],
+            "negativeSentiment": analysis["negativeSentiment"] if analysis["negativeSentiment"] else "None"
+        },
+        "diaryId": diary.id
+    }, 200 if fallback else 201
+
+
+def generate_diary(user, conversation_data, job=None):
+    """
+    대화 내용으로 Gemini 에 일기 생성을 요청하고 감정 분석 결과까지 저장
+    chat/end 응답 본문과 상태 코드를 (payload, status_code) 로 반환
+    job 이 있으면 저장한 일기를 작업에 기록한다 (api/jobs.py 재시도용)
+    """
+    configure_gemini()
+
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    try:
+        request_options = gemini_request_options()
+        with metrics.stage('gemini'), gemini_breaker.guard():
+            response = model.generate_content(build_diary_prompt(conversation_data), request_options=request_options)
+    except GEMINI_ERRORS as e:
+        return gemini_unavailable(e)
+
+    # 응답 객체 전체 대신 요약만 남긴다
+    logger.debug("Gemini API response: %d candidates", len(getattr(response, 'candidates', None) or []))
+
+    diary_data = extract_gemini_text(response)
+    if diary_data is None:
+        logger.error("No response received from Gemini API.")
+        return {"error": "Failed to generate diary from Gemini"}, 500
+
+    logger.debug("Raw diary data from Gemini (%d chars)", len(diary_data))
+
+    try:
+        title, content = parse_diary_text(diary_data)
+    except json.JSONDecodeError as e:
+        logger.error("JSON Decode Error: %s with data: %.200s", e, diary_data)
+        return {"error": f"Failed to parse diary data: {str(e)}"}, 500
+
+    return create_diary(user, title, content, job=job)
+
+
+async def agenerate_diary(user, conversation_data):
+    """generate_diary 의 비동기 버전 (Gemini / Clova 호출을 await, ORM 은 async API 사용)"""
+    configure_gemini()
+
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    prompt = build_diary_prompt(conversation_data)
+    try:
+        request_options = gemini_request_options()
+        with metrics.stage('gemini'), gemini_breaker.guard():
+            if settings.GEMINI_API_ENDPOINT:
+                # REST 트랜스포트는 비동기 호출을 지원하지 않으므로 스레드에서 실행
+                response = await asyncio.to_thread(model.generate_content, prompt, request_options=request_options)
+            else:
+                response = await model.generate_content_async(prompt, request_options=request_options)
+    except GEMINI_ERRORS as e:
+        return gemini_unavailable(e)
+
+    diary_data = extract_gemini_text(response)
+    if diary_data is None:
+        logger.error("No response received from Gemini API.")
+        return {"error": "Failed to generate diary from Gemini"}, 500
+
+    try:
+        title, content = parse_diary_text(diary_data)
+    except json.JSONDecodeError as e:
+        logger.error("JSON Decode Error: %s with data: %.200s", e, diary_data)
+        return {"error": f"Failed to parse diary data: {str(e)}"}, 500
+
+    return await acreate_diary(user, title, content)
+
+
+async def acreate_diary(user, title, content):
+    """create_diary 의 비동기 버전"""
+    diary = await Diary.objects.acreate(user=user, title=title, content=content)
+
+    analysis, source = await aanalyze_sentiment(content)
+
+    await SentimentAnalysis.objects.aupdate_or_create(
+        diary=diary,
+        defaults=sentiment_defaults(analysis, source),
+    )
+    if source == SentimentAnalysis.SOURCE_LOCAL:
+        schedule_refinement(diary.id, content)
+
+    return chat_end_payload(diary, analysis, fallback=is_fallback(source))
+
+
+def create_diary(user, title, content, job=None):
+    """일기를 저장하고 감정 분석 결과를 함께 저장한 뒤 chat/end 응답을 만든다"""
+    with transaction.atomic():
+        diary = Diary.objects.create(
+            user=user,
+            title=title,
+            content=content
+        )
+        if job is not None:
+            DiaryJob.objects.filter(pk=job.pk).update(diary=diary)
+
+    return complete_diary(diary)
+
+
+def complete_diary(diary):
+    """저장된 일기의 감정 분석 결과를 저장하고 chat/end 응답을 만든다 (다시 호출해도 결과는 하나)"""
+    content = diary.content
+    analysis, source = analyze_sentiment(content)
+
+    # Save the sentiment analysis result
+    save_sentiment(diary, analysis, source)
+
+    return chat_end_payload(diary, analysis, fallback=is_fallback(source))
+
+
+class DiaryStreamParser:
+    """
+    스트리밍으로 들어오는 Gemini 출력({"title": "...", "content": "..."})에서
+    title / content 문자열 값을 도착하는 대로 잘라내는 점진적 파서
+    """
+    KEY_PATTERN = re.compile(r'"(title|content)"\s*:\s*"')
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.field = None  # 현재 값을 읽고 있는 필드
+
+    def feed(self, text):
+        """새 텍스트 조각을 넣고 [(field, delta), ...] 를 반환"""
+        self.buffer += text
+        events = []
+        while True:
+            if self.field is None:
+                match = self.KEY_PATTERN.search(self.buffer, self.pos)
+                if not match:
+                    break
+                self.field = match.group(1)
+                self.pos = match.end()
+                continue
+
+            delta, closed = self._read_string()
+            if delta:
+                events.append((self.field, delta))
+            if not closed:
+                break
+            self.field = None
+        return events
+
+    def _read_string(self):
+        out = []
+        buffer, i = self.buffer, self.pos
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.pos = i + 1
+                return ''.join(out), True
+            if char == '\\':
+                if i + 1 >= len(buffer):
+                    break
+                escape = buffer[i + 1]
+                if escape == 'u':
+                    if i + 6 > len(buffer):
+                        break
+                    code = int(buffer[i + 2:i + 6], 16)
+                    if 0xD800 <= code < 0xDC00:
+                        # 이모지 등 서로게이트 쌍은 뒤쪽 \uXXXX 까지 받은 뒤 합친다
+                        if i + 12 > len(buffer):
+                            break
+                        low = int(buffer[i + 8:i + 12], 16)
+                        code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                        i += 6
+                    out.append(chr(code))
+                    i += 6
+                    continue
+                out.append(self.ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            out.append(char)
+            i += 1
+        self.pos = i
+        return ''.join(out), False
+
+
+def stream_diary(user, conversation_data):
+    """
+    generate_diary 의 스트리밍 버전 (WSGI 용)
+    Gemini 스트리밍 응답을 받는 대로 (event, data, None) 을 내보내고,
+    저장과 감정 분석이 끝나면 ("done", chat/end 응답 본문, 상태 코드) 를 내보낸다.
+    실패하거나 요청 기한(resilience.deadline)이 지나면 ("error", 오류 응답 본문, 상태 코드) 로 끝낸다.
+    """
+    configure_gemini()
+
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    parser = DiaryStreamParser()
+    chunks = []
+    try:
+        request_options = gemini_request_options()
+        with metrics.stage('gemini_first_chunk'), gemini_breaker.guard():
+            response = model.generate_content(build_diary_prompt(conversation_data), stream=True,
+                                              request_options=request_options)
+        for chunk in response:
+            yield from _stream_chunk(chunk, parser, chunks)
+    except GEMINI_ERRORS as e:
+        payload, status_code = gemini_unavailable(e)
+        yield "error", payload, status_code
+        return
+
+    parsed, error = _parse_stream(chunks)
+    if error is not None:
+        yield "error", error, 500
+        return
+    payload, status_code = create_diary(user, *parsed)
+    yield "done", payload, status_code
+
+
+async def astream_diary(user, conversation_data):
+    """
+    stream_diary 의 비동기 버전 (ASGI 용)
+    Django 는 ASGI 에서 동기 이터레이터를 끝까지 모은 뒤에 보내므로 스트리밍 응답은 비동기 제너레이터로 만든다.
+    """
+    configure_gemini()
+
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    prompt = build_diary_prompt(conversation_data)
+    parser = DiaryStreamParser()
+    chunks = []
+    try:
+        request_options = gemini_request_options()
+        with metrics.stage('gemini_first_chunk'), gemini_breaker.guard():
+            if settings.GEMINI_API_ENDPOINT:
+                # REST 트랜스포트는 비동기 호출을 지원하지 않으므로 조각마다 스레드에서 받는다
+                response = await asyncio.to_thread(model.generate_content, prompt, stream=True,
+                                                   request_options=request_options)
+            else:
+                response = await model.generate_content_async(prompt, stream=True, request_options=request_options)
+        if hasattr(response, '__aiter__'):
+            async for chunk in response:
+                for event in _stream_chunk(chunk, parser, chunks):
+                    yield event
+        else:
+            iterator = iter(response)
+            while (chunk := await asyncio.to_thread(next, iterator, None)) is not None:
+                for event in _stream_chunk(chunk, parser, chunks):
+                    yield event
+    except GEMINI_ERRORS as e:
+        payload, status_code = gemini_unavailable(e)
+        yield "error", payload, status_code
+        return
+
+    parsed, error = _parse_stream(chunks)
+    if error is not None:
+        yield "error", error, 500
+        return
+    payload, status_code = await acreate_diary(user, *parsed)
+    yield "done", payload, status_code
+
+
+def _stream_chunk(chunk, parser, chunks):
+    """Gemini 응답 조각 하나에서 title / content 이벤트를 만든다 (조각 사이마다 남은 시간을 확인)"""
+    resilience.check_deadline()
+    text = extract_gemini_text(chunk)
+    if not text:
+        return
+    chunks.append(text)
+    for field, delta in parser.feed(text):
+        yield field, {"delta": delta}, None
+
+
+def _parse_stream(chunks):
+    """모은 조각에서 ((title, content), None), 실패하면 (None, 오류 응답 본문)"""
+    diary_data = ''.join(chunks)
+    if not diary_data:
+        logger.error("No response received from Gemini API.")
+        return None, {"error": "Failed to generate diary from Gemini"}
+    try:
+        return parse_diary_text(diary_data), None
+    except json.JSONDecodeError as e:
+        logger.error("JSON Decode Error: %s with data: %.200s", e, diary_data)
+        return None, {"error": f"Failed to parse diary data: {str(e)}"}
@@ -0,0 +1,47 @@
+"""
+모델 시그널 (ApiConfig.ready 에서 등록)
+SentimentAnalysis 저장/삭제 시 일별 감정 집계(DailySentimentRollup)를 갱신하고,
+일기 / 감정 분석이 바뀌면 해당 월의 감정 캘린더 캐시를 지운다.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import mood_calendar, rollup
+from .models import Diary, SentimentAnalysis
+
+
+@receiver(pre_save, sender=SentimentAnalysis, dispatch_uid='rollup_sentiment_pre_save')
+def remember_previous_sentiment(sender, instance, raw=False, **kwargs):
+    # 수정이면 집계에서 뺄 이전 값을 기억해 둔다
+    instance._rollup_previous = None if raw or instance.pk is None else rollup.snapshot(instance.pk)
+
+
+@receiver(post_save, sender=SentimentAnalysis, dispatch_uid='rollup_sentiment_post_save')
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = rollup.current(instance)
+    rollup.apply_change(getattr(instance, '_rollup_previous', None), current)
+    instance._rollup_previous = None
+    mood_calendar.invalidate(current[0], current[1])
+
+
+@receiver(pre_delete, sender=SentimentAnalysis, dispatch_uid='rollup_sentiment_pre_delete')
+def remember_deleted_sentiment(sender, instance, **kwargs):
+    instance._rollup_previous = rollup.snapshot(instance.pk)
+
+
+@receiver(post_delete, sender=SentimentAnalysis, dispatch_uid='rollup_sentiment_post_delete')
+def update_rollup_on_delete(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    rollup.apply_change(previous, None)
+    if previous is not None:
+        mood_calendar.invalidate(previous[0], previous[1])
+
+
+@receiver(post_save, sender=Diary, dispatch_uid='calendar_diary_post_save')
+@receiver(post_delete, sender=Diary, dispatch_uid='calendar_diary_post_delete')
+def invalidate_calendar_on_diary_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    mood_calendar.invalidate(instance.user_id, rollup.local_date(instance.created_at))
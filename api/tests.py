@@ -1,3 +1,1255 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+import zlib
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from time import monotonic, sleep
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from ogoo import log
+
+from . import async_views, capture, compression, conditional, idempotency, jobs, parsers, prompts, renderers, resilience, rollup, services, throttling, upstream, views
+from . import sentiment as local_sentiment
+from .cache import TTLCache
+from .models import DailySentimentRollup, Diary, DiaryJob, SentimentAnalysis, User
+
+
+class DiaryListTest(TestCase):
+    """
+    diary/list/ 조회 쿼리 수와 페이지네이션 확인
+    """
+    def setUp(self):
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.other = User.objects.create(kakao_id=2, nickname='other')
+        for i in range(30):
+            diary = Diary.objects.create(user=self.user, title=f'title {i}', content='content')
+            if i % 2:
+                SentimentAnalysis.objects.create(diary=diary, sentiment='positive', score=0.9)
+        Diary.objects.create(user=self.other, title='other', content='other')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_is_single_query(self):
+        # ETag 확인용 집계 쿼리 + 목록 쿼리
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/diary/list/', {'page_size': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['diaries']), 20)
+
+    def test_list_is_scoped_and_paginated(self):
+        response = self.client.get('/api/diary/list/', {'page_size': 20})
+        seen = [diary['diaryId'] for diary in response.data['diaries']]
+
+        with self.assertNumQueries(2):
+            response = self.client.get(response.data['next'])
+        seen += [diary['diaryId'] for diary in response.data['diaries']]
+
+        self.assertIsNone(response.data['next'])
+        expected = list(Diary.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_list_sparse_fields_and_preview(self):
+        Diary.objects.filter(user=self.user).update(content='가나다라마바사' * 100)
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get('/api/diary/list/', {'fields': 'diaryId,content', 'preview_chars': 5})
+        self.assertEqual(response.data['diaries'][0], {
+            'diaryId': response.data['diaries'][0]['diaryId'],
+            'content': '가나다라마',
+        })
+        # 전체 content 컬럼과 감정 분석 JOIN 은 조회하지 않는다
+        sql = queries.captured_queries[-1]['sql']
+        self.assertEqual(sql.count('"api_diary"."content"'), 1)  # SUBSTR 인자로만 사용
+        self.assertIn('"content_preview"', sql)
+        self.assertNotIn('api_sentimentanalysis', sql)
+
+    def test_detail_sparse_fields(self):
+        diary = Diary.objects.filter(user=self.user, sentiment_analysis__isnull=False).first()
+        response = self.client.get(f'/api/diary/{diary.id}/', {'fields': 'id,title,sentiment_analysis.sentiment'})
+        self.assertEqual(response.data, {
+            'id': diary.id,
+            'title': diary.title,
+            'sentiment_analysis': {'sentiment': 'positive'},
+        })
+
+
+class SentimentRollupTest(TestCase):
+    """
+    일별 감정 집계 갱신과 analytic/sentiment/summary/ 확인
+    """
+    def setUp(self):
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.today = timezone.localdate()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_diary(self, days_ago, sentiment, score):
+        diary = Diary.objects.create(user=self.user, title='title', content='content')
+        # 00:30 (Asia/Seoul) 는 UTC 로는 전날이므로 날짜 경계도 함께 확인된다
+        created_at = timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(0, 30)))
+        Diary.objects.filter(pk=diary.pk).update(created_at=created_at)
+        diary.refresh_from_db()
+        return SentimentAnalysis.objects.create(diary=diary, sentiment=sentiment, score=score)
+
+    def rollup_rows(self):
+        return list(DailySentimentRollup.objects.order_by('date').values_list(
+            'date', 'total', 'positive_count', 'negative_count', 'anger_count', 'score_sum'))
+
+    def test_rollup_follows_create_update_delete(self):
+        first = self.create_diary(0, 'positive', 80)
+        self.create_diary(0, 'negative', 60)
+        self.create_diary(1, 'anger', 90)
+
+        first.sentiment, first.score = 'anger', 70
+        first.save()
+        SentimentAnalysis.objects.update_or_create(diary=first.diary, defaults={'sentiment': 'negative', 'score': 50})
+        first.diary.delete()
+
+        incremental = self.rollup_rows()
+        rollup.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+        self.assertEqual(incremental[-1][:5], (self.today, 1, 0, 1, 0))
+
+    def test_summary_reads_only_rollup(self):
+        self.create_diary(0, 'positive', 80)
+        self.create_diary(0, 'negative', 60)
+        self.create_diary(2, 'anger', 90)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/analytic/sentiment/summary/', {
+                'start': (self.today - timedelta(days=6)).isoformat(),
+                'end': self.today.isoformat(),
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(response.data['distribution']['anger'], 1)
+        self.assertEqual(response.data['averageScore'], 76.67)
+        self.assertEqual(len(response.data['series']), 7)
+        self.assertEqual(response.data['series'][-1]['averageScore'], 70.0)
+
+    def test_summary_rejects_bad_range(self):
+        response = self.client.get('/api/analytic/sentiment/summary/', {'start': '2024-02-01', 'end': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/analytic/sentiment/summary/', {'start': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BackfillSentimentTest(TestCase):
+    """
+    backfill_sentiment 의 체크포인트 재개와 일별 감정 집계 증감 확인
+    """
+    def setUp(self):
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.today = timezone.localdate()
+        checkpoint = tempfile.NamedTemporaryFile(delete=False)
+        checkpoint.close()
+        self.checkpoint = checkpoint.name
+        self.addCleanup(os.remove, self.checkpoint)
+
+    def create_diary(self, days_ago, content, sentiment=None, score=None, source=''):
+        diary = Diary.objects.create(user=self.user, title='title', content=content)
+        created_at = timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(12)))
+        Diary.objects.filter(pk=diary.pk).update(created_at=created_at)
+        diary.refresh_from_db()
+        if sentiment is not None:
+            SentimentAnalysis.objects.create(diary=diary, sentiment=sentiment, score=score, source=source)
+        return diary
+
+    def backfill(self, **options):
+        out = StringIO()
+        call_command('backfill_sentiment', engine='local', chunk_size=2, checkpoint=self.checkpoint, stdout=out, **options)
+        return out.getvalue()
+
+    def rollup_rows(self):
+        return list(DailySentimentRollup.objects.order_by('date').values_list(
+            'date', 'total', 'positive_count', 'negative_count', 'neutral_count', 'anger_count', 'score_sum'))
+
+    def test_resume_and_rollup(self):
+        self.create_diary(0, '정말 행복했다', 'neutral', 1)  # 이전 랜덤 기본값
+        self.create_diary(0, '너무 슬펐다')  # 감정 분석 없음
+        self.create_diary(1, '짜증나는 하루', 'neutral', 1)
+        self.create_diary(1, '좋았다', 'negative', 55.5, source=SentimentAnalysis.SOURCE_CLOVA)  # 대상 아님
+        self.create_diary(2, '맛있는 점심', 'positive', 90, source=SentimentAnalysis.SOURCE_CLOVA)
+        # 바뀌지 않는 날짜의 집계 행은 다시 계산하지 않는다 (어긋난 값이 그대로 남는지로 확인)
+        untouched = self.today - timedelta(days=2)
+        DailySentimentRollup.objects.filter(user=self.user, date=untouched).update(total=99)
+
+        self.assertIn("Backfilled 2 diaries", self.backfill(restart=True, limit=2))
+        with open(self.checkpoint) as f:
+            first_last_id = int(f.read())
+        self.assertEqual(first_last_id, Diary.objects.filter(content='너무 슬펐다').get().id)
+
+        output = self.backfill()
+        self.assertIn(f"Resuming after diary id {first_last_id}", output)
+        self.assertIn("Backfilled 1 diaries", output)
+        self.assertIn("Backfilled 0 diaries", self.backfill())
+
+        self.assertFalse(SentimentAnalysis.objects.filter(source='').exists())
+        self.assertEqual(
+            dict(SentimentAnalysis.objects.values_list('diary__content', 'sentiment')),
+            {'정말 행복했다': 'positive', '너무 슬펐다': 'negative', '짜증나는 하루': 'anger',
+             '좋았다': 'negative', '맛있는 점심': 'positive'},
+        )
+
+        self.assertEqual(DailySentimentRollup.objects.get(user=self.user, date=untouched).total, 99)
+        DailySentimentRollup.objects.filter(user=self.user, date=untouched).update(total=1)
+        incremental = self.rollup_rows()
+        rollup.rebuild()
+        self.assertEqual(incremental, self.rollup_rows())
+        self.assertEqual(incremental[-1][:6], (self.today, 2, 1, 1, 0, 0))
+
+
+class MoodCalendarTest(TestCase):
+    """
+    calendar/<year>/<month>/ 응답, 캐시, 무효화 확인
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_diary(self, created_at, sentiment=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            diary = Diary.objects.create(user=self.user, title='title', content='content')
+            Diary.objects.filter(pk=diary.pk).update(created_at=timezone.make_aware(created_at))
+            diary.refresh_from_db()
+            if sentiment:
+                SentimentAnalysis.objects.create(diary=diary, sentiment=sentiment, score=90)
+        return diary
+
+    def test_calendar_groups_by_local_day_and_is_cached(self):
+        # 2024-05-01 00:30 (Asia/Seoul) 은 UTC 로 4월 30일
+        first = self.create_diary(datetime(2024, 5, 1, 0, 30), 'positive')
+        second = self.create_diary(datetime(2024, 5, 1, 21, 0), 'anger')
+        third = self.create_diary(datetime(2024, 5, 31, 23, 59))
+        self.create_diary(datetime(2024, 6, 1, 0, 0), 'negative')
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/calendar/2024/5/')
+        self.assertEqual(response.data['days'], {
+            '1': {'diaryIds': [first.id, second.id], 'emoji': 'anger'},
+            '31': {'diaryIds': [third.id], 'emoji': None},
+        })
+        with self.assertNumQueries(0):
+            self.client.get('/api/calendar/2024/5/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SentimentAnalysis.objects.create(diary=third, sentiment='positive', score=80)
+        response = self.client.get('/api/calendar/2024/5/')
+        self.assertEqual(response.data['days']['31']['emoji'], 'happy')
+
+    def test_calendar_emoji_follows_latest_analysis(self):
+        first = self.create_diary(datetime(2024, 5, 1, 9, 0), 'positive')
+        self.create_diary(datetime(2024, 5, 1, 21, 0), 'anger')
+        # 먼저 쓴 일기가 나중에 다시 분석되면 그 결과가 대표 이모지
+        with self.captureOnCommitCallbacks(execute=True):
+            analysis = first.sentiment_analysis
+            analysis.sentiment = 'negative'
+            analysis.save()
+        response = self.client.get('/api/calendar/2024/5/')
+        self.assertEqual(response.data['days']['1']['emoji'], 'negative')
+
+    def test_calendar_rejects_bad_month(self):
+        response = self.client.get('/api/calendar/2024/13/')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalRequestTest(TestCase):
+    """
+    diary/list/, diary/<pk>/ ETag / Last-Modified 와 If-Match 확인
+    """
+    def setUp(self):
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.diary = Diary.objects.create(user=self.user, title='title', content='content')
+        SentimentAnalysis.objects.create(diary=self.diary, sentiment='positive', score=90)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_detail_not_modified_until_sentiment_changes(self):
+        response = self.client.get(f'/api/diary/{self.diary.id}/')
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/diary/{self.diary.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(f'/api/diary/{self.diary.id}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        SentimentAnalysis.objects.filter(diary=self.diary).get().save()
+        response = self.client.get(f'/api/diary/{self.diary.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_tracks_deletes_and_query(self):
+        other = Diary.objects.create(user=self.user, title='other', content='content')
+        etag = self.client.get('/api/diary/list/')['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/diary/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/api/diary/list/', {'fields': 'title'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        other.delete()
+        response = self.client.get('/api/diary/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_if_match(self):
+        etag = self.client.get(f'/api/diary/{self.diary.id}/')['ETag']
+
+        response = self.client.post(f'/api/diary/{self.diary.id}/', {'title': 'edited'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # 이전 ETag 로 다시 수정하면 다른 수정 내용을 덮어쓰지 않도록 412
+        response = self.client.post(f'/api/diary/{self.diary.id}/', {'title': 'stale'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.diary.refresh_from_db()
+        self.assertEqual(self.diary.title, 'edited')
+
+
+@skipUnless(connection.vendor == 'sqlite', "SQLite 설정")
+class SqliteTuningTest(TestCase):
+    """
+    새 SQLite 연결에 settings.SQLITE_PRAGMAS 가 적용되는지 확인 (테스트 DB 는 메모리라 임시 파일 DB 로 연결)
+    """
+    def test_pragmas_applied_on_connect(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = SQLiteDatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(tmp, 'tuning.sqlite3')}, 'tuning')
+            wrapper.ensure_connection()
+            try:
+                pragma = lambda name: wrapper.connection.execute(f"PRAGMA {name}").fetchone()[0]
+                self.assertEqual(pragma('journal_mode'), 'wal')
+                self.assertEqual(pragma('synchronous'), 1)  # NORMAL
+                self.assertEqual(pragma('busy_timeout'), 5000)
+                self.assertEqual(pragma('temp_store'), 2)  # MEMORY
+            finally:
+                wrapper.close()
+
+
+class MetricsTest(TestCase):
+    """
+    Server-Timing 헤더와 /metrics 출력 확인
+    """
+    def test_server_timing_and_metrics(self):
+        user = User.objects.create(kakao_id=1, nickname='user')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get('/api/diary/list/')
+        stages = dict(part.split(';dur=') for part in response['Server-Timing'].split(', '))
+        self.assertIn('db', stages)
+        self.assertGreaterEqual(float(stages['total']), float(stages['db']))
+
+        with override_settings(METRICS_TOKEN='scrape'):
+            body = client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        self.assertIn('ogoo_request_duration_seconds_count{method="GET",route="api/diary/list/",status="200"}', body)
+        self.assertIn('ogoo_stage_duration_seconds_bucket{stage="db",le="+Inf"}', body)
+        self.assertIn('ogoo_cache_hits_total{cache="kakao_token"}', body)
+
+    def test_metrics_requires_token(self):
+        client = APIClient()
+        self.assertEqual(client.get('/metrics').status_code, 404)
+        with override_settings(METRICS_TOKEN='scrape'):
+            self.assertEqual(client.get('/metrics').status_code, 403)
+            self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').status_code, 200)
+
+
+class LoggingTest(TestCase):
+    """
+    JSON 로그의 extra 필드 제한과 fork 후 리스너 재시작 확인
+    """
+    def test_json_formatter_whitelists_extra(self):
+        request = RequestFactory().get('/api/diary/list/?cursor=abc', HTTP_AUTHORIZATION='Bearer secret-token')
+        record = logging.makeLogRecord({
+            'name': 'django.request', 'levelname': 'WARNING', 'msg': 'Unauthorized: %s', 'args': (request.path,),
+            'status_code': 401, 'request': request, 'token': 'secret-token',
+        })
+        entry = json.loads(log.JsonFormatter().format(record))
+        self.assertEqual(entry['msg'], 'Unauthorized: /api/diary/list/')
+        self.assertEqual((entry['status_code'], entry['method'], entry['path']), (401, 'GET', '/api/diary/list/'))
+        self.assertNotIn('token', entry)
+        self.assertNotIn('secret-token', json.dumps(entry))
+
+    def test_listener_starts_lazily_per_process(self):
+        stream = StringIO()
+        handler = log.queue_handler()
+        handler.target.setStream(stream)
+        self.assertIsNone(handler.listener)
+
+        logger = logging.getLogger('test.queue_handler')
+        logger.addHandler(handler)
+        logger.propagate = False
+        self.addCleanup(logger.removeHandler, handler)
+        logger.warning("first")
+        parent = handler.listener
+        self.assertTrue(parent._thread.is_alive())
+
+        # fork 된 자식 프로세스처럼 pid 가 바뀌면 새 큐와 리스너로 다시 시작한다
+        with mock.patch('ogoo.log.os.getpid', return_value=handler.listener_pid + 1):
+            logger.warning("second")
+            self.assertIsNot(handler.listener, parent)
+            handler.stop_listener()
+        parent.stop()
+        self.assertEqual([json.loads(line)['msg'] for line in stream.getvalue().splitlines()], ['first', 'second'])
+
+
+class TrafficCaptureTest(TestCase):
+    """
+    트래픽 캡처가 요청 모양만 남기는지 확인
+    """
+    @override_settings(TRAFFIC_CAPTURE_FILE='capture.jsonl')
+    def test_capture_records_shape_only(self):
+        user = User.objects.create(kakao_id=1, nickname='user')
+        diary = Diary.objects.create(user=user, title='title', content='content')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with self.assertLogs('api.capture', 'INFO') as logs:
+            response = client.post(f'/api/diary/{diary.id}/', {'title': '비밀 제목', 'content': '비밀 내용입니다'},
+                                   format='json')
+            client.get('/api/diary/list/', {'fields': 'diaryId,title', 'cursor': 'abc'})
+        self.assertEqual(response.status_code, 200)
+
+        update, listing = (record.capture for record in logs.records)
+        self.assertEqual(update['route'], 'api/diary/<int:pk>/')
+        self.assertEqual(update['kwargs'], {})
+        self.assertEqual(update['body'], {'title': 5, 'content': 8})
+        self.assertEqual(update['status'], 200)
+        self.assertEqual(len(update['user']), 12)
+        self.assertEqual(listing['user'], update['user'])
+        self.assertEqual(listing['query'], {'fields': 'diaryId,title', 'cursor': None})
+        self.assertNotIn('비밀', logs.output[0] + str(update))
+
+    def test_body_shape_keeps_no_values(self):
+        body = {'diary_id': 987654, 'title': '비밀 제목', 'tags': ['비밀', 'secret'], 'private': True, 'mood': None,
+                'conversation': [{'role': 'user', 'content': '아무에게도 말 못한 이야기'}]}
+        shape = capture.body_shape(body)
+        self.assertEqual(shape, {'diary_id': 'number', 'title': 5, 'tags': [2, 6], 'private': True, 'mood': None,
+                                 'conversation': [{'role': 4, 'content': 14}]})
+        dumped = json.dumps(shape, ensure_ascii=False)
+        for value in ('987654', '비밀', 'secret', 'user', '이야기'):
+            self.assertNotIn(value, dumped)
+
+    def test_replay_rebuilds_same_shape(self):
+        from benchmarks import replay
+
+        body = {'diary_id': 3, 'conversation': [
+            {'role': 'user', 'content': '오늘 회사에서 힘든 일이 있었어'},
+            {'role': 'assistant', 'content': '무슨 일이 있었나요?'},
+            {'role': 'user', 'content': '발표를 망쳤어'},
+        ], 'stream': False, 'note': None}
+        shape = capture.body_shape(body)
+        rebuilt = replay.build_body(shape, state={'turn': 0, 'counter': iter(range(10)), 'diary_id': 42})
+        self.assertEqual(capture.body_shape(rebuilt), shape)
+        self.assertEqual([turn['role'] for turn in rebuilt['conversation']], ['user', 'assistant', 'user'])
+        self.assertEqual(rebuilt['diary_id'], 42)
+
+
+class ResilienceTest(TestCase):
+    """
+    서킷 브레이커, 요청 기한, 헤지 요청 확인
+    """
+    def tearDown(self):
+        services.clova_breaker.state = resilience.CircuitBreaker.CLOSED
+
+    def call(self, breaker, ok=True):
+        try:
+            with breaker.guard():
+                if not ok:
+                    raise ValueError("upstream failed")
+        except ValueError:
+            pass
+
+    def test_breaker_opens_and_recovers(self):
+        breaker = resilience.CircuitBreaker('test', slow_call_seconds=10, window=4, minimum_calls=4,
+                                            failure_rate=0.5, open_seconds=0.05)
+        for ok in (True, True, False, False):
+            self.call(breaker, ok)
+        self.assertEqual(breaker.state, breaker.OPEN)
+        with self.assertRaises(resilience.CircuitOpenError):
+            self.call(breaker)
+
+        # open_seconds 가 지나면 시험 호출 하나만 허용하고, 성공하면 닫힌다
+        sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record(True, 0.01)
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertEqual(breaker.stats['rejected'], 2)
+
+    def test_deadline_caps_timeouts(self):
+        self.assertEqual(resilience.timeout((3, 10)), (3, 10))
+        with resilience.deadline(1):
+            connect, read = resilience.timeout((3, 10))
+            self.assertLessEqual(read, 1)
+            with resilience.deadline(60):
+                self.assertLessEqual(resilience.timeout(10), 1)
+        with resilience.deadline(0.01):
+            with self.assertRaises(resilience.DeadlineExceeded):
+                resilience.timeout(10)
+
+    def test_hedged_uses_faster_attempt(self):
+        delays = iter([0.5, 0])
+
+        def call():
+            delay = next(delays)
+            sleep(delay)
+            return delay
+
+        started = monotonic()
+        self.assertEqual(resilience.hedged('test', call, 0.05), 0)
+        self.assertLess(monotonic() - started, 0.4)
+        self.assertEqual(resilience.hedge_stats['test'], {'sent': 1, 'won': 1})
+
+    def test_hedged_ignores_fast_failure(self):
+        responses = iter([mock.Mock(status_code=503), mock.Mock(status_code=200)])
+        response = resilience.hedged('fast-failure', lambda: next(responses), 1, ok=resilience.response_ok)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(resilience.hedge_stats['fast-failure'], {'sent': 1, 'won': 1})
+
+    def test_hedged_waits_for_success_after_failure(self):
+        calls = iter([(0.1, ConnectionError('reset')), (0.2, mock.Mock(status_code=200))])
+
+        async def call():
+            delay, outcome = next(calls)
+            await asyncio.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        response = async_to_sync(resilience.ahedged)('slow-failure', call, 0.05, ok=resilience.response_ok)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(resilience.hedge_stats['slow-failure'], {'sent': 1, 'won': 1})
+
+    def test_hedged_returns_last_failure(self):
+        responses = iter([mock.Mock(status_code=503), mock.Mock(status_code=502)])
+        response = resilience.hedged('all-failed', lambda: next(responses), 1, ok=resilience.response_ok)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(resilience.hedge_stats['all-failed'], {'sent': 1, 'won': 0})
+
+    def test_open_clova_breaker_falls_back_to_local_analysis(self):
+        user = User.objects.create(kakao_id=1, nickname='user')
+        diary = Diary.objects.create(user=user, title='title', content='오늘은 정말 행복하고 즐거운 하루였다')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        services.clova_breaker._open()
+        response = client.post('/api/sentimentanalysis/', {'diary_id': diary.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SentimentAnalysis.objects.get(diary=diary).source, SentimentAnalysis.SOURCE_LOCAL)
+
+
+class LocalSentimentTest(TestCase):
+    """
+    로컬 감정 분석기의 어간 매칭과 부정 표현 처리 확인
+    """
+    def assertSentiment(self, text, expected):
+        self.assertEqual(local_sentiment.analyze(text)['sentiment'], expected, text)
+
+    def test_stem_matching(self):
+        for text in ('좋았다', '좋은 하루', '기분이 좋다'):
+            self.assertSentiment(text, 'positive')
+        self.assertSentiment('전통 문화가 있는 도시', 'neutral')  # '화가' 는 어절 앞부분이 아니다
+
+    def test_negation_applies_to_the_negated_word(self):
+        for text in ('좋지 않았다', '안 좋았다', '행복하지는 못했다'):
+            self.assertSentiment(text, 'negative')
+        result = local_sentiment.analyze('걱정 없이 편안하게 잤다')
+        self.assertEqual(result['sentiment'], 'positive')
+        self.assertGreater(result['score'], 50)
+        # 좋았는데 뒤의 "못" 은 다음 단어를 부정한다
+        self.assertSentiment('좋았는데 못 갔다', 'positive')
+
+    def test_negator_inside_term(self):
+        result = local_sentiment.analyze('정말 어이없었다')
+        self.assertEqual((result['sentiment'], result['negativeSentiment']), ('anger', 'anger'))
+
+
+@override_settings(RATE_LIMITS={'chat_end': '60/minute:3'})
+class RateLimitTest(TestCase):
+    """
+    토큰 버킷 요청 제한 확인
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_allows_burst_then_refills(self):
+        self.assertEqual(throttling.parse_rate('60/minute:3'), (1000, 3))
+        results = [throttling.take('chat_end', 'user:1') for _ in range(4)]
+        self.assertEqual(results[:3], [None, None, None])
+        self.assertAlmostEqual(results[3], 1, delta=0.1)
+        # 다른 사용자 / 제한이 없는 범위는 영향 없음
+        self.assertIsNone(throttling.take('chat_end', 'user:2'))
+        self.assertIsNone(throttling.take('unknown', 'user:1'))
+
+        # 거절된 요청은 토큰을 쓰지 않으므로 1초 뒤 하나가 다시 허용된다
+        key = f"{throttling.KEY_PREFIX}chat_end:user:1"
+        cache.decr(key, 1000)
+        self.assertIsNone(throttling.take('chat_end', 'user:1'))
+        self.assertIsNotNone(throttling.take('chat_end', 'user:1'))
+
+    def test_chat_end_returns_429_with_retry_after(self):
+        user = User.objects.create(kakao_id=1, nickname='user')
+        client = APIClient()
+        client.force_authenticate(user)
+        for _ in range(3):
+            throttling.take('chat_end', f'user:{user.pk}')
+
+        response = client.post('/api/chat/end/', {'conversation': [{'role': 'user', 'content': 'hi'}]}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_async_take_shares_the_bucket(self):
+        self.assertIsNone(throttling.take('chat_end', 'user:1'))
+        results = [async_to_sync(throttling.atake)('chat_end', 'user:1') for _ in range(3)]
+        self.assertEqual(results[:2], [None, None])
+        self.assertAlmostEqual(results[2], 1, delta=0.1)
+        self.assertIsNotNone(throttling.take('chat_end', 'user:1'))
+
+
+@override_settings(PROMPT_MAX_TOKENS=400, PROMPT_RECENT_TURNS=4, PROMPT_SUMMARY_TOKENS=100)
+class PromptTest(TestCase):
+    """
+    일기 생성 프롬프트 정리 / 압축 확인
+    """
+    def test_short_conversation_drops_metadata_only(self):
+        conversation = [
+            {'role': 'assistant', 'content': '오늘 하루 어땠어요?', 'id': 'm1', 'createdAt': '2024-05-01T10:00:00Z'},
+            {'role': 'user', 'content': '  친구랑   산책했어요 ', 'id': 'm2'},
+            {'role': 'user', 'content': '날씨가 좋았어요', 'id': 'm3'},
+            {'role': 'assistant', 'content': '', 'id': 'm4'},
+        ]
+        prompt = prompts.build_diary_prompt(conversation)
+        self.assertTrue(prompt.text.endswith("assistant: 오늘 하루 어땠어요?\nuser: 친구랑 산책했어요 날씨가 좋았어요"))
+        self.assertNotIn('createdAt', prompt.text)
+        self.assertEqual((prompt.turns, prompt.compacted_turns), (2, 0))
+
+    def test_long_conversation_is_bounded(self):
+        conversation = []
+        for i in range(40):
+            conversation.append({'role': 'assistant', 'content': f'그 다음에는 무엇을 했나요? {i}'})
+            conversation.append({'role': 'user', 'content': f'별일 없이 지나간 시간이었어요 {i}. 그냥 그랬어요.'})
+        conversation[1]['content'] = '오늘 강아지와 한강 공원에 갔어요. 강아지가 정말 신나했어요.'
+        conversation[-1]['content'] = '마지막으로 강아지 산책 이야기를 정리하고 싶어요.'
+
+        prompt = prompts.build_diary_prompt(conversation)
+        body_tokens = prompts.estimate_tokens(prompt.text) - prompts.estimate_tokens(prompts.INSTRUCTIONS)
+        self.assertLessEqual(body_tokens, 400)
+        self.assertEqual(prompt.compacted_turns, 76)
+        self.assertIn(prompts.SUMMARY_LABEL, prompt.text)
+        # 자주 나온 주제(강아지)를 담은 예전 문장이 요약에 남고, 최근 턴은 그대로 남는다
+        self.assertIn('강아지가 정말 신나했어요.', prompt.text)
+        self.assertTrue(prompt.text.endswith('user: 마지막으로 강아지 산책 이야기를 정리하고 싶어요.'))
+
+    def test_other_turn_shapes(self):
+        gemini = [
+            {'role': 'model', 'parts': [{'text': '오늘 기분은'}, {'text': '어땠어요?'}]},
+            {'role': 'user', 'parts': [{'text': '좋았어요'}]},
+        ]
+        self.assertEqual(prompts.clean_turns(gemini), [('model', '오늘 기분은 어땠어요?'), ('user', '좋았어요')])
+
+        question_answer = [{'question': '오늘 뭐 했어요?', 'answer': '공원에 갔어요'}, {'question': '누구랑요?', 'answer': '친구랑요'}]
+        self.assertEqual(prompts.clean_turns(question_answer), [
+            ('assistant', '오늘 뭐 했어요?'), ('user', '공원에 갔어요'), ('assistant', '누구랑요?'), ('user', '친구랑요'),
+        ])
+
+        # 알 수 없는 형식은 버리지 않고 JSON 으로 넣는다
+        self.assertEqual(prompts.clean_turns([{'q': '기분?', 'a': '최고'}]), [('user', '{"q": "기분?", "a": "최고"}')])
+
+    def test_conversation_without_turns_is_rejected(self):
+        self.assertFalse(prompts.has_turns([{'role': 'user', 'content': '  '}, {'role': 'user', 'parts': []}]))
+        client = APIClient()
+        client.force_authenticate(User.objects.create(kakao_id=1, nickname='user'))
+        response = client.post('/api/chat/end/', {'conversation': [{'role': 'user', 'content': ' '}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class JSONRenderingTest(TestCase):
+    """
+    orjson 렌더러 / 파서가 DRF 기본 구현과 같은 결과를 내는지 확인
+    """
+    def test_renderer_matches_drf(self):
+        data = {
+            'score': Decimal('0.85'),
+            'created_at': timezone.now(),
+            'local': timezone.localtime(),
+            'date': timezone.localdate(),
+            'content': '오늘은 친구와 산책했다. ',
+            'error': gettext_lazy('This field is required.'),
+            1: [(1, 2), None],
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(renderers.ORJSONRenderer().render(data), expected)
+        self.assertIn('산책'.encode(), expected)
+        # 들여쓰기 요청은 DRF 렌더러로
+        self.assertEqual(
+            renderers.ORJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+    def test_parser(self):
+        user = User.objects.create(kakao_id=1, nickname='user')
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/chat/end/', b'{"conversation": [NaN]', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.data['detail'])
+
+        parsed = parsers.ORJSONParser().parse(BytesIO('{"content": "기분 좋음", "score": 0.5}'.encode()))
+        self.assertEqual(parsed, {'content': '기분 좋음', 'score': 0.5})
+        with self.assertRaises(ParseError):
+            parsers.ORJSONParser().parse(BytesIO(b'{"score": NaN}'))
+
+
+class CompressionTest(TestCase):
+    """
+    응답 압축 협상 / 예외 경우와 압축 후 조건부 요청 확인
+    """
+    def setUp(self):
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.diary = Diary.objects.create(user=self.user, title='title', content='오늘은 친구와 공원을 산책했다. ' * 100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_negotiate(self):
+        preference = ['zstd', 'br', 'gzip']
+        self.assertEqual(compression.negotiate('gzip, deflate, br, zstd', preference), 'zstd')
+        self.assertEqual(compression.negotiate('gzip;q=1.0, br;q=0.5', preference), 'gzip')
+        self.assertEqual(compression.negotiate('*', ['gzip']), 'gzip')
+        self.assertIsNone(compression.negotiate('gzip;q=0, *', ['gzip']))
+        self.assertIsNone(compression.negotiate('identity', preference))
+        self.assertIsNone(compression.negotiate('', preference))
+
+    def test_large_response_is_compressed(self):
+        response = self.client.get(f'/api/diary/{self.diary.id}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content))['content'], self.diary.content)
+        self.assertIn('compress', response['Server-Timing'])
+
+        # 약한 ETag 로 바뀌어도 If-None-Match / If-Match 는 그대로 동작
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get(f'/api/diary/{self.diary.id}/', HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 304)
+        response = self.client.post(f'/api/diary/{self.diary.id}/', {'title': 'edited'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(f'/api/diary/{self.diary.id}/', {'title': 'stale'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+    def test_if_match_does_not_rewrite_request_headers(self):
+        etag = 'W/' + self.client.get(f'/api/diary/{self.diary.id}/')['ETag']
+        request = RequestFactory().put('/', HTTP_IF_MATCH=f'"other", {etag}')
+        etag_value, last_modified = conditional.diary_validators(self.user, self.diary.id)
+        self.assertIsNone(conditional.check(request, etag_value, last_modified))
+        self.assertEqual(request.META['HTTP_IF_MATCH'], f'"other", {etag}')
+
+    def test_skips_small_unaccepted_and_event_stream(self):
+        response = self.client.get('/api/analytic/sentiment/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.client.get(f'/api/diary/{self.diary.id}/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        middleware = compression.CompressionMiddleware(lambda request: None)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        events = StreamingHttpResponse(iter([b'event: done\ndata: {}\n\n']), content_type='text/event-stream')
+        self.assertFalse(middleware.process(request, events).has_header('Content-Encoding'))
+
+        chunks = [b'{"diaries": [', b'"' + b'x' * 5000 + b'"', b']}']
+        stream = middleware.process(request, StreamingHttpResponse(iter(chunks), content_type='application/json'))
+        self.assertEqual(stream['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(stream.streaming_content)), b''.join(chunks))
+
+    def test_streaming_chunks_are_flushed(self):
+        middleware = compression.CompressionMiddleware(lambda request: None)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        chunks = [b'{"rows": [', b'"first row",', b'"second row"', b']}']
+        stream = middleware.process(request, StreamingHttpResponse(iter(chunks), content_type='application/json'))
+
+        # 청크를 하나 받을 때마다 그때까지 보낸 내용을 모두 풀 수 있어야 한다 (압축기에 쌓아 두지 않음)
+        decompressor = zlib.decompressobj(compression.GZIP_WBITS)
+        received = b''
+        for i, data in enumerate(stream.streaming_content):
+            received += decompressor.decompress(data)
+            if i < len(chunks):
+                self.assertEqual(received, b''.join(chunks[:i + 1]))
+        self.assertEqual(received, b''.join(chunks))
+
+
+class AsyncChatEndTest(TestCase):
+    """
+    ASGI 용 chat/end 비동기 뷰(api.async_views.chat_end)의 요청 검증과 응답 확인
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        patcher = mock.patch('api.async_views.KakaoAccessTokenAuthentication.authenticate', return_value=(self.user, None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body):
+        request = RequestFactory().post('/api/chat/end/', body, content_type='application/json')
+        return async_to_sync(async_views.chat_end)(request)
+
+    def test_rejects_non_object_body(self):
+        for body in ('[{"role": "user", "content": "hi"}]', '"hi"', '1', '{"conversation": []}'):
+            response = self.post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(json.loads(response.content), {"error": "Conversation data is required."})
+        self.assertEqual(self.post('{').status_code, 400)
+
+    def test_creates_diary(self):
+        generate = mock.AsyncMock(return_value=({"diaryId": 1}, 201))
+        with mock.patch('api.async_views.services.agenerate_diary', generate):
+            response = self.post(json.dumps({"conversation": [{"role": "user", "content": "hi"}]}))
+        self.assertEqual((response.status_code, json.loads(response.content)), (201, {"diaryId": 1}))
+        generate.assert_awaited_once_with(self.user, [{"role": "user", "content": "hi"}])
+
+
+class UpstreamClientTest(TestCase):
+    """
+    외부 API 클라이언트(세션 / AsyncClient) 재사용 확인
+    """
+    def setUp(self):
+        for name, value in (('_session', None), ('_async_clients', weakref.WeakKeyDictionary())):
+            patcher = mock.patch.object(upstream, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_session_built_once_per_process(self):
+        with mock.patch.object(upstream, 'build_session', wraps=upstream.build_session) as build:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                sessions = set(executor.map(lambda _: upstream.get_session(), range(32)))
+            with mock.patch('requests.Session.request', return_value=mock.Mock(status_code=200)) as send:
+                upstream.get('https://kapi.kakao.com/v1/user/access_token_info')
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(sessions, {upstream.get_session()})
+        self.assertEqual(send.call_args.kwargs['timeout'], upstream.default_timeout())
+
+    def test_async_client_per_event_loop(self):
+        async def client_for_loop():
+            client = upstream.get_async_client()
+            self.assertIs(upstream.get_async_client(), client)
+            await client.aclose()
+            return client
+
+        self.assertIsNot(asyncio.run(client_for_loop()), asyncio.run(client_for_loop()))
+
+
+class KakaoTokenCacheTest(TestCase):
+    """
+    토큰 검증 캐시 (TTL / LRU / single-flight) 와 잘못된 토큰 처리 확인
+    """
+    def setUp(self):
+        views.kakao_token_cache.clear()
+
+    def test_ttl_and_lru(self):
+        ttl_cache = TTLCache('test_ttl_lru', maxsize=2, ttl=10)
+        with mock.patch('api.cache.time.time', return_value=1000):
+            ttl_cache.set('a', 1)
+            ttl_cache.set('b', 2, ttl=60)  # 캐시 TTL 보다 길게 저장하지 않는다
+            self.assertEqual(ttl_cache.get('a'), 1)  # a 가 최근 사용됨
+            ttl_cache.set('c', 3)
+        self.assertEqual(ttl_cache.stats()['evictions'], 1)
+        with mock.patch('api.cache.time.time', return_value=1009):
+            self.assertIsNone(ttl_cache.get('b'))
+            self.assertEqual((ttl_cache.get('a'), ttl_cache.get('c')), (1, 3))
+        with mock.patch('api.cache.time.time', return_value=1010):
+            self.assertIsNone(ttl_cache.get('a'))
+
+    def test_single_flight(self):
+        ttl_cache = TTLCache('test_single_flight', ttl=10)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value', None
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            leader = executor.submit(ttl_cache.get_or_load, 'key', loader)
+            started.wait(5)
+            followers = [executor.submit(ttl_cache.get_or_load, 'key', loader) for _ in range(3)]
+            while ttl_cache.stats()['coalesced'] < 3:
+                sleep(0.001)
+            release.set()
+            results = [leader.result()] + [future.result() for future in followers]
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_invalid_token_is_negatively_cached(self):
+        rejected = mock.Mock(status_code=401)
+        client = APIClient()
+        with mock.patch('api.views.upstream.get', return_value=rejected) as get:
+            for _ in range(3):
+                response = client.get('/api/diary/list/', HTTP_AUTHORIZATION='Bearer bad-token')
+                self.assertEqual(response.status_code, 401)
+        self.assertEqual(get.call_count, 1)
+
+        # 카카오 장애(5xx)는 캐시하지 않는다
+        with mock.patch('api.views.upstream.get', return_value=mock.Mock(status_code=503)) as get:
+            client.get('/api/diary/list/', HTTP_AUTHORIZATION='Bearer other-token')
+            client.get('/api/diary/list/', HTTP_AUTHORIZATION='Bearer other-token')
+        self.assertEqual(get.call_count, 2)
+
+    def test_malformed_header(self):
+        for header in ('Bearer', 'Bearer a b'):
+            response = APIClient().get('/api/diary/list/', HTTP_AUTHORIZATION=header)
+            self.assertEqual(response.status_code, 401)
+
+
+class AsyncOnlyCache:
+    """비동기 API 만 있는 캐시 (동기 get / add / set 을 부르면 AttributeError)"""
+    def __init__(self):
+        self.data = {}
+
+    async def aget(self, key):
+        return self.data.get(key)
+
+    async def aadd(self, key, value, timeout):
+        return self.data.setdefault(key, value) is value
+
+    async def aset(self, key, value, timeout):
+        self.data[key] = value
+
+    async def adelete(self, key):
+        self.data.pop(key, None)
+
+
+class IdempotencyTest(TestCase):
+    """
+    Idempotency-Key 저장 / 재사용, 본문이 다른 키(422), 처리 중인 요청(409), 비동기 캐시 API 사용 확인
+    """
+    CONVERSATION = [{'role': 'user', 'content': 'hi'}]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.factory = RequestFactory()
+
+    def key(self, conversation=CONVERSATION, **headers):
+        return idempotency.request_key(self.factory.post('/', **headers), self.user, conversation)
+
+    def test_replay_and_mismatch(self):
+        calls = []
+
+        def run():
+            calls.append(1)
+            return {'diaryId': 1}, 201
+
+        key = self.key(HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(key.ttl, settings.IDEMPOTENCY_TTL)
+        self.assertEqual(idempotency.run_once(key, run), ({'diaryId': 1}, 201, False))
+        self.assertEqual(idempotency.run_once(key, run), ({'diaryId': 1}, 201, True))
+        other = self.key([{'role': 'user', 'content': 'bye'}], HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(idempotency.run_once(other, run)[1], 422)
+        self.assertEqual(len(calls), 1)
+
+    def test_payload_key_is_short_lived(self):
+        key = self.key()
+        self.assertEqual(key.ttl, settings.IDEMPOTENCY_PAYLOAD_TTL)
+        self.assertLess(key.ttl, settings.IDEMPOTENCY_TTL)
+        with mock.patch.object(cache, 'set') as cache_set:
+            idempotency.finish(key, {'diaryId': 1}, 201)
+        self.assertEqual(cache_set.call_args.args[2], settings.IDEMPOTENCY_PAYLOAD_TTL)
+
+    def test_sync_waits_for_in_progress_request(self):
+        key = self.key(HTTP_IDEMPOTENCY_KEY='k2')
+        self.assertIsNone(idempotency.begin(key))
+        run = mock.Mock()
+        finisher = threading.Timer(0.05, idempotency.finish, (key, {'diaryId': 5}, 201))
+        finisher.start()
+        self.addCleanup(finisher.cancel)
+        self.assertEqual(idempotency.run_once(key, run), ({'diaryId': 5}, 201, True))
+        run.assert_not_called()
+
+    def test_in_progress_times_out_with_409(self):
+        key = self.key(HTTP_IDEMPOTENCY_KEY='k4')
+        self.assertIsNone(idempotency.begin(key))
+        run = mock.Mock()
+        timeout = settings.IDEMPOTENCY_LOCK_TIMEOUT
+        with mock.patch.object(idempotency.time, 'monotonic', side_effect=[0, 0, timeout + 1]), \
+                mock.patch.object(idempotency.time, 'sleep') as pause:
+            self.assertEqual(idempotency.run_once(key, run), (idempotency.IN_PROGRESS_PAYLOAD, 409, False))
+        pause.assert_called_once_with(idempotency.POLL_INTERVAL)
+        run.assert_not_called()
+
+    def test_async_waits_for_in_progress_request(self):
+        backend = AsyncOnlyCache()
+        key = self.key(HTTP_IDEMPOTENCY_KEY='k3')
+        run = mock.AsyncMock(return_value=({'diaryId': 2}, 201))
+
+        async def scenario():
+            first = await idempotency.arun_once(key, run)
+            await idempotency.arelease(key)
+            await backend.aadd(idempotency.KEY_PREFIX + key.cache_key, idempotency._pending(key), 10)
+
+            async def finish_later():
+                await asyncio.sleep(0.01)
+                await idempotency.afinish(key, {'diaryId': 3}, 201)
+
+            second, _ = await asyncio.gather(idempotency.arun_once(key, run), finish_later())
+            return first, second
+
+        with mock.patch('api.idempotency._cache', return_value=backend):
+            first, second = async_to_sync(scenario)()
+        self.assertEqual(first, ({'diaryId': 2}, 201, False))
+        self.assertEqual(second, ({'diaryId': 3}, 201, True))
+        self.assertEqual(run.await_count, 1)
+
+
+@override_settings(DIARY_JOB_MAX_ATTEMPTS=2, SENTIMENT_ENGINE='local')
+class DiaryJobTest(TestCase):
+    """
+    일기 생성 작업 가져가기 / 재시도 / 복구 확인
+    """
+    def setUp(self):
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        patcher = mock.patch.object(jobs, '_executor', None)  # 재시도를 백그라운드로 넘기지 않는다
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_job(self, **kwargs):
+        return DiaryJob.objects.create(user=self.user, conversation_data=[{'role': 'user', 'content': 'hi'}], **kwargs)
+
+    def test_claim_once(self):
+        job = self.create_job()
+        self.assertTrue(jobs.claim(job.id))
+        self.assertFalse(jobs.claim(job.id))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (DiaryJob.STATUS_RUNNING, 1))
+
+    def test_retry_after_partial_failure_reuses_diary(self):
+        job = self.create_job()
+        gemini = mock.Mock()
+        gemini.generate_content.return_value.candidates = []
+        local = services.local_analysis('좋은 하루')
+        with mock.patch('api.services.genai.GenerativeModel', return_value=gemini), \
+                mock.patch('api.services.extract_gemini_text', return_value='{"title": "t", "content": "c"}'), \
+                mock.patch('api.services.analyze_sentiment', side_effect=[RuntimeError('boom'), (local, SentimentAnalysis.SOURCE_LOCAL)]):
+            jobs.run_job(job.id)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (DiaryJob.STATUS_PENDING, 1))
+            self.assertIsNotNone(job.diary_id)
+
+            DiaryJob.objects.filter(pk=job.id).update(run_after=timezone.now())  # 백오프가 지난 것으로
+            jobs.run_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.status_code), (DiaryJob.STATUS_DONE, 201))
+        self.assertEqual(job.result['diaryId'], job.diary_id)
+        self.assertEqual(Diary.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(gemini.generate_content.call_count, 1)
+
+    @override_settings(DIARY_JOB_MAX_ATTEMPTS=3, DIARY_JOB_RETRY_BASE_SECONDS=10)
+    def test_unavailable_upstream_retries_with_backoff(self):
+        job = self.create_job()
+        with mock.patch('api.services.generate_diary', return_value=services.gemini_unavailable('timeout')):
+            jobs.run_job(job.id)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (DiaryJob.STATUS_PENDING, 1))
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=9))
+            # 기다리는 동안에는 가져가지 않는다
+            self.assertFalse(jobs.claim(job.id))
+            self.assertEqual(jobs.recover_jobs(), [])
+
+            DiaryJob.objects.filter(pk=job.id).update(run_after=timezone.now())
+            jobs.run_job(job.id)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (DiaryJob.STATUS_PENDING, 2))
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=19))
+
+            # 마지막 시도까지 503 이면 그 응답으로 실패 처리
+            DiaryJob.objects.filter(pk=job.id).update(run_after=timezone.now())
+            jobs.run_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.status_code, job.attempts), (DiaryJob.STATUS_FAILED, 503, 3))
+
+    @override_settings(DIARY_JOB_RETRY_BASE_SECONDS=5, DIARY_JOB_RETRY_MAX_SECONDS=30)
+    def test_retry_delay_is_capped(self):
+        self.assertEqual([jobs.retry_delay(attempts) for attempts in range(1, 6)], [5, 10, 20, 30, 30])
+
+    def test_recovery_counts_crashed_attempts(self):
+        stale = timezone.now() - timedelta(seconds=settings.DIARY_JOB_LEASE_SECONDS + 1)
+        crashed = self.create_job(status=DiaryJob.STATUS_RUNNING, locked_at=stale, attempts=1)
+        exhausted = self.create_job(status=DiaryJob.STATUS_RUNNING, locked_at=stale, attempts=2)
+        running = self.create_job(status=DiaryJob.STATUS_RUNNING, locked_at=timezone.now(), attempts=1)
+
+        self.assertEqual(jobs.recover_jobs(), [crashed.id])
+        exhausted.refresh_from_db()
+        self.assertEqual((exhausted.status, exhausted.status_code), (DiaryJob.STATUS_FAILED, 500))
+        running.refresh_from_db()
+        self.assertEqual(running.status, DiaryJob.STATUS_RUNNING)
+
+        # 가져간 뒤 다시 죽어도 시도 횟수를 넘겨 계속 재시도하지 않는다
+        self.assertTrue(jobs.claim(crashed.id))
+        DiaryJob.objects.filter(pk=crashed.id).update(status=DiaryJob.STATUS_PENDING)
+        self.assertFalse(jobs.claim(crashed.id))
+        self.assertEqual(jobs.recover_jobs(), [])
+
+
+def parse_sse(body):
+    """[(event, data), ...]"""
+    events = []
+    for block in body.decode().split('\n\n'):
+        if block:
+            lines = dict(line.split(': ', 1) for line in block.split('\n'))
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+class AsyncChunks:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+@override_settings(SENTIMENT_ENGINE='local', GEMINI_API_ENDPOINT='')
+class DiaryStreamTest(TestCase):
+    """
+    chat/end/stream/ SSE 이벤트와 스트리밍 파서, 중복 요청 제거 / 요청 기한 확인
+    """
+    CHUNKS = ['{"title": "산책', '", "content": "공원을 걸었다.\\n기분이 \\ud83d', '\\ude00 좋았다"}']
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(kakao_id=1, nickname='user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.model = mock.Mock()
+        self.model.generate_content.return_value = list(self.CHUNKS)
+        self.model.generate_content_async = mock.AsyncMock(return_value=AsyncChunks(self.CHUNKS))
+        for patcher in (mock.patch('api.services.genai.GenerativeModel', return_value=self.model),
+                        mock.patch('api.services.extract_gemini_text', new=lambda chunk: chunk)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, **headers):
+        return self.client.post('/api/chat/end/stream/', {'conversation': [{'role': 'user', 'content': 'hi'}]},
+                                format='json', **headers)
+
+    def test_parser_handles_split_escapes(self):
+        parser = services.DiaryStreamParser()
+        events = []
+        for text in ''.join(self.CHUNKS):  # 한 글자씩
+            events.extend(parser.feed(text))
+        fields = {}
+        for field, delta in events:
+            fields[field] = fields.get(field, '') + delta
+        self.assertEqual(fields, {'title': '산책', 'content': '공원을 걸었다.\n기분이 😀 좋았다'})
+
+    def test_sse_events_and_replay(self):
+        self.assertEqual(views.sse_event('title', {'delta': '산책'}), 'event: title\ndata: {"delta": "산책"}\n\n')
+
+        response = self.post(HTTP_IDEMPOTENCY_KEY='stream-1')
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        events = parse_sse(b''.join(response.streaming_content))
+        self.assertEqual(events[0], ('title', {'delta': '산책'}))
+        self.assertEqual(''.join(data['delta'] for event, data in events if event == 'content'), '공원을 걸었다.\n기분이 😀 좋았다')
+        event, payload = events[-1]
+        self.assertEqual((event, payload['diaryTitle']), ('done', '산책'))
+
+        # 같은 키로 다시 요청하면 Gemini 를 부르지 않고 저장된 응답을 done 하나로 보낸다
+        response = self.post(HTTP_IDEMPOTENCY_KEY='stream-1')
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(parse_sse(b''.join(response.streaming_content)), [('done', payload)])
+        self.assertEqual(self.model.generate_content.call_count, 1)
+        self.assertEqual(Diary.objects.filter(user=self.user).count(), 1)
+
+    @override_settings(CHAT_END_DEADLINE=0.01)
+    def test_deadline_ends_stream_and_allows_retry(self):
+        response = self.post(HTTP_IDEMPOTENCY_KEY='stream-2')
+        self.assertEqual(parse_sse(b''.join(response.streaming_content))[-1][0], 'error')
+        self.model.generate_content.assert_not_called()
+        with override_settings(CHAT_END_DEADLINE=30):
+            events = parse_sse(b''.join(self.post(HTTP_IDEMPOTENCY_KEY='stream-2').streaming_content))
+        self.assertEqual(events[-1][0], 'done')
+
+    @override_settings(ASYNC_CHAT_END=True)
+    def test_async_stream(self):
+        response = self.post()
+        self.assertTrue(response.is_async)
+
+        async def collect():
+            return [event async for event in services.astream_diary(self.user, [{'role': 'user', 'content': 'hi'}])]
+
+        events = async_to_sync(collect)()
+        self.assertEqual(events[0], ('title', {'delta': '산책'}, None))
+        self.assertEqual(events[-1][0::2], ('done', 201))
+        self.model.generate_content_async.assert_awaited()
+
+
+@override_settings(CLOVA_HEDGE_DELAY_MS=0)
+class AsyncSentimentCacheTest(TestCase):
+    """
+    arequest_sentiment 가 감정 분석 캐시를 비동기 API(aget / aset)로 조회 / 저장하는지 확인
+    """
+    CLOVA_RESULT = {'document': {'sentiment': 'positive', 'confidence': {'positive': 91.5, 'negative': 3, 'neutral': 5.5}}}
+
+    def setUp(self):
+        cache.clear()
+        services.sentiment_cache.clear()
+        services.clova_breaker.state = resilience.CircuitBreaker.CLOSED
+        self.client = mock.Mock()
+        self.client.post = mock.AsyncMock(return_value=mock.Mock(status_code=200, json=lambda: self.CLOVA_RESULT))
+        patcher = mock.patch('api.services.upstream.get_async_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_miss_then_hit(self):
+        expected = {'sentiment': 'positive', 'score': 91.5, 'negativeSentiment': None}
+        self.assertEqual(async_to_sync(services.arequest_sentiment)('오늘은  좋은 날'), expected)
+        # 공백만 다른 같은 본문은 Clova 를 다시 부르지 않는다
+        self.assertEqual(async_to_sync(services.arequest_sentiment)('오늘은 좋은 날'), expected)
+        self.assertEqual(self.client.post.await_count, 1)
+
+    def test_shared_backend_uses_async_api(self):
+        stored = {}
+        backend = mock.Mock(spec=['aget', 'aset'])  # get / set 을 부르면 AttributeError
+        backend.aget = mock.AsyncMock(side_effect=lambda key: stored.get(key))
+        backend.aset = mock.AsyncMock(side_effect=lambda key, value, timeout: stored.update({key: value}))
+        shared = TTLCache('test_async_shared', ttl=10, backend_alias='shared')
+        with mock.patch.object(services, 'sentiment_cache', shared), \
+                mock.patch.object(TTLCache, 'backend', new_callable=mock.PropertyMock, return_value=backend):
+            async_to_sync(services.arequest_sentiment)('오늘은 좋은 날')
+            shared.clear()  # 다른 워커처럼 프로세스 캐시 없이 2차 저장소에서 읽는다
+            async_to_sync(services.arequest_sentiment)('오늘은 좋은 날')
+        self.assertEqual(self.client.post.await_count, 1)
+        self.assertEqual(shared.stats()['shared_hits'], 1)
@@ -0,0 +1,132 @@
+"""
+Gemini / Clova 를 호출하는 엔드포인트 요청 제한 (토큰 버킷)
+
+GCRA 방식으로 버킷마다 "다음 토큰이 생기는 이론상 시각(TAT, ms)" 하나만 Django 캐시에 저장한다.
+허용된 요청은 cache.incr 한 번으로 끝나고 (원자적, Redis 면 워커 간 공유), 거절된 요청만 decr 로 되돌린다.
+한동안 요청이 없던 버킷은 set 으로 현재 시각부터 다시 시작한다 (동시에 들어온 요청끼리는 약간 더 허용될 수 있다).
+
+예산은 settings.RATE_LIMITS 에 범위(scope)별로 "<횟수>/<second|minute|hour|day>:<버스트>" 형식으로 둔다.
+인증된 요청은 사용자, 그렇지 않으면 클라이언트 IP 로 구분한다.
+"""
+import math
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+KEY_PREFIX = 'ratelimit:'
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+# 키를 남겨 두는 시간 (쉬고 있던 버킷은 어차피 다시 시작하므로 정리용)
+KEY_TTL = 24 * 60 * 60
+# X-Forwarded-For / NUM_PROXIES 처리는 DRF 의 get_ident 를 그대로 사용
+_ip_throttle = BaseThrottle()
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """"30/hour:5" -> (토큰 하나가 생기는 간격 ms, 버킷 크기). 버스트를 생략하면 횟수와 같다"""
+    rate, _, burst = rate.partition(':')
+    count, _, period = rate.partition('/')
+    count = int(count)
+    interval = max(1, round(PERIODS[period.strip()[0].lower()] * 1000 / count))
+    return interval, int(burst) if burst else count
+
+
+def _cache():
+    return caches[settings.RATE_LIMIT_CACHE_ALIAS]
+
+
+def _budget(scope):
+    """(토큰 간격 ms, 버킷 크기) 또는 제한하지 않으면 None"""
+    rate = settings.RATE_LIMITS.get(scope)
+    if not settings.RATE_LIMIT_ENABLED or not rate:
+        return None
+    return parse_rate(rate)
+
+
+def take(scope, ident):
+    """
+    scope 예산에서 토큰 하나를 쓴다. 허용되면 None, 아니면 다시 시도할 수 있을 때까지의 초
+    """
+    budget = _budget(scope)
+    if budget is None:
+        return None
+    interval, capacity = budget
+    cache = _cache()
+    key = f"{KEY_PREFIX}{scope}:{ident}"
+    now = int(time.time() * 1000)
+
+    try:
+        tat = cache.incr(key, interval)
+    except ValueError:
+        if cache.add(key, now + interval, KEY_TTL):
+            return None
+        tat = cache.incr(key, interval)
+
+    if tat - interval < now:
+        # 쉬고 있던 버킷: 가득 찬 상태이므로 지금부터 다시 센다
+        cache.set(key, now + interval, KEY_TTL)
+        return None
+    if tat - now > capacity * interval:
+        cache.decr(key, interval)
+        return (tat - now - capacity * interval) / 1000
+    return None
+
+
+async def atake(scope, ident):
+    """take 의 비동기 버전 (Django 캐시의 비동기 API 사용)"""
+    budget = _budget(scope)
+    if budget is None:
+        return None
+    interval, capacity = budget
+    cache = _cache()
+    key = f"{KEY_PREFIX}{scope}:{ident}"
+    now = int(time.time() * 1000)
+
+    try:
+        tat = await cache.aincr(key, interval)
+    except ValueError:
+        if await cache.aadd(key, now + interval, KEY_TTL):
+            return None
+        tat = await cache.aincr(key, interval)
+
+    if tat - interval < now:
+        await cache.aset(key, now + interval, KEY_TTL)
+        return None
+    if tat - now > capacity * interval:
+        await cache.adecr(key, interval)
+        return (tat - now - capacity * interval) / 1000
+    return None
+
+
+def client_ident(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{_ip_throttle.get_ident(request)}"
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    뷰의 throttle_scope (뷰셋이면 throttle_scopes[action]) 예산을 적용한다.
+    범위가 없는 뷰 / 액션은 제한하지 않는다.
+    """
+    def __init__(self):
+        self.retry_after = None
+
+    def allow_request(self, request, view):
+        scopes = getattr(view, 'throttle_scopes', None)
+        scope = scopes.get(getattr(view, 'action', None)) if scopes else getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+        self.retry_after = take(scope, client_ident(request))
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+def retry_after_header(seconds):
+    return str(max(1, math.ceil(seconds)))
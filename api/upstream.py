@@ -0,0 +1,117 @@
+"""
+카카오 / Clova 등 외부 API 호출에 공통으로 사용하는 HTTP 클라이언트
+호스트별 커넥션 풀과 keep-alive 를 유지하고, 기본 타임아웃과 제한된 재시도를 적용한다.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+# httpx.AsyncClient 의 커넥션 풀은 이벤트 루프에 묶이므로 루프마다 하나씩 유지
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def kakao_auth_url(path):
+    return settings.KAKAO_AUTH_HOST.rstrip('/') + path
+
+
+def kakao_api_url(path):
+    return settings.KAKAO_API_HOST.rstrip('/') + path
+
+
+def default_timeout():
+    return (settings.UPSTREAM_CONNECT_TIMEOUT, settings.UPSTREAM_READ_TIMEOUT)
+
+
+def build_session():
+    # 연결 실패는 메서드와 관계없이 재시도하고 (요청이 전송되기 전이므로 안전),
+    # 읽기 실패 / 5xx 응답은 멱등한 메서드(GET, HEAD 등)만 재시도한다.
+    retry = Retry(
+        total=settings.UPSTREAM_MAX_RETRIES,
+        connect=settings.UPSTREAM_MAX_RETRIES,
+        read=settings.UPSTREAM_MAX_RETRIES,
+        status=settings.UPSTREAM_MAX_RETRIES,
+        backoff_factor=settings.UPSTREAM_BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.UPSTREAM_POOL_CONNECTIONS,
+        pool_maxsize=settings.UPSTREAM_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # 여러 스레드가 공유하는 세션이므로 응답 쿠키를 저장하지 않는다
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault('timeout', default_timeout())
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def get_async_client():
+    """현재 이벤트 루프에서 사용할 httpx.AsyncClient (비동기 뷰용)"""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_POOL_CONNECTIONS * settings.UPSTREAM_POOL_MAXSIZE,
+                max_keepalive_connections=settings.UPSTREAM_POOL_MAXSIZE,
+            ),
+            retries=settings.UPSTREAM_MAX_RETRIES,  # 연결 실패만 재시도
+        )
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.UPSTREAM_READ_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT),
+            transport=transport,
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def prewarm():
+    """워커 시작 시 외부 호스트로 미리 연결(TCP + TLS)을 맺어 풀에 넣어 둔다"""
+    hosts = {settings.KAKAO_AUTH_HOST, settings.KAKAO_API_HOST, settings.CLOVA_SENTIMENT_URL}
+    for url in hosts:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        try:
+            get_session().head(origin, timeout=default_timeout(), allow_redirects=False)
+        except requests.RequestException as e:
+            logger.warning("Upstream prewarm failed for %s: %s", origin, e)
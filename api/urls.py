@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 # from rest_framework_simplejwt.views import (
@@ -5,8 +6,9 @@ from rest_framework.routers import DefaultRouter
 #     TokenRefreshView,
 # )
 
-from .views import (KakaoLoginCallbackView, DiaryViewSet,
-                    SentimentAnalysisViewSet, UserViewSet)
+from . import async_views
+from .views import (KakaoLoginCallbackView, DiaryJobStatusView, DiaryViewSet,
+                    MoodCalendarView, SentimentAnalysisViewSet, SentimentSummaryView, UserViewSet)
 
 # DefaultRouter를 사용하여 ViewSet을 자동으로 라우팅
 router = DefaultRouter()
@@ -14,13 +16,23 @@ router.register(r'users', UserViewSet)  # 유저 관련 API
 router.register(r'diaries', DiaryViewSet)  # 일기 관련 API
 router.register(r'sentimentanalysis', SentimentAnalysisViewSet)  # 감정 분석 API
 
+# ASGI 로 서비스할 때는 chat/end/ 를 비동기 뷰로 처리
+if settings.ASYNC_CHAT_END:
+    chat_end_view = async_views.chat_end
+else:
+    chat_end_view = DiaryViewSet.as_view({'post': 'create'})
+
 # URL 패턴
 urlpatterns = [
     path('', include(router.urls)),  # 등록된 ViewSet 라우팅을 포함
     path('accounts/kakao/login/callback/', KakaoLoginCallbackView.as_view(), name='kakao-login-callback'),
-    path('chat/end/', DiaryViewSet.as_view({'post': 'create'}), name='chat-end'),  # 채팅 종료 후 일기 생성 API
+    path('chat/end/', chat_end_view, name='chat-end'),  # 채팅 종료 후 일기 생성 API
+    path('chat/end/stream/', DiaryViewSet.as_view({'post': 'create_stream'}), name='chat-end-stream'),  # 일기 생성 스트리밍(SSE) API
+    path('chat/jobs/<uuid:job_id>/', DiaryJobStatusView.as_view(), name='chat-job-status'),  # 백그라운드 일기 생성 작업 상태 조회 API
     path('chat/diary/save/', DiaryViewSet.as_view({'post': 'save_diary'}), name='diary-save'),  # 일기 저장 API
     path('diary/list/', DiaryViewSet.as_view({'get': 'list'}), name='diary-list'),  # 일기 목록 API
+    path('calendar/<int:year>/<int:month>/', MoodCalendarView.as_view(), name='mood-calendar'),  # 월별 감정 캘린더 API
     path('diary/<int:pk>/', DiaryViewSet.as_view({'get': 'retrieve', 'post': 'update'}), name='diary-detail'),  # 특정 일기 열람, 편집 및 저장 API
     path('analytic/sentiment/', SentimentAnalysisViewSet.as_view({'get': 'list'}), name='sentiment-analysis'),  # 감정 분석 결과 조회 API
+    path('analytic/sentiment/summary/', SentimentSummaryView.as_view(), name='sentiment-summary'),  # 기간별 감정 분포 / 일별 추이 API
 ]
\ No newline at end of file
@@ -2,18 +2,19 @@ import requests
 import os
 import logging
 import json
+from datetime import date, timedelta
 
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 from django.contrib.auth import get_user_model, login
+from django.db.models.functions import Substr
 from dotenv import load_dotenv
 import google.generativeai as genai
 
-import random
-
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.authentication import (BasicAuthentication,
@@ -23,15 +24,28 @@ from rest_framework.permissions import (AllowAny, IsAuthenticated) # 테스트 
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Diary, SentimentAnalysis, User
-from .serializers import (DiarySerializer,
-                          SentimentAnalysisSerializer, UserSerializer)
+from . import conditional, idempotency, jobs, metrics, mood_calendar, prompts, resilience, rollup, services, upstream
+from .cache import TTLCache, hash_key
+from .models import Diary, DiaryJob, SentimentAnalysis, User
+from .pagination import DiaryCursorPagination
+from .serializers import (DiarySerializer, SentimentAnalysisSerializer,
+                          UserSerializer, parse_fields)
+from .throttling import TokenBucketThrottle
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+# 토큰 해시 -> {"kakao_id", "user_id"} 또는 카카오가 거절한 토큰이면 INVALID_TOKEN
+kakao_token_cache = TTLCache(
+    'kakao_token',
+    maxsize=settings.KAKAO_TOKEN_CACHE_MAXSIZE,
+    ttl=settings.KAKAO_TOKEN_CACHE_TTL,
+    backend_alias=settings.KAKAO_TOKEN_CACHE_ALIAS,
+)
+INVALID_TOKEN = {"invalid": True}
+
 # 나의 잘못된 이해로 인한 코드
 # class KakaoLoginStartView(APIView):
 #     permission_classes = [AllowAny]
@@ -42,13 +56,13 @@ User = get_user_model()
 @method_decorator(csrf_exempt, name='dispatch')
 class KakaoLoginCallbackView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
-        logger.debug(f"Incoming request path: {request.path}")
-        logger.debug(f"Incoming request method: {request.method}")
+        logger.debug("Incoming request %s %s", request.method, request.path)
 
         code = request.data.get('code')
-        logger.debug(f"Receuved code: {code}")
         if not code:
             return Response({"error": "Authorization code not provided"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -61,7 +75,7 @@ class KakaoLoginCallbackView(APIView):
     #         return Response({"error": "Authorization code not provided"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Step 1: Get the access token from Kakao
-        token_url = "https://kauth.kakao.com/oauth/token"
+        token_url = upstream.kakao_auth_url("/oauth/token")
 
         data = {
             "grant_type": "authorization_code",
@@ -72,10 +86,14 @@ class KakaoLoginCallbackView(APIView):
         headers = {
             "Content-type": "application/x-www-form-urlencoded;charset=utf-8"
         }
-        logger.debug(f"KAKAO_REDIRECT_URI: {settings.KAKAO_REDIRECT_URI}")
-        token_response = requests.post(token_url, data=data, headers=headers)
+        try:
+            token_response = upstream.post(token_url, data=data, headers=headers)
+        except requests.RequestException as e:
+            logger.error("Kakao token request failed: %s", e)
+            return Response({"error": "Failed to get access token"}, status=status.HTTP_502_BAD_GATEWAY)
         token_json = token_response.json()
-        logger.debug(f"Token response: {token_json}")
+        # 토큰 값은 남기지 않는다
+        logger.debug("Kakao token response: status=%s keys=%s", token_response.status_code, sorted(token_json))
 
         if token_response.status_code != 200:
             return Response({"error": "Failed to get access token", "details": settings.KAKAO_REDIRECT_URI}, status=status.HTTP_400_BAD_REQUEST)
@@ -84,16 +102,18 @@ class KakaoLoginCallbackView(APIView):
         if not access_token:
             return Response({"error": "Access token not found in response"}, status=status.HTTP_400_BAD_REQUEST)
 
-        logger.debug(f"Access token: {access_token}")
-
         # Step 2: Get the user's Kakao ID (회원번호) using the access token
-        user_info_url = "https://kapi.kakao.com/v2/user/me"
+        user_info_url = upstream.kakao_api_url("/v2/user/me")
         headers = {
             "Authorization": f"Bearer {access_token}"
         }
-        user_info_response = requests.get(user_info_url, headers=headers)
+        try:
+            user_info_response = upstream.get(user_info_url, headers=headers)
+        except requests.RequestException as e:
+            logger.error("Kakao user info request failed: %s", e)
+            return Response({"error": "Failed to fetch user info"}, status=status.HTTP_502_BAD_GATEWAY)
         user_info_json = user_info_response.json()
-        logger.debug(f"User info: {user_info_json}")
+        logger.debug("Kakao user info response: status=%s", user_info_response.status_code)
 
         if user_info_response.status_code != 200:
             return Response({"error": "Failed to fetch user info", "details": user_info_json}, status=status.HTTP_400_BAD_REQUEST)
@@ -116,7 +136,14 @@ class KakaoLoginCallbackView(APIView):
                 "connected_at": timezone.now()
             }
         )
-        logger.debug(f"User created or retrieved: {user}, created: {created}")
+        logger.info("Kakao login: user_id=%s created=%s", user.id, created)
+
+        # 발급 직후의 토큰은 이미 검증된 것이므로 만료 시간까지 캐시에 넣어 둔다
+        kakao_token_cache.set(
+            hash_key(access_token),
+            {"kakao_id": kakao_id, "user_id": user.id},
+            token_json.get("expires_in"),
+        )
 
         request.user = user
 
@@ -185,24 +212,58 @@ class KakaoAccessTokenAuthentication(BasicAuthentication):
         if not auth_header:
             return None
         
-        token = auth_header.split(" ")[1]
-        user_info = self.get_user_info(token)
+        parts = auth_header.split()
+        if len(parts) != 2:
+            raise AuthenticationFailed('Invalid Authorization header. Expected "Bearer <token>".')
 
-        if user_info is None:
-            raise AuthenticationFailed('Invalid or expired token.')
+        with metrics.stage('auth'):
+            token = parts[1]
+            token_key = hash_key(token)
+            identity = kakao_token_cache.get_or_load(token_key, lambda: self.validate_token(token))
 
-        kakao_id = user_info.get('id')
-        user, _ = User.objects.get_or_create(kakao_id=kakao_id)
+            if identity is None or identity.get('invalid'):
+                raise AuthenticationFailed('Invalid or expired token.')
+
+            user = User.objects.filter(pk=identity['user_id']).first()
+            if user is None:
+                # 캐시된 사용자가 삭제된 경우
+                kakao_token_cache.delete(token_key)
+                user, _ = User.objects.get_or_create(kakao_id=identity['kakao_id'])
 
         return (user, None)
 
-    def get_user_info(self, token):
-        user_info_url = "https://kapi.kakao.com/v2/user/me"
+    def validate_token(self, token):
+        """
+        카카오에 토큰을 검증하고 캐시에 넣을 (identity, ttl) 을 반환
+        ttl 은 토큰의 남은 만료 시간(expires_in)으로, 캐시 TTL 보다 짧으면 이 값을 따른다.
+        카카오가 거절한 토큰은 KAKAO_TOKEN_NEGATIVE_TTL 동안 INVALID_TOKEN 으로 기억하고,
+        네트워크 오류 / 5xx 는 캐시하지 않는다.
+        """
+        token_info = self.get_token_info(token)
+        if token_info is None:
+            return None, None
+        if token_info is INVALID_TOKEN:
+            return INVALID_TOKEN, settings.KAKAO_TOKEN_NEGATIVE_TTL
+
+        kakao_id = token_info.get('id')
+        user, _ = User.objects.get_or_create(kakao_id=kakao_id)
+
+        return {"kakao_id": kakao_id, "user_id": user.id}, token_info.get('expires_in')
+
+    def get_token_info(self, token):
+        token_info_url = upstream.kakao_api_url("/v1/user/access_token_info")
         headers = {
             "Authorization": f"Bearer {token}"
         }
-        response = requests.get(user_info_url, headers=headers)
+        try:
+            with metrics.stage('kakao'):
+                response = upstream.get(token_info_url, headers=headers)
+        except requests.RequestException as e:
+            logger.error("Kakao token validation failed: %s", e)
+            return None
 
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            return INVALID_TOKEN
         if response.status_code != 200:
             return None
 
@@ -217,6 +278,8 @@ class SentimentAnalysisViewSet(viewsets.ModelViewSet):
     # permission_classes = [AllowAny]  # 인증 없이 접근 가능
     # 테스트 이후 사용 (실제 환경에서는 인증 필요)
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scopes = {'create': 'sentiment'}
 
     def create(self, request, *args, **kwargs):
         """
@@ -248,32 +311,18 @@ class SentimentAnalysisViewSet(viewsets.ModelViewSet):
         # }, status=status.HTTP_201_CREATED)
 
         # 실제 API 호출 (테스트 이후 사용)
-        clova_api_url = "https://naveropenapi.apigw.ntruss.com/sentiment-analysis/v1/analyze"
-        headers = {
-            "X-NCP-APIGW-API-KEY-ID": os.getenv('CLOVA_API_KEY_ID'),
-            "X-NCP-APIGW-API-KEY": os.getenv('CLOVA_API_KEY'),
-            "Content-Type": "application/json"
-        }
-
-        data = {
-            "content": diary.content,
-            "config": {
-                "negativeClassification": True
-            }
-        }
-
-        response = requests.post(clova_api_url, headers=headers, json=data)
-
-        if response.status_code == 200:
-            sentiment_result = response.json()
+        with resilience.deadline(settings.SENTIMENT_DEADLINE):
+            sentiment_result = services.fetch_sentiment_result(diary.content)
 
+        if sentiment_result is not None:
             sentiment = sentiment_result.get('document', {}).get('sentiment', 'neutral')
-            classified_sentiment = self.classified_sentiment(sentiment, 'neutral')
+            classified_sentiment = self.classified_sentiment(sentiment)
             
             sentiment_analysis = SentimentAnalysis.objects.create(
                 diary=diary,
                 sentiment=sentiment,
-                score=1.0
+                score=1.0,
+                source=SentimentAnalysis.SOURCE_CLOVA
             )
 
             serializer = self.get_serializer(sentiment_analysis)
@@ -284,7 +333,23 @@ class SentimentAnalysisViewSet(viewsets.ModelViewSet):
                 "emoji": classified_sentiment,
             }, status=status.HTTP_201_CREATED)
         else:
-            return Response({"error": "Clova 감정 분석 실패"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            # Clova 실패 또는 브레이커가 열린 경우 로컬 분석기로 대체
+            analysis = services.local_analysis(diary.content)
+            sentiment_analysis = SentimentAnalysis.objects.create(
+                diary=diary,
+                sentiment=analysis["sentiment"],
+                score=analysis["score"],
+                source=SentimentAnalysis.SOURCE_LOCAL
+            )
+            classified_sentiment = self.classified_sentiment(analysis["sentiment"])
+
+            serializer = self.get_serializer(sentiment_analysis)
+            return Response({
+                "message": "Clova 감정 분석 실패, 기본 감정 분석 사용",
+                "analysis": serializer.data,
+                "sentiment": classified_sentiment,
+                "emoji": classified_sentiment,
+            }, status=status.HTTP_200_OK)
 
     def classified_sentiment(self, sentiment):
         if sentiment == "positive":
@@ -303,7 +368,70 @@ class SentimentAnalysisViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+class DiaryJobStatusView(APIView):
+    """
+    chat/end?async=true 로 등록한 일기 생성 작업의 상태 조회
+    """
+    authentication_classes = [KakaoAccessTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id, *args, **kwargs):
+        try:
+            job = DiaryJob.objects.get(id=job_id, user=request.user)
+        except DiaryJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        payload = jobs.status_payload(job)
+        if job.status in (DiaryJob.STATUS_PENDING, DiaryJob.STATUS_RUNNING):
+            return Response(payload, status=status.HTTP_202_ACCEPTED)
+        return Response(payload, status=status.HTTP_200_OK)
+
+class SentimentSummaryView(APIView):
+    """
+    사용자의 기간별 감정 분포와 일별 시계열 (일별 감정 집계 테이블에서 조회)
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD, 기본값은 오늘까지 SENTIMENT_SUMMARY_DEFAULT_DAYS 일
+    """
+    authentication_classes = [KakaoAccessTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            end = self.parse_date(request.query_params.get('end')) or timezone.localdate()
+            start = self.parse_date(request.query_params.get('start')) or end - timedelta(days=settings.SENTIMENT_SUMMARY_DEFAULT_DAYS - 1)
+        except ValueError:
+            return Response({"error": "start, end 는 YYYY-MM-DD 형식이어야 합니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start > end:
+            return Response({"error": "start 는 end 보다 늦을 수 없습니다."}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days + 1 > settings.SENTIMENT_SUMMARY_MAX_DAYS:
+            return Response({"error": f"조회 기간은 최대 {settings.SENTIMENT_SUMMARY_MAX_DAYS}일입니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"code": 200, **rollup.summary(request.user, start, end)}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def parse_date(value):
+        return date.fromisoformat(value) if value else None
+
+class MoodCalendarView(APIView):
+    """
+    월별 감정 캘린더: 날짜별 일기 id 와 대표 이모지
+    """
+    authentication_classes = [KakaoAccessTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, year, month, *args, **kwargs):
+        if not (1 <= month <= 12 and 1 <= year <= 9998):
+            return Response({"error": "잘못된 연도 또는 월입니다."}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = mood_calendar.get(request.user.id, year, month)
+        return Response({"code": 200, "year": year, "month": month, "days": days}, status=status.HTTP_200_OK)
+
+def sse_event(event, data):
+    """Server-Sent Events 이벤트 하나 (data 는 한 줄 JSON)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+services.configure_gemini()
 class DiaryViewSet(viewsets.ModelViewSet):
     """
     GPT와의 대화 내용을 기반으로 Gemini에 일기 생성을 요청하는 뷰셋
@@ -314,6 +442,8 @@ class DiaryViewSet(viewsets.ModelViewSet):
     # 테스트 이후 사용 (실제 환경에서는 인증 필요)
     authentication_classes = [KakaoAccessTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scopes = {'create': 'chat_end', 'create_stream': 'chat_end'}  # Gemini 를 호출하는 액션만 제한
 
     def create(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
@@ -321,157 +451,102 @@ class DiaryViewSet(viewsets.ModelViewSet):
         
         """채팅 세션의 대화 내용을 받아 Gemini에 일기 생성 요청"""
         conversation_data = request.data.get("conversation")
-        if not conversation_data:
+        if not prompts.has_turns(conversation_data):
             return Response({"error": "Conversation data is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-
-        diary_creation_prompt = (
-            f"다음 대화를 바탕으로 User의 입장에서 일기 항목을 작성해 주세요. "
-            f"일기에는 제목이 포함되어야 하며 User의 경험과 대화에 대한 생각을 서술해야 합니다. "
-            f"결과를 다음 형식으로 작성해 주세요: {{ \"title\": \"일기 제목\", \"content\": \"일기 내용\" }}\n\n"
-            f"{json.dumps(conversation_data, ensure_ascii=False)}"
-        )
-
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(diary_creation_prompt)
-
-        # Log the full response for debugging
-        logger.debug(f"Gemini API response: {response}")
-
-        # Check the response structure
-        if response:
-            logger.debug(f"Response type: {type(response)}")  # Log the type of response
-            logger.debug(f"Full Response: {response}")  # Log the entire response object
-
-            # Check for candidates in the response directly
-            if hasattr(response, 'candidates') and response.candidates:
-                diary_data = response.candidates[0].content.parts[0].text
-                
-                # Log the raw diary data
-                logger.debug(f"Raw diary data from Gemini: {diary_data}")
-
-                # Clean the response to remove markdown formatting
-                cleaned_data = diary_data.replace("```json\n", "").replace("```", "").strip()
-                logger.debug(f"Cleaned diary data: {cleaned_data}")  # Log the cleaned data
-
-                try:
-                    # Attempt to parse the cleaned JSON string
-                    diary_info = json.loads(cleaned_data)
-                    title = diary_info.get('title', '제목없음')
-                    content = diary_info.get('content', '')
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON Decode Error: {str(e)} with data: {cleaned_data}")
-                    return Response({"error": f"Failed to parse diary data: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-                # Create the diary entry
-                diary = Diary.objects.create(
-                    user=request.user,
-                    title=title,
-                    content=content
-                )
-
-            clova_api_url = "https://naveropenapi.apigw.ntruss.com/sentiment-analysis/v1/analyze"
-            headers = {
-                "X-NCP-APIGW-API-KEY-ID": os.getenv('CLOVA_API_KEY_ID'),
-                "X-NCP-APIGW-API-KEY": os.getenv('CLOVA_API_KEY'),
-                "Content-Type": "application/json"
-            }
-
-            data = {
-                "content": content,
-                "config": {
-                    "negativeClassification": True
-                }
-            }
-
-            response = requests.post(clova_api_url, headers=headers, json=data)
-
-            if response.status_code == 200:
-                sentiment_result = response.json()
-                sentiment = sentiment_result.get('document', {}).get('sentiment', 'neutral')
-                
-                # Check if negative sentiment exists
-                negative_sentiment = sentiment_result.get('sentences', [{}])[0].get('negativeSentiment', {}).get('sentiment', None)
-                if negative_sentiment:
-                    sentiment = negative_sentiment
-
-                confidence_scores = sentiment_result.get('document', {}).get('confidence', {})
-                positive_confidence = confidence_scores.get('positive', 0)
-                negative_confidence = confidence_scores.get('negative', 0)
-                neutral_confidence = confidence_scores.get('neutral', 0)
-
-                emoji = self.classified_sentiment(sentiment)
-
-                # Save the sentiment analysis result
-                sentiment_analysis, created = SentimentAnalysis.objects.update_or_create(
-                    diary=diary,
-                    defaults={
-                        'sentiment': sentiment,
-                        'score': max(positive_confidence, negative_confidence, neutral_confidence)
-                    }
-                )
-
-                return Response({
-                    "code": 200,
-                    "message": "Chat ended and diary created",
-                    "diaryTitle": title,
-                    "diaryContent": content,
-                    "emoji": emoji,
-                    "sentiment_analysis": {
-                        "sentiment": sentiment,
-                        "score": max(positive_confidence, negative_confidence, neutral_confidence),
-                        "negativeSentiment": negative_sentiment if negative_sentiment else "None"  # Include negative sentiment
-                    },
-                    "diaryId": diary.id
-                }, status=status.HTTP_201_CREATED)
-            else:
-                sentiment = self.classified_sentiment_random()
-                emoji = self.classified_sentiment(sentiment)
-
-                sentiment_analysis, created = SentimentAnalysis.objects.update_or_create(
-                    diary=diary,
-                    defaults={
-                        'sentiment': sentiment,
-                        'score': 1.0
-                    }
-                )
-
-                return Response({
-                    "code":200,
-                    "message": "Using default sentiment",
-                    "diaryTitle": title,
-                    "diaryContent": content,
-                    "emoji": emoji,
-                    "sentiment_analysis": {
-                        "sentiment": sentiment,
-                        "score": 1.0,
-                        "negativeSentiment": "None"
-                    },
-                    "diaryId": diary.id
-                }, status=status.HTTP_200_OK)
-
+        # ?async=true 또는 Prefer: respond-async 이면 작업만 등록하고 바로 202 응답
+        background = jobs.wants_background(request)
+        if background:
+            def run():
+                with metrics.stage('enqueue'):
+                    job = jobs.enqueue(request.user, conversation_data)
+                return jobs.accepted_payload(job), status.HTTP_202_ACCEPTED
         else:
-            logger.error("No response received from Gemini API.")
-            return Response({"error": "Failed to generate diary from Gemini"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            def run():
+                with resilience.deadline(settings.CHAT_END_DEADLINE):
+                    return services.generate_diary(request.user, conversation_data)
+
+        # 재시도로 들어온 같은 요청은 진행 중인 생성 결과를 기다렸다가 저장된 응답을 돌려준다
+        key = idempotency.request_key(request, request.user, conversation_data, background)
+        with metrics.stage('handler'):
+            payload, status_code, replayed = idempotency.run_once(key, run)
+
+        response = Response(payload, status=status_code)
+        if replayed:
+            response['Idempotent-Replayed'] = 'true'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='stream')
+    def create_stream(self, request):
+        """
+        chat/end 의 스트리밍 버전 (Server-Sent Events)
+        Gemini 가 생성하는 제목/내용을 title, content 이벤트로 바로 내보내고
+        저장과 감정 분석이 끝나면 chat/end 응답 본문을 done 이벤트로 보낸다.
+        chat/end 와 같은 중복 요청 제거 키와 요청 기한(CHAT_END_DEADLINE)을 쓴다.
+        """
+        conversation_data = request.data.get("conversation")
+        if not prompts.has_turns(conversation_data):
+            return Response({"error": "Conversation data is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-    def classified_sentiment(self, sentiment):
-        if sentiment == "positive":
-            return "happy"
-        elif sentiment == "anger":
-            return "anger"
-        elif sentiment == "negative" or sentiment == "etc":
-            return "negative"
-        # elif sentiment == "etc" :
-        #     return "sad"
-        # elif sentiment == "fear":
-        #     return "fear"
-        else:
-            return "neutral"
+        # 같은 요청이 처리 중이면 409, 이미 끝났으면 저장된 응답을 done 이벤트 하나로 보낸다
+        key = idempotency.request_key(request, request.user, conversation_data)
+        started = idempotency.begin(key)
+        if started is not None:
+            payload, status_code, replayed = started
+            if not replayed:
+                return Response(payload, status=status_code)
+            response = self.event_stream_response([sse_event("done", payload)])
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        # ASGI 에서는 동기 이터레이터를 다 모은 뒤에 보내므로 비동기 제너레이터로 스트리밍한다
+        stream = self.aevent_stream if settings.ASYNC_CHAT_END else self.event_stream
+        return self.event_stream_response(stream(key, request.user, conversation_data))
+
+    @staticmethod
+    def event_stream_response(events):
+        response = StreamingHttpResponse(events, content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx 프록시 버퍼링 끄기
+        return response
+
+    @staticmethod
+    def event_stream(key, user, conversation_data):
+        finished = False
+        try:
+            with resilience.deadline(settings.CHAT_END_DEADLINE):
+                for event, data, status_code in services.stream_diary(user, conversation_data):
+                    if status_code is not None:
+                        idempotency.finish(key, data, status_code)
+                        finished = True
+                    yield sse_event(event, data)
+        except Exception as e:
+            logger.exception("Diary stream failed")
+            yield sse_event("error", {"error": str(e)})
+        finally:
+            # 중간에 끊기거나 실패한 요청은 다시 시도할 수 있게 한다
+            if not finished:
+                idempotency.release(key)
+
+    @staticmethod
+    async def aevent_stream(key, user, conversation_data):
+        finished = False
+        try:
+            with resilience.deadline(settings.CHAT_END_DEADLINE):
+                async for event, data, status_code in services.astream_diary(user, conversation_data):
+                    if status_code is not None:
+                        await idempotency.afinish(key, data, status_code)
+                        finished = True
+                    yield sse_event(event, data)
+        except Exception as e:
+            logger.exception("Diary stream failed")
+            yield sse_event("error", {"error": str(e)})
+        finally:
+            if not finished:
+                await idempotency.arelease(key)
 
-    def classified_sentiment_random(self):
-        emotions = ["happy", "anger", "negative", "neutral"]
-        return random.choice(emotions)
+    def classified_sentiment(self, sentiment):
+        return services.classified_sentiment(sentiment)
 
     @action(detail=False, methods=['post'], url_path='save')
     def save_diary(self, request):
@@ -512,25 +587,20 @@ class DiaryViewSet(viewsets.ModelViewSet):
                     }
                 }, status=status.HTTP_200_OK)
             else:
-                sentiment = self.classified_sentiment_random()
+                # 감정 분석 결과가 없으면 로컬 분석기로 바로 채운다 (local_refine 이면 Clova 로 나중에 보정)
+                analysis = services.local_analysis(diary.content)
+                services.save_sentiment(diary, analysis, SentimentAnalysis.SOURCE_LOCAL)
+                sentiment = analysis["sentiment"]
                 emoji = self.classified_sentiment(sentiment)
 
-                sentiment_analysis, created = SentimentAnalysis.objects.update_or_create(
-                    diary=diary,
-                    defaults={
-                        'sentiment': sentiment,
-                        'score':1.0
-                    }
-                )
-
                 return Response({
                     "message": "Diary saved successfully",
                     "diary": serializer.data,
                     "sentiment_analysis": {
                         "sentiment": sentiment,
-                        "score": 1.0,
+                        "score": analysis["score"],
                         "emoji": emoji,
-                        "negativeSentiment": "None"
+                        "negativeSentiment": analysis["negativeSentiment"] or "None"
                     }
                 }, status=status.HTTP_200_OK)
             # # Now perform sentiment analysis on the updated content
@@ -588,48 +658,115 @@ class DiaryViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    # diary/list/ 응답 필드 -> 조회할 컬럼
+    list_field_columns = {
+        'diaryId': ('id',),
+        'title': ('title',),
+        'date': ('created_at',),
+        'content': ('content',),
+        'emoji': ('sentiment_analysis__sentiment',),
+    }
+
+    @staticmethod
+    def get_preview_chars(request):
+        try:
+            preview_chars = int(request.query_params['preview_chars'])
+        except (KeyError, ValueError):
+            return None
+        return preview_chars if preview_chars > 0 else None
+
+    def get_queryset(self):
+        # 로그인한 사용자의 일기만, 작성자와 감정 분석 결과는 JOIN 으로 함께 조회
+        return Diary.objects.filter(user=self.request.user).select_related('user', 'sentiment_analysis')
+
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        etag, last_modified = conditional.diary_list_validators(request.user, request)
+        not_modified = conditional.check(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        # ?fields=diaryId,title,... 로 필요한 필드만, ?preview_chars=N 이면 content 를 DB 에서 N 글자로 잘라 조회
+        requested = parse_fields(request.query_params.get('fields'))
+        fields = [name for name in self.list_field_columns if requested is None or name in requested]
+        preview_chars = self.get_preview_chars(request)
+
+        columns = {'id', 'created_at'}  # 정렬과 커서에 항상 필요
+        for name in fields:
+            if not (name == 'content' and preview_chars):
+                columns.update(self.list_field_columns[name])
+
+        queryset = Diary.objects.filter(user=request.user)
+        if 'emoji' in fields:
+            queryset = queryset.select_related('sentiment_analysis')
+        queryset = queryset.only(*columns)
+        if 'content' in fields and preview_chars:
+            queryset = queryset.annotate(content_preview=Substr('content', 1, preview_chars))
+
+        paginator = DiaryCursorPagination()
+        diaries = paginator.paginate_queryset(queryset, request, view=self)
 
         diaries_data = []
 
-        for diary in serializer.data:
-            diary_data = {
-                "diaryId": diary['id'],
-                "title": diary['title'],
-                "date": diary['created_at'].split("T")[0],
-                "content": diary['content'],
-            }
-            
-            sentiment_analysis = SentimentAnalysis.objects.filter(diary=diary['id']).first()
-            if sentiment_analysis:
-                sentiment = sentiment_analysis.sentiment
-                emoji = self.classified_sentiment(sentiment)
-            else:
-                sentiment = 'neutral'
-                emoji = 'neutral'
+        for diary in diaries:
+            diary_data = {}
+            if 'diaryId' in fields:
+                diary_data['diaryId'] = diary.id
+            if 'title' in fields:
+                diary_data['title'] = diary.title
+            if 'date' in fields:
+                diary_data['date'] = timezone.localtime(diary.created_at).date().isoformat()
+            if 'content' in fields:
+                diary_data['content'] = diary.content_preview if preview_chars else diary.content
+
+            if 'emoji' in fields:
+                sentiment_analysis = getattr(diary, 'sentiment_analysis', None)
+                if sentiment_analysis:
+                    emoji = self.classified_sentiment(sentiment_analysis.sentiment)
+                else:
+                    emoji = 'neutral'
+                diary_data['emoji'] = emoji
 
-            diary_data['emoji'] = emoji
             diaries_data.append(diary_data)
             
-        return Response({
+        return conditional.set_headers(Response({
             "code": 200,
-            "diaries": diaries_data
-        }, status=status.HTTP_200_OK)
+            "diaries": diaries_data,
+            "next": paginator.get_next_link(),
+        }, status=status.HTTP_200_OK), etag, last_modified)
 
     def retrieve(self, request, *args, **kwargs):        
+        # 일기를 불러오기 전에 ETag / Last-Modified 만 확인해 바뀌지 않았으면 304
+        validators = conditional.diary_validators(request.user, kwargs['pk'])
+        if validators is not None:
+            not_modified = conditional.check(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
         instance = self.get_object()        
         serializer = self.get_serializer(instance)        
-        return Response(serializer.data)    
+        response = Response(serializer.data)
+        if validators is not None:
+            conditional.set_headers(response, *validators)
+        return response    
     
     def update(self, request, *args, **kwargs):        
         partial = kwargs.pop('partial', False)        
+        # If-Match 가 현재 ETag 와 다르면 (다른 곳에서 먼저 수정됨) 412
+        validators = conditional.diary_validators(request.user, kwargs['pk'])
+        if validators is not None:
+            precondition_failed = conditional.check(request, *validators)
+            if precondition_failed is not None:
+                return precondition_failed
+
         instance = self.get_object()        
         serializer = self.get_serializer(instance, data=request.data, partial=True)        
         if serializer.is_valid():            
             serializer.save()            
-            return Response(serializer.data)        
+            response = Response(serializer.data)
+            validators = conditional.diary_validators(request.user, instance.pk)
+            if validators is not None:
+                conditional.set_headers(response, *validators)
+            return response        
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -0,0 +1,334 @@
+"""
+API 벤치마크: 외부 API 대역 서버(fake_upstreams.py)를 띄우고 임시 DB 로 Django 서버를 실행한 뒤
+chat/end, diary/list, diary/<pk>, 카카오 로그인 콜백을 동시성 / 데이터 크기별로 측정한다.
+
+결과는 커밋 간에 diff 할 수 있도록 키 순서와 자릿수를 고정한 JSON 으로 저장한다.
+
+사용법 (저장소 루트에서):
+    python benchmarks/api_suite.py --output bench.json
+    python benchmarks/api_suite.py --concurrency 1 8 32 --data-sizes 10 1000 --requests 300 \\
+        --latency-ms 80 --jitter-ms 20 --error-rate 0.01 --output bench.json
+    python benchmarks/api_suite.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstreams import FakeUpstreams  # noqa: E402
+
+SCENARIOS = ['login', 'chat_end', 'diary_list', 'diary_detail']
+CHAT_USER_KAKAO_ID = 800001
+DATA_USER_KAKAO_ID_BASE = 900000  # 데이터 크기 n 인 사용자의 kakao_id = BASE + n
+HOST_HEADER = 'ogoodiary.com'  # settings.ALLOWED_HOSTS 에 있는 호스트로 요청
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(users):
+    """
+    --seed: {kakao_id: 일기 수} 만큼 사용자와 일기 / 감정 분석을 채운다 (자식 프로세스에서 실행)
+    사용자별 최근 일기 id 를 JSON 으로 출력
+    """
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ogoo.settings')
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+
+    from api import rollup
+    from api.models import Diary, SentimentAnalysis, User
+    from fake_upstreams import diary_text
+
+    call_command('migrate', verbosity=0)
+    User.objects.get_or_create(kakao_id=CHAT_USER_KAKAO_ID, defaults={'nickname': 'bench-chat'})
+
+    sentiments = ['positive', 'negative', 'neutral', 'anger']
+    diary_ids = {}
+    for kakao_id, size in users.items():
+        user, _ = User.objects.get_or_create(kakao_id=int(kakao_id), defaults={'nickname': f'bench-{kakao_id}'})
+        existing = Diary.objects.filter(user=user).count()
+        diaries = [
+            Diary(user=user, **json.loads(diary_text(i, 12)))
+            for i in range(existing, size)
+        ]
+        Diary.objects.bulk_create(diaries, batch_size=500)
+        SentimentAnalysis.objects.bulk_create([
+            SentimentAnalysis(diary=diary, sentiment=sentiments[i % 4], score=80, source=SentimentAnalysis.SOURCE_LOCAL)
+            for i, diary in enumerate(Diary.objects.filter(user=user, sentiment_analysis__isnull=True))
+        ], batch_size=500)
+        diary_ids[kakao_id] = list(Diary.objects.filter(user=user).order_by('-id').values_list('id', flat=True)[:50])
+    rollup.rebuild()
+    print(json.dumps(diary_ids))
+
+
+class Server:
+    """임시 DB 와 대역 서버 환경 변수로 manage.py runserver 를 실행"""
+    def __init__(self, env):
+        self.env = env
+        self.port = free_port()
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{self.port}'],
+            cwd=ROOT, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                requests.get(f"{self.url}/metrics", headers={'Host': HOST_HEADER}, timeout=1)
+                return self
+            except requests.ConnectionError:
+                if self.process.poll() is not None:
+                    raise RuntimeError("Django server exited during startup")
+                time.sleep(0.2)
+        raise RuntimeError("Django server did not start")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+
+
+def build_request(scenario, base_url, data_size, detail_id, counter):
+    """(method, url, kwargs) - counter 로 요청마다 다른 값을 넣어 캐시 / 중복 제거에 걸리지 않게 한다"""
+    data_token = f"Bearer bench-{DATA_USER_KAKAO_ID_BASE + data_size}"
+    if scenario == 'login':
+        return 'POST', f"{base_url}/api/accounts/kakao/login/callback/", {"json": {"code": f"code-{counter}"}}
+    if scenario == 'chat_end':
+        return 'POST', f"{base_url}/api/chat/end/", {
+            "headers": {"Authorization": f"Bearer bench-{CHAT_USER_KAKAO_ID}"},
+            "json": {"conversation": [
+                {"role": "user", "content": f"오늘 있었던 일 {counter}"},
+                {"role": "assistant", "content": "어떤 기분이 들었나요?"},
+            ]},
+        }
+    if scenario == 'diary_list':
+        return 'GET', f"{base_url}/api/diary/list/", {"headers": {"Authorization": data_token}}
+    return 'GET', f"{base_url}/api/diary/{detail_id}/", {"headers": {"Authorization": data_token}}
+
+
+def run_level(scenario, base_url, data_size, detail_id, concurrency, total_requests, timeout):
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+    local = threading.local()
+    latencies, statuses = [], {}
+    results_lock = threading.Lock()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+            session.headers['Host'] = HOST_HEADER
+        with counter_lock:
+            n = next(counter)
+        method, url, kwargs = build_request(scenario, base_url, data_size, detail_id, f"{time.time_ns()}-{n}")
+        started = time.perf_counter()
+        try:
+            status = session.request(method, url, timeout=timeout, **kwargs).status_code
+        except requests.RequestException:
+            status = 'exception'
+        elapsed = time.perf_counter() - started
+        with results_lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    ok = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None  # noqa: E731
+    return {
+        "scenario": scenario,
+        "data_size": data_size,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": total_requests - ok,
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(total_requests / wall, 2),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+@contextmanager
+def local_stack(upstreams, users, sentiment_engine):
+    """
+    임시 SQLite DB 에 users({kakao_id: 일기 수})를 채우고 대역 서버를 바라보는 Django 서버를 띄운다.
+    (서버, {kakao_id: 최근 일기 id 목록}) 를 넘겨준다.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            **upstreams.env(),
+            'SQLITE_PATH': os.path.join(tmp, 'bench.sqlite3'),
+            'LOG_FILE': os.path.join(tmp, 'bench.log'),
+            'SENTIMENT_ENGINE': sentiment_engine,
+            'UPSTREAM_MAX_RETRIES': '0',
+            'TRAFFIC_CAPTURE_FILE': '',
+            # 부하 측정이므로 요청 제한(기본 chat_end 30/hour:5)에 걸리지 않게 끈다
+            'RATE_LIMIT_ENABLED': 'False',
+        }
+        seeded = subprocess.run(
+            [sys.executable, os.path.join(ROOT, 'benchmarks', 'api_suite.py'), '--seed', json.dumps(users)],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        if seeded.returncode != 0:
+            raise RuntimeError(seeded.stderr.strip().splitlines()[-1])
+        diary_ids = {int(kakao_id): ids for kakao_id, ids in json.loads(seeded.stdout.strip().splitlines()[-1]).items()}
+
+        server = Server(env).start()
+        try:
+            yield server, diary_ids
+        finally:
+            server.stop()
+
+
+def run_suite(args):
+    upstreams = FakeUpstreams(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate).start()
+    users = {DATA_USER_KAKAO_ID_BASE + size: size for size in args.data_sizes}
+    try:
+        with local_stack(upstreams, users, args.sentiment_engine) as (server, diary_ids):
+            detail_ids = {size: (diary_ids[DATA_USER_KAKAO_ID_BASE + size] or [None])[0] for size in args.data_sizes}
+            results = []
+            for scenario in args.scenarios:
+                # 로그인 / chat/end 는 사용자 데이터 크기와 무관하므로 한 번만 측정
+                sizes = args.data_sizes if scenario in ('diary_list', 'diary_detail') else [0]
+                for size in sizes:
+                    for concurrency in args.concurrency:
+                        result = run_level(scenario, server.url, size, detail_ids.get(size), concurrency,
+                                           args.requests, args.timeout)
+                        results.append(result)
+                        print(f"{scenario:<13} size={size:<6} c={concurrency:<4} "
+                              f"{result['throughput_rps']:>9.1f} req/s  p50 {result['p50_ms']:>8} ms  "
+                              f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  errors {result['errors']}")
+    finally:
+        upstreams.stop()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "data_sizes": args.data_sizes,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate,
+                "sentiment_engine": args.sentiment_engine,
+            },
+            "upstream_calls": dict(sorted(upstreams.counts().items())),
+        },
+        "results": results,
+    }
+
+
+# 결과 항목을 구분하는 필드 (api_suite: 시나리오 / 데이터 크기 / 동시성, replay: 엔드포인트)
+KEY_FIELDS = ('scenario', 'endpoint', 'data_size', 'concurrency')
+
+
+def result_key(result):
+    return tuple(result[field] for field in KEY_FIELDS if field in result)
+
+
+def compare(before_path, after_path):
+    """두 결과 JSON(api_suite.py / replay.py) 의 같은 항목끼리 처리량과 지연 변화를 출력"""
+    with open(before_path) as f:
+        before = {result_key(r): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = json.load(f)['results']
+
+    print(f"{'':<40}{'req/s':>18}{'p50 ms':>20}{'p99 ms':>20}")
+    for result in after:
+        old = before.get(result_key(result))
+        if old is None:
+            continue
+
+        def delta(key):
+            if not old.get(key) or result.get(key) is None:
+                return f"{result.get(key)}"
+            return f"{result[key]} ({(result[key] - old[key]) / old[key] * 100:+.0f}%)"
+        label = " ".join(str(value) for value in result_key(result))
+        print(f"{label:<40}{delta('throughput_rps'):>18}{delta('p50_ms'):>20}{delta('p99_ms'):>20}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8])
+    parser.add_argument('--data-sizes', nargs='+', type=int, default=[10, 500], help="diary/list, diary/<pk> 사용자 일기 수")
+    parser.add_argument('--requests', type=int, default=100, help="동시성 단계별 요청 수")
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="대역 서버 응답 지연")
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="대역 서버가 503 을 돌려줄 비율")
+    parser.add_argument('--sentiment-engine', default='clova', choices=['clova', 'local', 'local_refine'])
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help="결과 JSON 경로 (없으면 표준 출력)")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="두 결과 JSON 비교")
+    parser.add_argument('--seed', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(json.loads(args.seed))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_suite(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"Wrote {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
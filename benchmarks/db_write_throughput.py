@@ -0,0 +1,129 @@
+"""
+DB 프로필별 동시 일기 저장 처리량 벤치마크
+
+chat/end 가 하는 쓰기(일기 + 감정 분석 저장, 일별 집계 갱신)를 여러 스레드에서 동시에 반복하고
+요청이 끝날 때처럼 매번 close_old_connections() 를 호출해 CONN_MAX_AGE / 커넥션 풀의 효과도 함께 측정한다.
+
+사용법 (저장소 루트에서):
+    python benchmarks/db_write_throughput.py
+    python benchmarks/db_write_throughput.py --threads 16 --duration 10
+    DB_NAME=ogoo_bench DB_USER=... DB_PASSWORD=... \\
+        python benchmarks/db_write_throughput.py --profiles sqlite-default sqlite-tuned postgresql postgresql-pool
+
+PostgreSQL 프로필은 psycopg 와 접속 가능한 DB 가 있어야 하며, 벤치마크용 DB 를 사용할 것 (마이그레이션을 적용한다).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 프로필 -> 환경 변수
+PROFILES = {
+    'sqlite-default': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNING': 'False', 'DB_CONN_MAX_AGE': '0'},
+    'sqlite-tuned': {'DB_ENGINE': 'sqlite', 'SQLITE_TUNING': 'True'},
+    'postgresql': {'DB_ENGINE': 'postgresql', 'DB_POOL': 'False'},
+    'postgresql-pool': {'DB_ENGINE': 'postgresql', 'DB_POOL': 'True'},
+}
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run_profile(threads, duration):
+    """자식 프로세스에서 실행: 현재 환경 변수의 DB 설정으로 측정하고 결과를 JSON 으로 출력"""
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ogoo.settings')
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import OperationalError, close_old_connections, connection, transaction
+
+    from api.models import Diary, SentimentAnalysis, User
+
+    call_command('migrate', verbosity=0)
+    user, _ = User.objects.get_or_create(kakao_id=990000001, defaults={'nickname': 'bench'})
+    connection.close()
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        local_latencies, local_errors = [], 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    diary = Diary.objects.create(user=user, title='benchmark', content='오늘은 정말 행복한 하루였다.')
+                    SentimentAnalysis.objects.create(diary=diary, sentiment='positive', score=90, source=SentimentAnalysis.SOURCE_LOCAL)
+                local_latencies.append(time.perf_counter() - started)
+            except OperationalError:  # database is locked 등
+                local_errors += 1
+            finally:
+                # 요청 종료 시점과 같이 CONN_MAX_AGE 가 지난 커넥션을 닫거나 풀로 돌려보낸다
+                close_old_connections()
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    started = time.monotonic()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    print(json.dumps({
+        "writes": len(latencies),
+        "errors": sum(errors),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=['sqlite-default', 'sqlite-tuned'])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help="프로필별 측정 시간 (초)")
+    parser.add_argument('--run', choices=list(PROFILES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_profile(args.threads, args.duration)
+        return
+
+    print(f"{'profile':<18}{'writes':>8}{'errors':>8}{'writes/s':>11}{'p50 ms':>9}{'p99 ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            env = {**os.environ, **PROFILES[profile], 'SQLITE_PATH': os.path.join(tmp, f'{profile}.sqlite3')}
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run', profile,
+                 '--threads', str(args.threads), '--duration', str(args.duration)],
+                env=env, cwd=ROOT, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                error = (result.stderr.strip().splitlines() or ['failed'])[-1]
+                print(f"{profile:<18}  {error}")
+                continue
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{profile:<18}{stats['writes']:>8}{stats['errors']:>8}{stats['throughput']:>11.1f}"
+                  f"{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+벤치마크용 외부 API 대역 서버 (kauth.kakao.com, kapi.kakao.com, Gemini, Clova 감정 분석)
+
+응답 지연(latency_ms ± jitter_ms)과 오류 비율(error_rate, 503 응답)을 설정할 수 있다.
+카카오 토큰은 "bench-<kakao_id>" 형식이며 토큰 검증 / 사용자 정보 응답의 id 로 그대로 돌려준다.
+
+단독 실행:
+    python benchmarks/fake_upstreams.py --port 9100 --latency-ms 50 --error-rate 0.01
+    KAKAO_AUTH_HOST=http://127.0.0.1:9100 KAKAO_API_HOST=http://127.0.0.1:9100 \\
+    GEMINI_API_ENDPOINT=http://127.0.0.1:9100 \\
+    CLOVA_SENTIMENT_URL=http://127.0.0.1:9100/sentiment-analysis/v1/analyze python manage.py runserver
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DIARY_SENTENCES = [
+    "오늘은 친구와 함께 공원을 산책했다.",
+    "날씨가 맑아서 기분이 정말 좋았다.",
+    "점심으로 먹은 국수가 생각보다 맛있었다.",
+    "오후에는 밀린 과제를 하느라 조금 피곤했다.",
+    "그래도 저녁에는 가족과 이야기를 나누며 편안하게 쉬었다.",
+]
+
+
+def diary_text(seed, sentences):
+    rng = random.Random(seed)
+    content = " ".join(rng.choice(DIARY_SENTENCES) for _ in range(sentences))
+    return json.dumps({"title": f"벤치마크 일기 {seed % 1000}", "content": content}, ensure_ascii=False)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method):
+        config = self.server.config
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        delay = config['latency_ms'] + random.uniform(-config['jitter_ms'], config['jitter_ms'])
+        if delay > 0:
+            time.sleep(delay / 1000)
+        with self.server.lock:
+            self.server.counts[self.path.split('?')[0]] = self.server.counts.get(self.path.split('?')[0], 0) + 1
+        if random.random() < config['error_rate']:
+            return self.send_json(503, {"error": "injected failure"})
+
+        path = urlsplit(self.path).path
+        if method == 'POST' and path == '/oauth/token':
+            code = parse_qs(body.decode()).get('code', [''])[0]
+            kakao_id = int(hashlib.sha256(code.encode()).hexdigest(), 16) % config['login_users'] + 1
+            return self.send_json(200, {
+                "access_token": f"bench-{kakao_id}", "token_type": "bearer", "expires_in": 21599,
+                "refresh_token": "bench-refresh", "refresh_token_expires_in": 5183999,
+            })
+        if method == 'GET' and path == '/v2/user/me':
+            kakao_id = self.kakao_id()
+            if kakao_id is None:
+                return self.send_json(401, {"msg": "this access token does not exist", "code": -401})
+            return self.send_json(200, {
+                "id": kakao_id, "connected_at": "2024-01-01T00:00:00Z",
+                "kakao_account": {"profile": {"nickname": f"bench{kakao_id}"}},
+            })
+        if method == 'GET' and path == '/v1/user/access_token_info':
+            kakao_id = self.kakao_id()
+            if kakao_id is None:
+                return self.send_json(401, {"msg": "this access token does not exist", "code": -401})
+            return self.send_json(200, {"id": kakao_id, "expires_in": 21599, "app_id": 1})
+        if method == 'POST' and path == '/sentiment-analysis/v1/analyze':
+            content = json.loads(body or b'{}').get('content', '')
+            sentiment = ('positive', 'negative', 'neutral')[len(content) % 3]
+            return self.send_json(200, {
+                "document": {"sentiment": sentiment, "confidence": {"positive": 80.5, "negative": 10.2, "neutral": 9.3}},
+                "sentences": [{"content": content[:50], "sentiment": sentiment}],
+            })
+        if method == 'POST' and path.endswith(':generateContent'):
+            return self.send_json(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": diary_text(len(body), config['diary_sentences'])}], "role": "model"},
+                    "finishReason": "STOP", "index": 0,
+                }],
+            })
+        return self.send_json(404, {"error": f"no fake for {method} {path}"})
+
+    def kakao_id(self):
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not token.startswith('bench-'):
+            return None
+        try:
+            return int(token.removeprefix('bench-'))
+        except ValueError:
+            return None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 타임아웃으로 먼저 끊은 경우
+
+
+class FakeUpstreams:
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 login_users=1000, diary_sentences=8):
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.server.config = {
+            'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'error_rate': error_rate,
+            'login_users': login_users, 'diary_sentences': diary_sentences,
+        }
+        self.server.counts = {}
+        self.server.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Django 서버가 이 대역 서버를 사용하도록 하는 환경 변수"""
+        return {
+            'KAKAO_AUTH_HOST': self.url,
+            'KAKAO_API_HOST': self.url,
+            'GEMINI_API_ENDPOINT': self.url,
+            'GEMINI_API_KEY': 'bench',
+            'CLOVA_SENTIMENT_URL': f"{self.url}/sentiment-analysis/v1/analyze",
+            'CLOVA_API_KEY_ID': 'bench',
+            'CLOVA_API_KEY': 'bench',
+        }
+
+    def counts(self):
+        with self.server.lock:
+            return dict(self.server.counts)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate).start()
+    print(f"Fake upstreams listening on {upstreams.url}")
+    for key, value in upstreams.env().items():
+        print(f"  {key}={value}")
+    try:
+        upstreams.thread.join()
+    except KeyboardInterrupt:
+        upstreams.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+JSON 렌더러 / 파서 벤치마크: DRF JSONRenderer / JSONParser 와 api.renderers.ORJSONRenderer / api.parsers.ORJSONParser
+
+diary/list 응답(페이지 크기 x 일기 길이), 시리얼라이저 형태의 일기 상세 목록(Decimal score, datetime 포함),
+chat/end 요청 본문(대화 턴 수별)을 메모리에서 만들어 한 번 직렬화 / 파싱하는 데 걸리는 시간을 잰다 (DB, 서버 없음).
+
+사용법 (저장소 루트에서):
+    python benchmarks/json_rendering.py
+    python benchmarks/json_rendering.py --page-sizes 50 100 --content-chars 300 3000 --output json.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ogoo.settings')
+
+from fake_upstreams import DIARY_SENTENCES  # noqa: E402
+
+EMOJIS = ['happy', 'sad', 'angry', 'neutral']
+
+
+def korean_text(rng, chars):
+    text = ""
+    while len(text) < chars:
+        text += rng.choice(DIARY_SENTENCES) + " "
+    return text[:chars]
+
+
+def diary_list_payload(rng, page_size, content_chars):
+    """DiaryViewSet.list 응답과 같은 모양"""
+    start = datetime(2024, 1, 1)
+    return {
+        "code": 200,
+        "diaries": [{
+            "diaryId": 100000 + i,
+            "title": f"오늘의 일기 {i}",
+            "date": (start + timedelta(days=i)).date().isoformat(),
+            "content": korean_text(rng, content_chars),
+            "emoji": rng.choice(EMOJIS),
+        } for i in range(page_size)],
+        "next": "https://ogoodiary.com/api/diary/list/?cursor=cD0yMDI0LTA1LTAx",
+    }
+
+
+def diary_detail_payload(rng, page_size, content_chars):
+    """DiarySerializer 형태에 원시 Decimal / datetime 이 섞인 목록 (렌더러가 변환해야 하는 값)"""
+    now = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    return [{
+        "id": 100000 + i,
+        "user": {"kakao_id": 3000000000 + i},
+        "title": f"오늘의 일기 {i}",
+        "content": korean_text(rng, content_chars),
+        "sentiment_analysis": {
+            "id": i,
+            "diary": 100000 + i,
+            "sentiment": rng.choice(['positive', 'negative', 'neutral']),
+            "score": Decimal(rng.randint(0, 10000)) / 100,
+            "created_at": now,
+        },
+        "created_at": now - timedelta(hours=i),
+        "updated_at": now,
+    } for i in range(page_size)]
+
+
+def chat_end_body(rng, turns):
+    conversation = [{
+        "role": 'user' if i % 2 else 'assistant',
+        "content": korean_text(rng, rng.randint(20, 200)),
+        "id": f"m{i}",
+        "createdAt": "2024-05-01T10:00:00Z",
+    } for i in range(turns)]
+    return json.dumps({"conversation": conversation}, ensure_ascii=False).encode()
+
+
+def measure(function, min_seconds):
+    """한 번 실행하는 데 걸리는 시간(µs), 5회 측정 중 최솟값"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_seconds / 0.2))
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def run(args):
+    import django
+    django.setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from api.parsers import ORJSONParser
+    from api.renderers import ORJSONRenderer, orjson
+
+    if orjson is None:
+        raise SystemExit("orjson is not installed (ORJSONRenderer falls back to JSONRenderer)")
+
+    rng = random.Random(1)
+    cases = []
+    for page_size in args.page_sizes:
+        for content_chars in args.content_chars:
+            cases.append(('render', 'diary_list', f"{page_size}x{content_chars}", diary_list_payload(rng, page_size, content_chars)))
+            cases.append(('render', 'diary_detail', f"{page_size}x{content_chars}", diary_detail_payload(rng, page_size, content_chars)))
+    for turns in args.turns:
+        cases.append(('parse', 'chat_end', f"{turns} turns", chat_end_body(rng, turns)))
+
+    implementations = {
+        'render': (JSONRenderer(), ORJSONRenderer()),
+        'parse': (JSONParser(), ORJSONParser()),
+    }
+    results = []
+    for kind, payload, size, data in cases:
+        drf, fast = implementations[kind]
+        if kind == 'render':
+            output = drf.render(data)
+            assert fast.render(data) == output, f"{payload} {size}: output differs"
+            timings = [measure(lambda impl=impl: impl.render(data), args.min_seconds) for impl in (drf, fast)]
+            nbytes = len(output)
+        else:
+            assert fast.parse(BytesIO(data)) == drf.parse(BytesIO(data)), f"{payload} {size}: output differs"
+            timings = [measure(lambda impl=impl: impl.parse(BytesIO(data)), args.min_seconds) for impl in (drf, fast)]
+            nbytes = len(data)
+        result = {
+            "kind": kind,
+            "payload": payload,
+            "size": size,
+            "bytes": nbytes,
+            "drf_us": round(timings[0], 1),
+            "orjson_us": round(timings[1], 1),
+            "speedup": round(timings[0] / timings[1], 2),
+        }
+        results.append(result)
+        print(f"{kind:<7} {payload:<13} {size:<12} {nbytes:>9} B  DRF {result['drf_us']:>9.1f} µs  "
+              f"orjson {result['orjson_us']:>8.1f} µs  x{result['speedup']}")
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "orjson": orjson.__version__,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-sizes', nargs='+', type=int, default=[50, 100], help="diary/list 페이지 크기")
+    parser.add_argument('--content-chars', nargs='+', type=int, default=[300, 3000], help="일기 본문 글자 수")
+    parser.add_argument('--turns', nargs='+', type=int, default=[20, 200], help="chat/end 대화 턴 수")
+    parser.add_argument('--min-seconds', type=float, default=0.2, help="측정 한 번에 쓸 최소 시간")
+    parser.add_argument('--output', help="결과 JSON 경로 (없으면 표준 출력)")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"Wrote {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+"""
+트래픽 캡처(api/capture.py, TRAFFIC_CAPTURE_FILE) 재현: 캡처된 요청 모양을 원래 시간 간격대로
+(또는 --speed 배 빠르게) 로컬 서버에 다시 보내고 엔드포인트별 처리량 / 지연을 보고한다.
+
+api_suite.py 와 같이 임시 DB, 외부 API 대역 서버(fake_upstreams.py), manage.py runserver 를 사용한다.
+캡처의 사용자 해시마다 벤치마크 사용자를 하나씩 만들고 --diaries-per-user 만큼 일기를 채운다.
+
+사용법 (저장소 루트에서):
+    TRAFFIC_CAPTURE_FILE=capture.jsonl gunicorn ogoo.wsgi   # 운영 서버에서 캡처
+    python benchmarks/replay.py capture.jsonl capture.jsonl.1 --speed 4 --output replay.json
+    python benchmarks/replay.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api_suite import HOST_HEADER, compare, git_commit, local_stack, percentile  # noqa: E402
+from fake_upstreams import DIARY_SENTENCES, FakeUpstreams  # noqa: E402
+
+REPLAY_USER_KAKAO_ID_BASE = 700000
+FILLER = " ".join(DIARY_SENTENCES)
+ROUTE_PARAM = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+def load_capture(paths, limit=None):
+    """캡처 파일(JSON 로그 줄)에서 재현 가능한 요청만 시간순으로 읽는다"""
+    entries = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line).get('capture')
+                except ValueError:
+                    continue
+                # 라우터의 정규식 라우트와 admin 은 재현하지 않는다
+                if not entry or not entry.get('route') or '^' in entry['route'] or entry['route'].startswith('admin/'):
+                    continue
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry['t'])
+    return entries[:limit] if limit else entries
+
+
+def filler(length):
+    return (FILLER * (length // len(FILLER) + 1))[:length]
+
+
+def build_body(shape, key=None, state=None):
+    """body_shape 로 기록된 모양에서 같은 구조 / 길이의 JSON 본문을 만든다"""
+    if isinstance(shape, dict):
+        return {name: build_body(value, name, state) for name, value in shape.items()}
+    if isinstance(shape, list):
+        return [build_body(item, key, state) for item in shape]
+    if isinstance(shape, int) and not isinstance(shape, bool):
+        if key == 'role':
+            state['turn'] += 1
+            return 'user' if state['turn'] % 2 else 'assistant'
+        if key == 'code':
+            return f"replay-{next(state['counter'])}"
+        return filler(shape)
+    if shape == "number":
+        return state['diary_id'] if key in ('diary_id', 'diaryId', 'id', 'pk') else 0
+    return shape
+
+
+class Replayer:
+    def __init__(self, base_url, entries, user_ids, diary_ids, timeout):
+        self.base_url = base_url
+        self.entries = entries
+        self.user_ids = user_ids  # 사용자 해시 -> kakao_id
+        self.diary_ids = diary_ids  # kakao_id -> 일기 id 목록
+        self.all_diary_ids = [pk for ids in diary_ids.values() for pk in ids] or [0]
+        self.timeout = timeout
+        self.counter = iter(range(10 ** 9))
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.samples = []  # (endpoint, 지연 초, 상태, 예정 대비 늦게 보낸 초)
+
+    def request_for(self, entry):
+        kakao_id = self.user_ids.get(entry.get('user'))
+        diary_id = random.choice(self.diary_ids.get(kakao_id) or self.all_diary_ids)
+        kwargs = {**(entry.get('kwargs') or {}), 'pk': diary_id}
+        path = ROUTE_PARAM.sub(lambda m: str(kwargs.get(m.group(1), '')), entry['route'])
+
+        headers = {}
+        if kakao_id is not None:
+            headers['Authorization'] = f"Bearer bench-{kakao_id}"
+        # 값이 없는 파라미터(cursor 등)는 재현할 수 없으므로 뺀다
+        params = {key: value for key, value in (entry.get('query') or {}).items() if value is not None}
+        body = None
+        if entry.get('body') is not None:
+            with self.lock:
+                state = {'turn': 0, 'counter': self.counter, 'diary_id': diary_id}
+                body = build_body(entry['body'], state=state)
+        return entry['method'], f"{self.base_url}/{path}", {"headers": headers, "params": params, "json": body}
+
+    def send(self, entry, scheduled):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers['Host'] = HOST_HEADER
+        method, url, kwargs = self.request_for(entry)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=self.timeout, **kwargs)
+            if entry.get('streaming'):
+                response.content  # 스트리밍 응답은 끝까지 받는다
+            status = response.status_code
+        except requests.RequestException:
+            status = 'exception'
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples.append((f"{entry['method']} {entry['route']}", elapsed, status, started - scheduled))
+
+    def run(self, speed, workers):
+        """캡처의 요청 간격을 speed 로 나눈 시각에 요청을 보낸다 (응답을 기다리지 않는 open-loop)"""
+        t0 = self.entries[0]['t']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for entry in self.entries:
+                scheduled = started + (entry['t'] - t0) / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, entry, scheduled)
+        return time.perf_counter() - started
+
+
+def summarize(entries, samples, wall):
+    captured = {}
+    for entry in entries:
+        captured.setdefault(f"{entry['method']} {entry['route']}", []).append(entry['duration_ms'] / 1000)
+    by_endpoint = {}
+    for endpoint, elapsed, status, _ in samples:
+        by_endpoint.setdefault(endpoint, []).append((elapsed, status))
+
+    ms = lambda value: round(value * 1000, 2) if value is not None else None  # noqa: E731
+    results = []
+    for endpoint, items in sorted(by_endpoint.items()):
+        latencies = [elapsed for elapsed, _ in items]
+        statuses = {}
+        for _, status in items:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        original = captured.get(endpoint, [])
+        results.append({
+            "endpoint": endpoint,
+            "requests": len(items),
+            "errors": sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500),
+            "statuses": dict(sorted(statuses.items())),
+            "throughput_rps": round(len(items) / wall, 2),
+            "mean_ms": ms(sum(latencies) / len(latencies)),
+            "p50_ms": ms(percentile(latencies, 0.50)),
+            "p95_ms": ms(percentile(latencies, 0.95)),
+            "p99_ms": ms(percentile(latencies, 0.99)),
+            "captured_p50_ms": ms(percentile(original, 0.50)),
+            "captured_p95_ms": ms(percentile(original, 0.95)),
+        })
+    return results
+
+
+def run_replay(args):
+    entries = load_capture(args.capture, args.limit)
+    if not entries:
+        raise SystemExit("No replayable requests in capture")
+
+    # 캡처의 사용자 해시를 벤치마크 사용자로 (--max-users 를 넘으면 돌려 쓴다)
+    hashes = sorted({entry['user'] for entry in entries if entry.get('user')})
+    user_ids = {user: REPLAY_USER_KAKAO_ID_BASE + index % args.max_users for index, user in enumerate(hashes)}
+    users = {kakao_id: args.diaries_per_user for kakao_id in set(user_ids.values())}
+
+    upstreams = FakeUpstreams(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate).start()
+    try:
+        with local_stack(upstreams, users, args.sentiment_engine) as (server, diary_ids):
+            replayer = Replayer(server.url, entries, user_ids, diary_ids, args.timeout)
+            wall = replayer.run(args.speed, args.workers)
+    finally:
+        upstreams.stop()
+
+    results = summarize(entries, replayer.samples, wall)
+    for result in results:
+        print(f"{result['endpoint']:<45} {result['requests']:>6} req  {result['throughput_rps']:>8.1f} req/s  "
+              f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+              f"errors {result['errors']}")
+    lags = [lag for *_, lag in replayer.samples]
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {
+                "capture": args.capture,
+                "speed": args.speed,
+                "workers": args.workers,
+                "diaries_per_user": args.diaries_per_user,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate,
+                "sentiment_engine": args.sentiment_engine,
+            },
+            "requests": len(entries),
+            "users": len(users),
+            "captured_seconds": round(entries[-1]['t'] - entries[0]['t'], 3),
+            "replay_seconds": round(wall, 3),
+            # 워커가 모자라 예정 시각보다 늦게 보낸 정도 (크면 --workers 를 늘린다)
+            "send_lag_p99_ms": round(percentile(lags, 0.99) * 1000, 2),
+            "upstream_calls": dict(sorted(upstreams.counts().items())),
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', nargs='*', help="캡처 파일 (회전된 파일도 함께 지정 가능)")
+    parser.add_argument('--speed', type=float, default=1.0, help="재현 속도 배율 (2 = 두 배 빠르게)")
+    parser.add_argument('--limit', type=int, help="앞에서부터 재현할 요청 수")
+    parser.add_argument('--workers', type=int, default=64, help="동시에 보낼 수 있는 최대 요청 수")
+    parser.add_argument('--max-users', type=int, default=200)
+    parser.add_argument('--diaries-per-user', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="대역 서버 응답 지연")
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--sentiment-engine', default='clova', choices=['clova', 'local', 'local_refine'])
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--output', help="결과 JSON 경로 (없으면 표준 출력)")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="두 결과 JSON 비교")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.capture:
+        parser.error("capture file is required")
+
+    report = run_replay(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"Wrote {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
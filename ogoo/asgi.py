@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ogoo.settings')
+# ASGI 서버에서는 chat/end/ 를 비동기 뷰(api.async_views.chat_end)로 처리
+os.environ.setdefault('ASYNC_CHAT_END', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,134 @@
+"""
+로깅 설정 도구 (settings.LOGGING 에서 사용)
+
+- queue_handler: 요청 스레드는 큐에 넣기만 하고, 파일(또는 stderr) 쓰기와 JSON 포맷은 별도 리스너 스레드가 처리
+- JsonFormatter: 한 줄에 하나의 JSON 객체 (extra 는 EXTRA_FIELDS 에 있는 것만)
+- DebugSampleFilter: DEBUG 로그를 일정 비율만 남긴다
+- parse_levels: "api=DEBUG,django.db.backends=WARNING" 형식의 로거별 레벨
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+# JSON 에 넣는 extra 필드. 그 밖의 값(예: django.request 의 request 객체)은 str() 에 헤더나 토큰이 섞일 수 있어 넣지 않는다
+EXTRA_FIELDS = ('status_code', 'duration', 'alias', 'capture')
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, fields=EXTRA_FIELDS):
+        super().__init__()
+        self.fields = fields
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key in self.fields:
+            if key in record.__dict__:
+                entry[key] = record.__dict__[key]
+        request = getattr(record, 'request', None)
+        if request is not None:
+            entry["method"] = getattr(request, 'method', None)
+            entry["path"] = getattr(request, 'path', None)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampleFilter(logging.Filter):
+    """DEBUG 이하 레코드는 rate 비율만 통과 (INFO 이상은 모두 통과)"""
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    인자 치환(msg % args)만 호출 스레드에서 하고, 예외 포맷과 JSON 직렬화는 리스너 스레드에 맡긴다.
+    (기본 QueueHandler 는 포맷터로 메시지와 traceback 을 합쳐 하나의 문자열로 만든다)
+
+    리스너 스레드는 첫 로그에서 시작한다. 스레드는 fork 되지 않으므로 설정한 프로세스와 다른 프로세스
+    (gunicorn --preload 워커 등)에서는 새 큐와 리스너를 만든다.
+    """
+    def __init__(self, target):
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self.listener = None
+        self.listener_pid = None
+        # 종료 시 큐에 남은 로그를 모두 쓴다
+        atexit.register(self.stop_listener)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        # handle() 이 self.lock 을 잡은 채로 호출한다 (logging 이 fork 후 자식에서 이 락을 다시 만든다)
+        if self.listener_pid != os.getpid():
+            self.start_listener()
+        super().enqueue(record)
+
+    def start_listener(self):
+        with self.lock:
+            if self.listener_pid == os.getpid():
+                return
+            # fork 전에 부모 큐에 남아 있던 로그는 부모가 쓰므로 자식은 빈 큐로 시작
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+            self.listener.start()
+            self.listener_pid = os.getpid()
+
+    def stop_listener(self):
+        with self.lock:
+            # 부모 프로세스에서 시작한 리스너는 그 프로세스가 멈춘다
+            if self.listener is not None and self.listener_pid == os.getpid():
+                self.listener.stop()
+            self.listener = self.listener_pid = None
+
+
+def queue_handler(filename='', max_bytes=10 * 1024 * 1024, backup_count=5):
+    """
+    크기 기준으로 회전하는 JSON 파일 핸들러(filename 이 없으면 stderr)를 리스너 스레드에서 돌리고,
+    로거에는 QueueHandler 를 붙인다.
+    dictConfig 의 '()' 팩토리로 사용한다 (level / filters 는 QueueHandler 에 적용되어 큐에 넣기 전에 걸러진다).
+    """
+    if filename:
+        target = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=int(max_bytes), backupCount=int(backup_count), encoding='utf-8', delay=True,
+        )
+    else:
+        target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter())
+    return QueueHandler(target)
+
+
+def parse_levels(value):
+    """"api=DEBUG, django.db.backends=WARNING" -> {"api": "DEBUG", "django.db.backends": "WARNING"}"""
+    levels = {}
+    for item in (value or '').split(','):
+        name, sep, level = item.partition('=')
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
@@ -13,7 +13,11 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import django
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
+from ogoo.log import parse_levels as parse_log_levels
 load_dotenv(dotenv_path='/home/ubuntu/ogoo/api/.env')
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,6 +64,9 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.ServerTimingMiddleware',  # 가장 바깥에서 전체 요청 시간을 잰다
+    'api.capture.TrafficCaptureMiddleware',  # TRAFFIC_CAPTURE_FILE 이 없으면 빠진다
+    'api.compression.CompressionMiddleware',  # 응답 압축 (ServerTiming 에 압축 시간 포함, 캡처에는 압축한 크기)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -73,6 +80,9 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_METHODS = ["GET", "POST", "OPTIONS", "DELETE", "PUT"]
+# 조건부 요청 / 중복 요청 제거용 헤더
+CORS_ALLOW_HEADERS = (*default_headers, 'if-match', 'if-none-match', 'if-modified-since', 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'Idempotent-Replayed', 'Server-Timing']
 
 
 ROOT_URLCONF = 'ogoo.urls'
@@ -105,18 +115,180 @@ KAKAO_CLIENT_ID = os.getenv('KAKAO_CLIENT_ID')
 KAKAO_CLIENT_SECRET= os.getenv('KAKAO_CLIENT_SECRET')
 KAKAO_REDIRECT_URI = os.getenv('KAKAO_REDIRECT_URI')
 
+# 카카오 액세스 토큰 검증 결과 캐시 (토큰 해시 -> kakao_id / user id)
+KAKAO_TOKEN_CACHE_TTL = int(os.getenv('KAKAO_TOKEN_CACHE_TTL', 300))  # 초, 토큰 만료 시간보다 길게 캐시하지 않음
+KAKAO_TOKEN_CACHE_MAXSIZE = int(os.getenv('KAKAO_TOKEN_CACHE_MAXSIZE', 10000))
+KAKAO_TOKEN_NEGATIVE_TTL = int(os.getenv('KAKAO_TOKEN_NEGATIVE_TTL', 60))  # 카카오가 거절한 토큰을 기억하는 시간 (초)
+# 워커 간 공유할 Django 캐시 alias, 비어 있으면 프로세스 내 캐시만 사용
+KAKAO_TOKEN_CACHE_ALIAS = os.getenv('KAKAO_TOKEN_CACHE_ALIAS', 'default' if os.getenv('REDIS_URL') else '') or None
+
+# 외부 API (카카오, Clova) 호출 설정
+KAKAO_AUTH_HOST = os.getenv('KAKAO_AUTH_HOST', 'https://kauth.kakao.com')
+KAKAO_API_HOST = os.getenv('KAKAO_API_HOST', 'https://kapi.kakao.com')
+CLOVA_SENTIMENT_URL = os.getenv('CLOVA_SENTIMENT_URL', 'https://naveropenapi.apigw.ntruss.com/sentiment-analysis/v1/analyze')
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT', '')  # 비어 있으면 Google 기본 엔드포인트 (설정하면 REST 로 호출)
+
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 3.05))  # 초
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', 10))  # 초
+UPSTREAM_MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', 2))
+UPSTREAM_BACKOFF_FACTOR = float(os.getenv('UPSTREAM_BACKOFF_FACTOR', 0.2))
+UPSTREAM_POOL_CONNECTIONS = int(os.getenv('UPSTREAM_POOL_CONNECTIONS', 10))  # 풀을 유지할 호스트 수
+UPSTREAM_POOL_MAXSIZE = int(os.getenv('UPSTREAM_POOL_MAXSIZE', 20))  # 호스트당 keep-alive 커넥션 수
+UPSTREAM_PREWARM = os.getenv('UPSTREAM_PREWARM', 'False').lower() == 'true'  # 워커 시작 시 미리 연결
+
+# 외부 AI API 호출 보호 (api/resilience.py)
+CHAT_END_DEADLINE = float(os.getenv('CHAT_END_DEADLINE', 30))  # 초, chat/end 요청 하나가 Gemini + Clova 에 쓸 수 있는 시간 (0 이면 제한 없음)
+SENTIMENT_DEADLINE = float(os.getenv('SENTIMENT_DEADLINE', 8))  # 초, 감정 분석 요청 (analytic/sentiment)
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 25))  # 초
+# 최근 CIRCUIT_WINDOW 번 중 실패 비율 / 느린 호출 비율이 기준을 넘으면 CIRCUIT_OPEN_SECONDS 동안 호출하지 않는다
+CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', 20))
+CIRCUIT_MIN_CALLS = int(os.getenv('CIRCUIT_MIN_CALLS', 10))
+CIRCUIT_FAILURE_RATE = float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv('CIRCUIT_SLOW_CALL_RATE', 0.8))
+CIRCUIT_OPEN_SECONDS = float(os.getenv('CIRCUIT_OPEN_SECONDS', 30))
+GEMINI_SLOW_CALL_SECONDS = float(os.getenv('GEMINI_SLOW_CALL_SECONDS', 15))
+CLOVA_SLOW_CALL_SECONDS = float(os.getenv('CLOVA_SLOW_CALL_SECONDS', 2))
+# Clova 응답이 이 시간(ms) 안에 오지 않으면 한 번 더 요청해서 빠른 쪽을 사용 (0 이면 끔)
+CLOVA_HEDGE_DELAY_MS = int(os.getenv('CLOVA_HEDGE_DELAY_MS', 0))
+HEDGE_WORKERS = int(os.getenv('HEDGE_WORKERS', 16))
+
+# Gemini / Clova 를 호출하는 엔드포인트 요청 제한 (api/throttling.py, 토큰 버킷)
+# "<횟수>/<second|minute|hour|day>:<버스트>" - 평균 허용 속도와 한 번에 몰아서 보낼 수 있는 요청 수
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_CACHE_ALIAS = os.getenv('RATE_LIMIT_CACHE_ALIAS', 'default')  # 워커 간 공유하려면 Redis
+RATE_LIMITS = {
+    'chat_end': os.getenv('RATE_LIMIT_CHAT_END', '30/hour:5'),  # 사용자별 chat/end, chat/end/stream
+    'sentiment': os.getenv('RATE_LIMIT_SENTIMENT', '60/hour:10'),  # 사용자별 감정 분석 요청
+    'login': os.getenv('RATE_LIMIT_LOGIN', '30/minute:10'),  # IP 별 카카오 로그인 콜백
+}
+
+# Gemini 일기 생성 프롬프트 크기 (api/prompts.py, 토큰 수는 어림값)
+# 대화가 PROMPT_MAX_TOKENS 를 넘으면 최근 PROMPT_RECENT_TURNS 턴만 그대로 두고 이전 발화는 PROMPT_SUMMARY_TOKENS 안으로 요약
+PROMPT_MAX_TOKENS = int(os.getenv('PROMPT_MAX_TOKENS', 3000))
+PROMPT_RECENT_TURNS = int(os.getenv('PROMPT_RECENT_TURNS', 10))
+PROMPT_SUMMARY_TOKENS = int(os.getenv('PROMPT_SUMMARY_TOKENS', 600))
+
+# Clova 감정 분석 결과 캐시 (본문 해시 -> 결과)
+SENTIMENT_CACHE_MAXSIZE = int(os.getenv('SENTIMENT_CACHE_MAXSIZE', 5000))
+SENTIMENT_CACHE_TTL = int(os.getenv('SENTIMENT_CACHE_TTL', 7 * 24 * 60 * 60))  # 초
+SENTIMENT_CACHE_ALIAS = os.getenv('SENTIMENT_CACHE_ALIAS', 'default' if os.getenv('REDIS_URL') else '') or None
+
+# 감정 분석 엔진: clova (Clova 우선, 실패 시 로컬 분석기) / local (로컬만) / local_refine (로컬로 응답 후 Clova 로 보정)
+SENTIMENT_ENGINE = os.getenv('SENTIMENT_ENGINE', 'clova')
+SENTIMENT_REFINE_WORKERS = int(os.getenv('SENTIMENT_REFINE_WORKERS', 2))
+
 WSGI_APPLICATION = 'ogoo.wsgi.application'
 
+# 요청 단계별 시간 측정 (Server-Timing 헤더, /metrics)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+# /metrics 스크레이프용 토큰. 비어 있으면 /metrics 는 404, 설정하면 Authorization: Bearer <토큰> 이 맞아야 응답 (틀리면 403)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# 부하 테스트용 트래픽 캡처 (benchmarks/replay.py 로 재현). 파일 경로를 설정하면 켜진다
+TRAFFIC_CAPTURE_FILE = os.getenv('TRAFFIC_CAPTURE_FILE', '')
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', 1.0))
+
+# 응답 압축 (api/compression.py). 협상 순서는 COMPRESSION_ENCODINGS, br / zstd 는 brotli / zstandard 가 설치되어 있을 때만
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_ENCODINGS = [encoding.strip() for encoding in os.getenv('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if encoding.strip()]
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))  # 이보다 작은 응답은 압축하지 않는다
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))  # 1~9
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))  # 0~11
+COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))  # 1~22
+
+# chat/end/ 를 비동기 뷰로, chat/end/stream/ 을 비동기 제너레이터로 처리 (ogoo/asgi.py 에서 기본으로 켜짐)
+ASYNC_CHAT_END = os.getenv('ASYNC_CHAT_END', 'False').lower() == 'true'
+
+# chat/end 백그라운드 작업 큐 (?async=true 로 요청 시)
+DIARY_JOB_INPROCESS_WORKERS = os.getenv('DIARY_JOB_INPROCESS_WORKERS', 'True').lower() == 'true'  # False 면 run_diary_jobs 워커만 처리
+DIARY_JOB_WORKERS = int(os.getenv('DIARY_JOB_WORKERS', 4))  # 동시 처리 작업 수
+DIARY_JOB_LEASE_SECONDS = int(os.getenv('DIARY_JOB_LEASE_SECONDS', 300))  # 이 시간 동안 끝나지 않은 작업은 다시 처리
+DIARY_JOB_MAX_ATTEMPTS = int(os.getenv('DIARY_JOB_MAX_ATTEMPTS', 3))
+DIARY_JOB_RETRY_BASE_SECONDS = float(os.getenv('DIARY_JOB_RETRY_BASE_SECONDS', 5))  # 첫 재시도까지 기다리는 시간 (초, 이후 두 배씩)
+DIARY_JOB_RETRY_MAX_SECONDS = float(os.getenv('DIARY_JOB_RETRY_MAX_SECONDS', 300))  # 재시도 간격 상한 (초)
+
+# chat/end 중복 요청 제거 (Idempotency-Key 헤더, 없으면 사용자 + 대화 내용 해시)
+IDEMPOTENCY_CACHE_ALIAS = os.getenv('IDEMPOTENCY_CACHE_ALIAS', 'default')
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 60 * 60))  # Idempotency-Key 로 저장된 응답 보관 시간 (초)
+IDEMPOTENCY_PAYLOAD_TTL = int(os.getenv('IDEMPOTENCY_PAYLOAD_TTL', 60))  # 헤더 없이 대화 내용 해시로 저장된 응답 보관 시간 (초)
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 120))  # 처리 중 표시를 유지하는 최대 시간 (초)
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE=postgresql 이면 PostgreSQL (DB_POOL=True 면 psycopg 커넥션 풀, 아니면 CONN_MAX_AGE 로 커넥션 유지)
+# 커넥션 풀은 psycopg 3 와 pool extra 가 필요하다: pip install "psycopg[binary,pool]"
+# DB_POOL 을 지정하지 않으면 psycopg_pool 이 설치되어 있을 때만 풀을 쓴다 (psycopg2 만 있으면 CONN_MAX_AGE)
+# 기본값은 SQLite 이며, 연결 시 WAL 등 동시 쓰기에 맞춘 PRAGMA 를 적용한다 (SQLITE_TUNING=False 로 끌 수 있음)
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    try:
+        import psycopg_pool
+    except ImportError:  # 선택 의존성
+        psycopg_pool = None
+    DB_POOL = os.getenv('DB_POOL', str(psycopg_pool is not None)).lower() == 'true'
+    if DB_POOL and psycopg_pool is None:
+        raise ImproperlyConfigured('DB_POOL=True requires psycopg 3 with the pool extra: pip install "psycopg[binary,pool]"')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'ogoo'),
+            'USER': os.getenv('DB_USER', 'ogoo'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # 풀을 쓰면 커넥션 재사용은 풀이 담당하므로 CONN_MAX_AGE 는 0 이어야 한다
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),  # 풀에서 커넥션을 기다리는 최대 시간 (초)
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'True').lower() == 'true'
+    # 연결마다 api/db.py 의 connection_created 핸들러가 실행한다 (OPTIONS['init_command'] 는 Django 5.1 부터 지원)
+    # WAL: 읽기가 쓰기를 막지 않음, synchronous=NORMAL: WAL 에서 안전한 수준으로 fsync 횟수 감소
+    SQLITE_PRAGMAS = [
+        f"busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        'journal_mode=WAL',
+        'synchronous=NORMAL',
+        f"mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))}",
+        'temp_store=MEMORY',
+    ] if SQLITE_TUNING else []
+    SQLITE_OPTIONS = {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000} if SQLITE_TUNING else {}
+    if SQLITE_TUNING and django.VERSION >= (5, 1):
+        # 쓰기 트랜잭션이 처음부터 쓰기 잠금을 잡아, 읽기 -> 쓰기 승격 중 "database is locked" 가 나지 않게 한다
+        SQLITE_OPTIONS['transaction_mode'] = 'IMMEDIATE'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': SQLITE_OPTIONS,
+        }
+    }
+
+
+# Cache
+# REDIS_URL 이 있으면 여러 워커가 공유하는 Redis 캐시를 사용
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
 
 
 # Password validation
@@ -169,8 +341,30 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',  # For testing; adjust as needed
     ),
+    # JSON 직렬화 / 파싱은 orjson 으로 (설치되어 있지 않으면 DRF 기본 구현으로 동작, api/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
+# diary/list/ 페이지 크기 (?page_size= 로 최대 DIARY_LIST_MAX_PAGE_SIZE 까지 조절)
+DIARY_LIST_PAGE_SIZE = int(os.getenv('DIARY_LIST_PAGE_SIZE', 50))
+DIARY_LIST_MAX_PAGE_SIZE = int(os.getenv('DIARY_LIST_MAX_PAGE_SIZE', 100))
+
+# analytic/sentiment/summary/ 기본 조회 기간과 최대 조회 기간 (일)
+SENTIMENT_SUMMARY_DEFAULT_DAYS = int(os.getenv('SENTIMENT_SUMMARY_DEFAULT_DAYS', 30))
+SENTIMENT_SUMMARY_MAX_DAYS = int(os.getenv('SENTIMENT_SUMMARY_MAX_DAYS', 366))
+
+# calendar/<year>/<month>/ 캐시 (일기 / 감정 분석 저장 시 해당 월 캐시를 지움)
+CALENDAR_CACHE_ALIAS = os.getenv('CALENDAR_CACHE_ALIAS', 'default')
+CALENDAR_CACHE_TTL = int(os.getenv('CALENDAR_CACHE_TTL', 24 * 60 * 60))  # 초
+
 # 테스트 이후
 # REST_FRAMEWORK = {
 #     'DEFAULT_AUTHENTICATION_CLASSES': [],
@@ -184,27 +378,60 @@ REST_FRAMEWORK = {
 #     'REFRESH_TOKEN_LIFETIME': timedelta(days=3650),
 # }
 
+# 로그: 큐를 거쳐 별도 스레드에서 JSON 한 줄씩 stderr 에 기록
+# LOG_FILE 을 지정하면 그 파일에 기록한다 (크기 기준 회전, 예: /var/log/ogoo/app.log)
+# LOG_LEVELS="api=DEBUG,django.db.backends=WARNING" 처럼 로거별 레벨을 덮어쓸 수 있다
+LOG_FILE = os.getenv('LOG_FILE', '')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 0.1))  # DEBUG 로그 중 남길 비율
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'debug_sample': {
+            '()': 'ogoo.log.DebugSampleFilter',
+            'rate': LOG_DEBUG_SAMPLE_RATE,
+        },
+    },
     'handlers': {
-        'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': 'debug.log',
+        'json': {
+            '()': 'ogoo.log.queue_handler',
+            'filename': LOG_FILE,
+            'max_bytes': LOG_MAX_BYTES,
+            'backup_count': LOG_BACKUP_COUNT,
+            'filters': ['debug_sample'],
         },
     },
+    'root': {
+        'handlers': ['json'],
+        'level': LOG_LEVEL,
+    },
     'loggers': {
         'django': {
-            'handlers': ['file'],
-            'level': 'DEBUG',
-            'propagate': True,
+            'level': LOG_LEVEL,
         },
-        # Enable logging for your views
         'ogoo': {
-            'handlers': ['file'],
-            'level': 'DEBUG',
-            'propagate': True,
+            'level': LOG_LEVEL,
+        },
+        'api': {
+            'level': LOG_LEVEL,
         },
     },
-}
\ No newline at end of file
+}
+if TRAFFIC_CAPTURE_FILE:
+    LOGGING['handlers']['traffic_capture'] = {
+        '()': 'ogoo.log.queue_handler',
+        'filename': TRAFFIC_CAPTURE_FILE,
+        'max_bytes': LOG_MAX_BYTES,
+        'backup_count': LOG_BACKUP_COUNT,
+    }
+    LOGGING['loggers']['api.capture'] = {
+        'handlers': ['traffic_capture'],
+        'level': 'INFO',
+        'propagate': False,
+    }
+for _name, _level in parse_log_levels(os.getenv('LOG_LEVELS')).items():
+    LOGGING['loggers'].setdefault(_name, {})['level'] = _level
@@ -18,10 +18,13 @@ from django.contrib import admin
 from django.urls import include, path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from api.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('accounts/', include('allauth.urls')),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus 지표
     # path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # JWT token obtain view
     # path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]